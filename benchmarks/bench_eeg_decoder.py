@@ -0,0 +1,51 @@
+"""Time the EEG packet decoder against the bitstring one it replaced.
+
+Usage: python benchmarks/bench_eeg_decoder.py [n_packets]
+"""
+import os
+import sys
+from timeit import repeat
+
+import bitstring
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from muselsl.muse import unpack_eeg_packets  # noqa: E402
+
+
+def unpack_bitstring(packet):
+    aa = bitstring.Bits(bytes=packet)
+    pattern = "uint:16,uint:12,uint:12,uint:12,uint:12,uint:12,uint:12, \
+               uint:12,uint:12,uint:12,uint:12,uint:12,uint:12"
+    res = aa.unpack(pattern)
+    return res[0], 0.48828125 * (np.array(res[1:]) - 2048)
+
+
+def best(func, number):
+    """Best time of func per call, in microseconds."""
+    return min(repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main(n_packets=10000):
+    rng = np.random.default_rng(0)
+    packets = rng.integers(0, 256, (n_packets, 20), dtype=np.uint8)
+    packet = packets[0].tobytes()
+    chunks = [p.tobytes() for p in packets]
+
+    print("per packet (us)")
+    t_bitstring = best(lambda: unpack_bitstring(packet), 2000)
+    t_numpy = best(lambda: unpack_eeg_packets(packet), 2000)
+    print("  bitstring        %8.2f" % t_bitstring)
+    print("  numpy            %8.2f  (%.1fx)" %
+          (t_numpy, t_bitstring / t_numpy))
+
+    print("%d packets (ms)" % n_packets)
+    t_bitstring = best(lambda: [unpack_bitstring(c) for c in chunks], 1) / 1e3
+    t_numpy = best(lambda: unpack_eeg_packets(packets), 10) / 1e3
+    print("  bitstring loop   %8.2f" % t_bitstring)
+    print("  numpy batch      %8.2f  (%.0fx)" %
+          (t_numpy, t_bitstring / t_numpy))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
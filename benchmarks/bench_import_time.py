@@ -0,0 +1,82 @@
+"""Time the imports each muselsl command pays for before it starts.
+
+Each command is imported in a fresh interpreter under `python -X importtime`,
+as the CLI does it: muselsl.cli, then the function the command runs, then the
+modules that function imports in its body before it gets going, with the
+default options. The cumulative times of the top-level imports are summed,
+best of --repeat runs.
+
+Not included: imports made only for other options (pygatt for the gatt and
+bgapi backends, pexpect when bluetoothctl lists the headsets, viewer_v2),
+and whatever the libraries import lazily once a headset or stream is found.
+
+Usage: python benchmarks/bench_import_time.py [command ...] [--repeat N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# command -> (submodule, function) imported by cli.CLI for it, and the
+# modules the function imports in its body with the default options; keep
+# them in step with the function bodies
+COMMANDS = {
+    'list': ('stream', 'list_muses', ['muselsl.backends']),
+    'stream': ('stream', 'stream', ['pylsl', 'muselsl.backends',
+                                    'muselsl.muse', 'muselsl.outlets']),
+    # pandas on the first flush of a CSV recording
+    'record': ('record', 'record', ['pandas']),
+    'record_direct': ('record', 'record_direct',
+                      ['bleak', 'pandas', 'muselsl.backends', 'muselsl.muse',
+                       'muselsl.stream']),
+    'view': ('view', 'view', ['muselsl.viewer_v1']),
+    'gateway': ('gateway', 'gateway', []),
+    'share': ('shared', 'share', ['pylsl']),
+    'replay': ('replay', 'replay', ['pylsl', 'muselsl.outlets']),
+    'stats': ('latency', 'stats', []),
+}
+
+
+def import_time(command):
+    """Summed top-level import time of a command in a new process, in ms."""
+    module, function, body = COMMANDS[command]
+    code = ('from muselsl.cli import CLI; from muselsl.%s import %s' %
+            (module, function))
+    code += ''.join('; import %s' % name for name in body)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True)
+    total = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split('|')
+        if not line.startswith('import time:') or len(fields) != 3:
+            continue
+        name = fields[2]
+        # nested imports are indented, and already in their parent's time
+        if name[1:2] != ' ' and fields[1].strip().isdigit():
+            total += int(fields[1])
+    return total / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('commands', nargs='*', metavar='command',
+                        help='one of %s (default: all)' % ', '.join(COMMANDS))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    for command in args.commands:
+        if command not in COMMANDS:
+            parser.error("unknown command %r" % command)
+
+    print("%-14s %10s" % ('command', 'import ms'))
+    for command in args.commands or COMMANDS:
+        best = min(import_time(command) for _ in range(args.repeat))
+        print("%-14s %10.0f" % (command, best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Time the placement of markers on samples when a recording is saved.
+
+Compares the per-marker np.argmin loop _save used to run with
+_nearest_indices, then times a whole _save of the block to a binary file.
+
+Usage: python benchmarks/bench_record_markers.py [seconds] [n_markers]
+"""
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from muselsl.record import (BinaryRecordingWriter, _nearest_indices,  # noqa
+                            _save)
+
+
+def timed(func, *args):
+    start = perf_counter()
+    result = func(*args)
+    return result, perf_counter() - start
+
+
+def argmin_indices(timestamps, times):
+    return np.array([np.argmin(np.abs(timestamps - t)) for t in times])
+
+
+def main(seconds=3600, n_markers=5000):
+    rng = np.random.default_rng(0)
+    n_samples = int(seconds * 256)
+    timestamps = 1.7e9 + np.arange(n_samples) / 256.
+    timestamps += rng.normal(0, 1e-3, n_samples)
+    data = rng.normal(0, 20, (n_samples, 5)).astype(np.float32)
+    marker_times = np.sort(rng.uniform(timestamps[0], timestamps[-1],
+                                       n_markers))
+    print("%d s of 256 Hz EEG, %d markers" % (seconds, n_markers))
+
+    expected, t_argmin = timed(argmin_indices, timestamps, marker_times)
+    ix, t_nearest = timed(_nearest_indices, timestamps, marker_times)
+    assert np.array_equal(ix, expected)
+    print("  argmin loop        %9.1f ms" % (t_argmin * 1e3))
+    print("  _nearest_indices   %9.1f ms  (%.0fx)" %
+          (t_nearest * 1e3, t_argmin / t_nearest))
+
+    markers = [([int(i)], t) for i, t in enumerate(marker_times)]
+    with tempfile.TemporaryDirectory() as directory:
+        writer = BinaryRecordingWriter(
+            os.path.join(directory, 'bench'),
+            ['TP9', 'AF7', 'AF8', 'TP10', 'Right AUX'], 1)
+        _, t_save = timed(_save, writer, [data], list(timestamps), 0., None,
+                          markers, True)
+        writer.close()
+    print("  _save              %9.1f ms" % (t_save * 1e3))
+
+
+if __name__ == '__main__':
+    main(*[float(arg) if i == 0 else int(arg)
+           for i, arg in enumerate(sys.argv[1:])])
@@ -0,0 +1,93 @@
+import time
+from collections import deque
+from threading import Event, Lock, Thread
+
+from brainflow.board_shim import BoardShim, BrainFlowInputParams
+
+
+class BoardManager:
+    """Owns a BrainFlow board session and scores it on its own thread.
+
+    The UI only reads latest_score and history(), so a Streamlit rerun never
+    waits on the board or the classifier.
+    """
+
+    def __init__(self, board_id, scorer, serial_port='', window_duration=4,
+                 refresh_interval=2, history_length=600):
+        self.board_id = board_id
+        self.scorer = scorer
+        self.serial_port = serial_port
+        self.window_duration = window_duration
+        self.refresh_interval = refresh_interval
+        self.eeg_channels = BoardShim.get_eeg_channels(board_id)
+        self.sampling_rate = BoardShim.get_sampling_rate(board_id)
+        self.buffer_size = self.sampling_rate * window_duration
+
+        self.board = None
+        self.latest_score = None
+        self.error = None
+        self._history = deque(maxlen=history_length)
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        BoardShim.enable_dev_board_logger()
+        params = BrainFlowInputParams()
+        params.serial_port = self.serial_port
+        board = BoardShim(self.board_id, params)
+        try:
+            board.prepare_session()
+            board.start_stream()
+        except Exception:
+            # e.g. a wrong serial port: leave no half-open session behind
+            if board.is_prepared():
+                board.release_session()
+            raise
+        self.board = board
+
+        self.error = None
+        self._stop.clear()
+        self._thread = Thread(target=self._poll, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.board is not None:
+            board, self.board = self.board, None
+            try:
+                board.stop_stream()
+            finally:
+                # released even if stopping the stream failed
+                board.release_session()
+
+    def history(self):
+        """Copy of the (timestamp, score) pairs, oldest first."""
+        with self._lock:
+            return list(self._history)
+
+    def _poll(self):
+        next_update = time.monotonic() + self.refresh_interval
+        # fixed cadence: sleep until the next slot rather than a fixed delay
+        while not self._stop.wait(max(0., next_update - time.monotonic())):
+            next_update += self.refresh_interval
+            try:
+                data = self.board.get_current_board_data(self.buffer_size)
+                if data.shape[1] < self.buffer_size:
+                    continue
+                score = self.scorer.predict(data, self.eeg_channels, self.sampling_rate)
+            except Exception as e:
+                self.error = e
+                continue
+            with self._lock:
+                self.latest_score = score
+                self._history.append((time.time(), score))
@@ -1,10 +1,19 @@
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
-import time
 import random
 from datetime import datetime, timedelta
+import atexit
 import pandas as pd
-from focus import get_mindfulness_score, setup_board
+
+from brainflow.board_shim import BoardIds
+
+from board_manager import BoardManager
+from mindfulness import MindfulnessScorer
+
+SERIAL_PORT = '/dev/cu.usbserial-D200QSOE'  # Change if needed
+BOARD_ID = BoardIds.CYTON_BOARD.value
+WINDOW_DURATION = 10  # seconds of data per calculation
+REFRESH_INTERVAL = 5  # seconds between updates
 
 # 🔧 Set up page and refresh
 st.set_page_config(page_title="Caddy.ai", layout="centered")
@@ -24,33 +33,42 @@ if "visible_focus_log" not in st.session_state:
 
 
 
-# Run tracking loop
-if st.session_state.running:
-    board, board_id, eeg_channels, sampling_rate = setup_board()
-    
-    window_duration = 10  # seconds of data per calculation
-    refresh_interval = 5  # seconds between updates
-    buffer_size = sampling_rate * window_duration
+@st.cache_resource
+def get_scorer():
+    # the classifier is prepared once per server and released at exit
+    scorer = MindfulnessScorer()
+    atexit.register(scorer.release)
+    return scorer
 
-    st.success("Tracking started. Live mindfulness scores below.")
 
-    try:
-        while st.session_state.running:
-            time.sleep(refresh_interval)
-            data = board.get_current_board_data(buffer_size)
-            score = get_mindfulness_score(data, eeg_channels, sampling_rate)
-            focus_score = score
-            st.session_state.scores.append(score)
-            #score_chart.add_rows([[score]])
-            st.write(f"Latest Mindfulness Score: **{score:.2f}**")
-            #st.write(score)
+@st.cache_resource
+def get_board_manager():
+    # one board session per server, polled and scored on its own thread
+    manager = BoardManager(BOARD_ID, get_scorer(), SERIAL_PORT,
+                           window_duration=WINDOW_DURATION,
+                           refresh_interval=REFRESH_INTERVAL)
+    atexit.register(manager.stop)
+    return manager
 
+
+# Run tracking on the manager's thread, reruns only read its latest score
+manager = get_board_manager()
+if not manager.running:
+    try:
+        manager.start()
     except Exception as e:
         st.error(f"Error: {e}")
-    finally:
-        board.stop_stream()
-        board.release_session()
-        st.success("Tracking stopped.")
+        st.stop()
+
+if manager.error is not None:
+    st.error(f"Error: {manager.error}")
+
+focus_score = manager.latest_score
+if focus_score is None:
+    st.info("Waiting for the first mindfulness score...")
+    st.stop()
+st.success("Tracking started. Live mindfulness scores below.")
+st.write(f"Latest Mindfulness Score: **{focus_score:.2f}**")
 
 
 timestamp = datetime.now().isoformat()
@@ -8,6 +8,13 @@ import time
 import altair as alt
 import random
 
+try:
+   # score and render latencies for `muselsl stats`, when this repo's
+   # muselsl is importable (e.g. PYTHONPATH set to the repo root)
+   from muselsl import latency
+except ImportError:
+   latency = None
+
 
 st.set_page_config(page_title="Caddy.ai + Muse 2", layout="centered")
 st_autorefresh(interval=2000, key="focus_refresh")
@@ -40,27 +47,43 @@ if "inlet" not in st.session_state:
        st.error("No EEG stream found. Please run 'muselsl stream' in a terminal.")
        st.stop()
    st.session_state.inlet = StreamInlet(streams[0])
+   st.session_state.eeg_data = np.zeros((0, st.session_state.inlet.info().channel_count()))
+   st.session_state.eeg_times = np.zeros(0)
    st.success("✅ Connected to Muse EEG stream.")
 inlet = st.session_state.inlet
 
 
+def latest_window(n_samples):
+   """Most recent n_samples as (data, timestamps), None until enough arrived.
+
+   Everything the inlet buffered since the last rerun is drained without
+   waiting, so a rerun never blocks on the stream and no sample is skipped.
+   """
+   while True:
+      samples, timestamps = inlet.pull_chunk(timeout=0.0, max_samples=1024)
+      if not timestamps:
+         break
+      if latency and latency.ENABLED:
+         latency.record("pull", latency.sample_age(timestamps[-1]))
+      st.session_state.eeg_data = np.concatenate(
+         [st.session_state.eeg_data, samples])[-n_samples:]
+      st.session_state.eeg_times = np.concatenate(
+         [st.session_state.eeg_times, timestamps])[-n_samples:]
+   if len(st.session_state.eeg_times) < n_samples:
+      return None
+   return st.session_state.eeg_data, st.session_state.eeg_times
+
+
 # --- Calibration ---
 if not st.session_state.calibrated:
    st.title("🧘 Calibration In Progress")
    st.info(f"Step {st.session_state.calibration_steps + 1} of 6 – Please sit still...")
 
 
-   eeg_window = [[], [], [], []]
-   collected = 0
-   while collected < 256:
-       sample, _ = inlet.pull_sample(timeout=0.1)
-       if sample and len(sample) >= 4:
-           for i in range(4):
-               eeg_window[i].append(sample[i])
-           collected += 1
-
-
-   eeg_data = np.array(eeg_window)
+   window = latest_window(256)
+   if window is None or np.isnan(window[0]).any():
+      st.stop()
+   eeg_data = window[0][:, :4].T
    avg_power = np.mean(np.mean(np.square(eeg_data), axis=1))
 
 
@@ -81,21 +104,11 @@ if not st.session_state.calibrated:
 
 # --- Get Focus Score ---
 def get_focus_score():
-   eeg_window = [[], [], [], []]
-   samples_needed = 256
-   start_time = time.time()
-
-
-   while len(eeg_window[0]) < samples_needed:
-       if time.time() - start_time > 10:
-           return st.session_state.latest_focus
-       sample, _ = inlet.pull_sample(timeout=1.0)
-       if sample and len(sample) >= 4:
-           for i in range(4):
-               eeg_window[i].append(sample[i])
-
-
-   eeg_data = np.array(eeg_window)
+   window = latest_window(256)
+   # windows straddling lost packets (NaN with --fill-gaps nan) are skipped
+   if window is None or np.isnan(window[0]).any():
+      return st.session_state.latest_focus
+   eeg_data = window[0][:, :4].T  # TP9, AF7, AF8, TP10
    avg_power = np.mean(np.mean(np.square(eeg_data), axis=1))
 
 
@@ -104,6 +117,10 @@ def get_focus_score():
    power_clipped = np.clip(avg_power, focus_max, focus_min)
    normalized = 10 - ((power_clipped - focus_max) / (focus_min - focus_max)) * 9.0
    score = round(min(max(1.0, normalized), 10.0), 2)
+   if latency and latency.ENABLED:
+       # age of the newest sample behind the score, see `muselsl stats`
+       latency.record("score", latency.sample_age(window[1][-1]))
+       st.session_state.scored_sample_time = window[1][-1]
    return score
 
 
@@ -224,6 +241,8 @@ def home():
    toggle_session()
    show_timer()
    st.metric("🧠 Focus Score", focus_score)
+   if latency and latency.ENABLED and "scored_sample_time" in st.session_state:
+       latency.record("render", latency.sample_age(st.session_state.scored_sample_time))
    if focus_score < 2.2:
        st.error("🔴 Nudge Triggered: Take a Breath")
    else:
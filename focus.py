@@ -1,35 +1,35 @@
 import streamlit as st
-import time
-import numpy as np
+from streamlit_autorefresh import st_autorefresh
+import atexit
+import pandas as pd
 
-from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds
-from brainflow.data_filter import DataFilter
-from brainflow.ml_model import MLModel, BrainFlowMetrics, BrainFlowClassifiers, BrainFlowModelParams
+from brainflow.board_shim import BoardIds
 
+from board_manager import BoardManager
+from mindfulness import MindfulnessScorer
 
-def setup_board():
-    BoardShim.enable_dev_board_logger()
-    params = BrainFlowInputParams()
-    params.serial_port = '/dev/cu.usbserial-D200QSOE'  # Change if needed
-    board_id = BoardIds.CYTON_BOARD.value
-    board = BoardShim(board_id, params)
-    board.prepare_session()
-    board.start_stream()
-    eeg_channels = BoardShim.get_eeg_channels(board_id)
-    sampling_rate = BoardShim.get_sampling_rate(board_id)
-    return board, board_id, eeg_channels, sampling_rate
+SERIAL_PORT = '/dev/cu.usbserial-D200QSOE'  # Change if needed
+BOARD_ID = BoardIds.CYTON_BOARD.value
+WINDOW_DURATION = 4  # seconds of data per calculation
+REFRESH_INTERVAL = 2  # seconds between updates
 
 
-def get_mindfulness_score(data, eeg_channels, sampling_rate):
-    bands = DataFilter.get_avg_band_powers(data, eeg_channels, sampling_rate, apply_filter=True)
-    feature_vector = bands[0]
-    mindfulness_params = BrainFlowModelParams(BrainFlowMetrics.MINDFULNESS.value,
-                                              BrainFlowClassifiers.DEFAULT_CLASSIFIER.value)
-    mindfulness = MLModel(mindfulness_params)
-    mindfulness.prepare()
-    score = mindfulness.predict(feature_vector)
-    mindfulness.release()
-    return score
+@st.cache_resource
+def get_scorer():
+    # the classifier is prepared once per server and released at exit
+    scorer = MindfulnessScorer()
+    atexit.register(scorer.release)
+    return scorer
+
+
+@st.cache_resource
+def get_board_manager():
+    # one board session per server, polled and scored on its own thread
+    manager = BoardManager(BOARD_ID, get_scorer(), SERIAL_PORT,
+                           window_duration=WINDOW_DURATION,
+                           refresh_interval=REFRESH_INTERVAL)
+    atexit.register(manager.stop)
+    return manager
 
 
 # Streamlit UI
@@ -37,45 +37,29 @@ st.title("🧠 Real-Time Mindfulness Tracker")
 start_button = st.button("Start Mindfulness Tracking")
 stop_button = st.button("Stop")
 
-if 'running' not in st.session_state:
-    st.session_state.running = False
+manager = get_board_manager()
 
 # Control logic
 if start_button:
-    st.session_state.running = True
-    st.session_state.scores = []
+    try:
+        manager.start()
+    except Exception as e:
+        st.error(f"Error: {e}")
 elif stop_button:
-    st.session_state.running = False
-
-# Display plot placeholder
-score_chart = st.line_chart()
-
-# Run tracking loop
-if st.session_state.running:
-    board, board_id = setup_board()
-    eeg_channels = BoardShim.get_eeg_channels(board_id)
-    sampling_rate = BoardShim.get_sampling_rate(board_id)
-
-    window_duration = 4  # seconds of data per calculation
-    refresh_interval = 2  # seconds between updates
-    buffer_size = sampling_rate * window_duration
+    manager.stop()
+    st.success("Tracking stopped.")
 
+if manager.running:
+    # rerun on the scoring cadence, reads below never block
+    st_autorefresh(interval=REFRESH_INTERVAL * 1000, key="score_refresh")
     st.success("Tracking started. Live mindfulness scores below.")
 
-    try:
-        while st.session_state.running:
-            time.sleep(refresh_interval)
-            data = board.get_current_board_data(buffer_size)
-            score = get_mindfulness_score(data, eeg_channels, sampling_rate)
-            st.session_state.scores.append(score)
-            score_chart.add_rows([[score]])
-            st.write(f"Latest Mindfulness Score: **{score:.2f}**")
-            st.write(score)
-
-    except Exception as e:
-        st.error(f"Error: {e}")
-    finally:
-        board.stop_stream()
-        board.release_session()
-        st.success("Tracking stopped.")
+if manager.error is not None:
+    st.error(f"Error: {manager.error}")
 
+history = manager.history()
+if history:
+    scores = pd.DataFrame(history, columns=["Time", "Mindfulness"])
+    scores["Time"] = pd.to_datetime(scores["Time"], unit="s")
+    st.line_chart(scores.set_index("Time"))
+    st.write(f"Latest Mindfulness Score: **{manager.latest_score:.2f}**")
@@ -0,0 +1,215 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+NUDGE_THRESHOLD = 2.2
+# Scores are rounded to this many decimals before they are logged. They are
+# stored as float32 and rounded back when read out, so that e.g. 3.47 is
+# not shown as 3.4700000286.
+SCORE_DECIMALS = 2
+
+# Most points drawn by a focus trend chart, besides the putt markers
+MAX_CHART_POINTS = 400
+
+# Chart label and color of a putt, by result (a nudge takes precedence)
+PUTT_EVENTS = {"nudge": ("Nudge", "yellow"), "made": ("Made", "green"), "miss": ("Miss", "red")}
+
+
+class FocusLog:
+    """Focus scores in growable NumPy columns, queried by time with searchsorted.
+
+    Timestamps are POSIX seconds (float64) and must be appended in increasing
+    order; scores are float32. Counts of scores below `threshold` are kept as a
+    running sum so that nudge checks over any time window are O(log n), and the
+    local datetimes used for charts are converted once, as samples arrive.
+    """
+
+    def __init__(self, threshold=NUDGE_THRESHOLD, capacity=256):
+        self.threshold = threshold
+        self._times = np.empty(capacity, dtype=np.float64)
+        self._scores = np.empty(capacity, dtype=np.float32)
+        self._low = np.empty(capacity, dtype=np.int64)
+        self._local = np.empty(capacity, dtype="datetime64[us]")
+        self._n = 0
+
+    @classmethod
+    def from_arrays(cls, times, scores, threshold=NUDGE_THRESHOLD):
+        """Log holding existing timestamp and score columns, e.g. loaded from disk."""
+        n = len(times)
+        log = cls(threshold, max(n, 1))
+        log._times[:n] = times
+        log._scores[:n] = scores
+        log._low[:n] = np.cumsum(log._scores[:n] < threshold)
+        log._local[:n] = [datetime.fromtimestamp(t) for t in log._times[:n]]
+        log._n = n
+        return log
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def times(self):
+        return self._times[:self._n]
+
+    @property
+    def scores(self):
+        return self._scores[:self._n]
+
+    def append(self, timestamp, score):
+        if self._n == len(self._times):
+            # double the capacity so that appends stay amortized O(1)
+            for name in ("_times", "_scores", "_low", "_local"):
+                column = getattr(self, name)
+                grown = np.empty(2 * len(column), dtype=column.dtype)
+                grown[:self._n] = column[:self._n]
+                setattr(self, name, grown)
+        low = self._low[self._n - 1] if self._n else 0
+        self._times[self._n] = timestamp
+        self._scores[self._n] = score
+        self._low[self._n] = low + (score < self.threshold)
+        self._local[self._n] = datetime.fromtimestamp(timestamp)
+        self._n += 1
+
+    def copy(self):
+        log = FocusLog(self.threshold, max(self._n, 1))
+        for name in ("_times", "_scores", "_low", "_local"):
+            getattr(log, name)[:self._n] = getattr(self, name)[:self._n]
+        log._n = self._n
+        return log
+
+    def _span(self, t0, t1):
+        """Index range of the samples with t0 <= timestamp <= t1."""
+        return (np.searchsorted(self.times, t0, side="left"),
+                np.searchsorted(self.times, t1, side="right"))
+
+    def any_below(self, threshold, t0=-np.inf, t1=np.inf):
+        """True if a score below threshold was logged between t0 and t1."""
+        i0, i1 = self._span(t0, t1)
+        if i0 >= i1:
+            return False
+        if threshold == self.threshold:
+            before = self._low[i0 - 1] if i0 else 0
+            return bool(self._low[i1 - 1] > before)
+        return bool((self.scores[i0:i1] < threshold).any())
+
+    def last_before(self, t):
+        """(timestamp, score) of the last sample strictly before t, or None."""
+        i = np.searchsorted(self.times, t, side="left")
+        if i == 0:
+            return None
+        return (float(self._times[i - 1]),
+                round(float(self._scores[i - 1]), SCORE_DECIMALS))
+
+    def nearest(self, times):
+        """Index of the sample closest to each of times (ties go to the earlier one)."""
+        times = np.asarray(times, dtype=np.float64)
+        if self._n < 2:
+            return np.zeros(len(times), dtype=np.int64)
+        right = np.clip(np.searchsorted(self.times, times), 1, self._n - 1)
+        left = right - 1
+        closer_left = np.abs(times - self._times[left]) <= np.abs(self._times[right] - times)
+        return np.where(closer_left, left, right)
+
+    def to_frame(self, index=None):
+        """DataFrame with local "timestamp" datetimes and "focus" scores.
+
+        Only the samples at index are included if it is given.
+        """
+        local, scores = self._local[:self._n], self.scores
+        if index is not None:
+            local, scores = local[index], scores[index]
+        return pd.DataFrame({"timestamp": local,
+                             "focus": np.round(scores.astype(np.float64),
+                                               SCORE_DECIMALS)})
+
+
+class FocusTrend:
+    """Chart points of a growing FocusLog, updated with only the new samples.
+
+    The samples are split in buckets of `size` samples and the lowest and
+    highest score of each are kept, with the first and last samples, so that
+    dips below the nudge threshold survive the reduction. When the buckets
+    reach max_points // 2, neighbours are merged and `size` doubles, so an
+    update costs O(new samples) however long the session gets.
+    """
+
+    def __init__(self, max_points=MAX_CHART_POINTS):
+        self.max_buckets = max(2, max_points // 4 * 2)
+        self.size = 1
+        self._mins = []
+        self._maxs = []
+        # min and max of the bucket being filled
+        self._lo = self._hi = 0
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def update(self, focus_log):
+        """Add the samples appended to focus_log since the last update."""
+        scores = focus_log.scores
+        while self._n < len(focus_log):
+            start = self._n
+            fill = start - len(self._mins) * self.size
+            end = min(len(focus_log), start - fill + self.size)
+            lo = start + int(np.argmin(scores[start:end]))
+            hi = start + int(np.argmax(scores[start:end]))
+            # ties go to the earlier sample, as with argmin over the bucket
+            if not fill or scores[lo] < scores[self._lo]:
+                self._lo = lo
+            if not fill or scores[hi] > scores[self._hi]:
+                self._hi = hi
+            self._n = end
+            if end - start + fill == self.size:
+                self._mins.append(self._lo)
+                self._maxs.append(self._hi)
+                if len(self._mins) == self.max_buckets:
+                    self._merge(scores)
+
+    def _merge(self, scores):
+        pairs = np.arange(self.max_buckets // 2)
+        mins = np.reshape(self._mins, (-1, 2))
+        maxs = np.reshape(self._maxs, (-1, 2))
+        self._mins = mins[pairs, (scores[mins[:, 1]] < scores[mins[:, 0]]).astype(int)].tolist()
+        self._maxs = maxs[pairs, (scores[maxs[:, 1]] > scores[maxs[:, 0]]).astype(int)].tolist()
+        self.size *= 2
+
+    def downsample(self):
+        """Sorted indices of the samples kept for the chart."""
+        if not self._n:
+            return np.arange(0)
+        keep = self._mins + self._maxs + [0, self._n - 1]
+        if self._n > len(self._mins) * self.size:
+            keep += [self._lo, self._hi]
+        return np.unique(keep)
+
+    def to_frame(self, focus_log, putt_log):
+        """Kept samples and every annotated putt sample, with event and color
+        columns. The putt samples are always included, exactly."""
+        annotated, events, colors = annotate_putts(focus_log, putt_log)
+        keep = np.union1d(self.downsample(), annotated)
+        frame = focus_log.to_frame(keep)
+        frame["event"], frame["color"] = "", "purple"
+        rows = np.searchsorted(keep, annotated)
+        frame.loc[rows, "event"], frame.loc[rows, "color"] = events, colors
+        return frame
+
+
+def annotate_putts(focus_log, putt_log):
+    """Sorted sample indices marking the putts, with their event labels and colors.
+
+    Each putt is put on its closest focus sample, and a nudge takes
+    precedence over the result.
+    """
+    putts = [("nudge" if putt["nudge"] else putt["result"], putt["timestamp"]) for putt in putt_log]
+    putts = [(kind, timestamp) for kind, timestamp in putts if kind in PUTT_EVENTS]
+    if not putts or not len(focus_log):
+        return np.arange(0), np.array([], dtype=object), np.array([], dtype=object)
+    kinds, timestamps = zip(*putts)
+    putt_times = [datetime.fromisoformat(timestamp).timestamp() for timestamp in timestamps]
+    closest = focus_log.nearest(putt_times)
+    # when two putts share a sample the later one wins
+    closest, last = np.unique(closest[::-1], return_index=True)
+    labels = np.array([PUTT_EVENTS[kind] for kind in kinds], dtype=object)[::-1][last]
+    return closest, labels[:, 0], labels[:, 1]
@@ -0,0 +1,46 @@
+from threading import Lock
+
+import numpy as np
+
+from brainflow.data_filter import DataFilter
+from brainflow.ml_model import MLModel, BrainFlowMetrics, BrainFlowClassifiers, BrainFlowModelParams
+
+
+class MindfulnessScorer:
+    """BrainFlow mindfulness classifier, prepared once and reused for every score.
+
+    BrainFlow allows a single prepared instance of each classifier, so keep one
+    scorer per process (e.g. in st.cache_resource) and share it between sessions.
+    """
+
+    def __init__(self, metric=BrainFlowMetrics.MINDFULNESS,
+                 classifier=BrainFlowClassifiers.DEFAULT_CLASSIFIER):
+        params = BrainFlowModelParams(metric.value, classifier.value)
+        self.model = MLModel(params)
+        self.model.prepare()
+        self.prepared = True
+        self._lock = Lock()
+
+    @staticmethod
+    def features(data, eeg_channels, sampling_rate):
+        bands = DataFilter.get_avg_band_powers(data, eeg_channels, sampling_rate, apply_filter=True)
+        return bands[0]
+
+    def predict(self, data, eeg_channels, sampling_rate):
+        """Score one window of board data (rows x samples)."""
+        feature_vector = self.features(data, eeg_channels, sampling_rate)
+        with self._lock:
+            score = self.model.predict(feature_vector)
+        return float(np.ravel(score)[0])
+
+    def release(self):
+        with self._lock:
+            if self.prepared:
+                self.model.release()
+                self.prepared = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -1,4 +1,48 @@
-from .stream import stream, list_muses
-from .record import record, record_direct
-from .view import view
+import sys
+from importlib import import_module
+from types import ModuleType
+
 __version__ = "2.3.1"
+
+# Public functions and the submodule defining them. Submodules are imported
+# on first access, so that each command only pays for the dependencies it
+# uses (pylsl, bleak, pandas, matplotlib, ...).
+_PUBLIC = {
+    'stream': 'stream',
+    'list_muses': 'stream',
+    'gateway': 'gateway',
+    'record': 'record',
+    'record_direct': 'record',
+    'read_binary_recording': 'record',
+    'share': 'shared',
+    'SharedRing': 'shared',
+    'replay': 'replay',
+    'SyntheticEEG': 'replay',
+    'stats': 'latency',
+    'view': 'view',
+}
+
+
+def __getattr__(name):
+    if name not in _PUBLIC:
+        raise AttributeError(
+            "module %r has no attribute %r" % (__name__, name))
+    value = getattr(import_module('.' + _PUBLIC[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_PUBLIC))
+
+
+class _Package(ModuleType):
+    def __setattr__(self, name, value):
+        # Importing a submodule binds it on the package, which would hide the
+        # function of the same name (muselsl.stream, muselsl.record, ...).
+        if isinstance(value, ModuleType) and _PUBLIC.get(name) == name:
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
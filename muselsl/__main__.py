@@ -27,7 +27,28 @@ def main():
                 --disable-light Turn off light on the Muse S headband'
                 --lsltime       Use pylsl's local_clock() for timestamps instead of Python's time.time()
                 --preset        Select preset which dictates data channels to be streamed
+                --chunk-packets Push to LSL once this many packets have been received
+                --chunk-ms      Push to LSL once the oldest buffered packet is this many ms old
+                --fill-gaps     Fill lost EEG packets with NaN or interpolated samples (nan or interpolate)
                 
+    gateway     Stream many Muse headsets to LSL from a single process.
+                -a --address    Device MAC address, repeat for several devices.
+                -n --name       Device name (e.g. Muse-41D2), repeat for several devices.
+                -b --backend    BLE backend to use. Only bleak (or auto) is supported.
+                -p --ppg        Include PPG data
+                -c --acc        Include accelerometer data
+                -g --gyro       Include gyroscope data
+                -l --log        Set the logging level
+                -r --retries    How many times to retry the initial connection to each device
+                -s --stats-interval  Print per-device throughput every this many seconds
+                --disable-eeg   Disable EEG data
+                --disable-light Turn off light on the Muse S headband
+                --lsltime       Use pylsl's local_clock() for timestamps instead of Python's time.time()
+                --preset        Select preset which dictates data channels to be streamed
+                --chunk-packets Push to LSL once this many packets have been received
+                --chunk-ms      Push to LSL once the oldest buffered packet is this many ms old
+                --fill-gaps     Fill lost EEG packets with NaN or interpolated samples (nan or interpolate)
+
     view     Visualize EEG data from an LSL stream.
                 -w --window     Window length to display in seconds.
                 -s --scale      Scale in uV.
@@ -41,6 +62,35 @@ def main():
                 -f --filename   Name of the recording file.
                 -dj --dejitter  Whether to apply dejitter correction to timestamps.
                 -t --type       Data type to record from. Either EEG, PPG, ACC, or GYRO 
+                -F --format     File format: csv, or binary float32 records with a JSON sidecar.
+
+    share    Copy an LSL stream into shared memory for local consumers.
+                -t --type       Data type to share. Either EEG, PPG, ACC, or GYRO
+                -n --name       Name of the shared-memory block. Defaults to muselsl_<type>.
+                -w --window     Seconds of data kept in the ring buffer.
+
+    replay   Stream a recording or a synthetic signal to LSL as if from a Muse.
+                -f --filename   Recording to replay (csv or binary). Synthetic data if omitted.
+                -t --type       Data type to stream. Either EEG, PPG, ACC, or GYRO
+                -s --speed      Playback speed, as a multiple of real time.
+                -d --duration   Seconds of data to stream.
+                -n --name       Name of the LSL stream.
+                --loop          Start the recording over when it ends.
+                --band          Synthetic band amplitude as BAND=UV (e.g. alpha=20), repeatable.
+                --noise         Std of the synthetic white noise in uV.
+                --blinks        Synthetic eye blinks per minute.
+                --loss          Probability of dropping each packet.
+                --jitter-ms     Std of the timestamp jitter added to each packet, in ms.
+                --seed          Seed of the synthetic signal, packet loss and jitter.
+                --lsltime       Use pylsl's local_clock() for timestamps instead of Python's time.time()
+                --chunk-packets Push to LSL once this many packets have been buffered
+                --chunk-ms      Push to LSL once the oldest buffered packet is this many ms old
+
+    stats    Show per-stage latencies (receive, decode, correct, push, pull, score, render).
+             Processes started with MUSELSL_STATS_DIR set dump them to that directory.
+                -d --directory  Directory the latencies are dumped to. Defaults to $MUSELSL_STATS_DIR.
+                -p --prometheus Print the merged histograms in the Prometheus text format.
+                -w --watch      Refresh every this many seconds.
 
     record_direct      Record data directly from Muse headset (no LSL).
                 -a --address    Device MAC address.
@@ -0,0 +1,83 @@
+from threading import Lock, Thread
+
+import numpy as np
+from pylsl import StreamInlet, resolve_byprop
+
+from . import latency
+from .constants import (ACQUISITION_BUFFER_LENGTH, ACQUISITION_PULL_TIMEOUT,
+                        LSL_SCAN_TIMEOUT)
+
+
+class EEGAcquisition():
+    """Continuously drain an LSL stream into a ring buffer on a thread.
+
+    Consumers that only need the most recent window (e.g. a Streamlit page
+    rerun every few seconds) read it with latest() instead of blocking on
+    pull_sample, and no sample is dropped between reads.
+    """
+
+    def __init__(self, stream_type='EEG',
+                 buffer_length=ACQUISITION_BUFFER_LENGTH,
+                 timeout=LSL_SCAN_TIMEOUT):
+        self.stream_type = stream_type
+        self.buffer_length = buffer_length
+        self.timeout = timeout
+        self.started = False
+        self.n_received = 0
+        self._lock = Lock()
+
+    def start(self):
+        """Connect to the stream and start acquiring in the background"""
+        streams = resolve_byprop('type', self.stream_type,
+                                 timeout=self.timeout)
+        if len(streams) == 0:
+            raise(RuntimeError("Can't find %s stream." % self.stream_type))
+
+        self.inlet = StreamInlet(streams[0])
+        info = self.inlet.info()
+        self.sfreq = info.nominal_srate()
+        self.n_chan = info.channel_count()
+
+        self.n_samples = int(self.sfreq * self.buffer_length)
+        self.data = np.zeros((self.n_samples, self.n_chan))
+        self.timestamps = np.zeros(self.n_samples)
+        self._index = 0
+
+        self.started = True
+        self.thread = Thread(target=self._acquire)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.started = False
+
+    def _acquire(self):
+        while self.started:
+            samples, timestamps = self.inlet.pull_chunk(
+                timeout=ACQUISITION_PULL_TIMEOUT, max_samples=self.n_samples)
+            if not timestamps:
+                continue
+            if latency.ENABLED:
+                latency.record('pull', latency.sample_age(timestamps[-1]))
+            samples = np.asarray(samples)
+            n = len(timestamps)
+            with self._lock:
+                # write with wrap-around, split in at most two slices
+                ix = (self._index + np.arange(n)) % self.n_samples
+                self.data[ix] = samples
+                self.timestamps[ix] = timestamps
+                self._index = (self._index + n) % self.n_samples
+                self.n_received += n
+
+    def latest(self, n_samples):
+        """Copy of the most recent n_samples as (data, timestamps).
+
+        data has shape [n_samples, n_channels]. Returns None until enough
+        samples have been received.
+        """
+        with self._lock:
+            if n_samples > min(self.n_received, self.n_samples):
+                return None
+            ix = (self._index - n_samples + np.arange(n_samples)) % \
+                self.n_samples
+            return self.data[ix], self.timestamps[ix]
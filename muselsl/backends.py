@@ -15,13 +15,20 @@ def _wait(coroutine):
 def sleep(seconds):
     time.sleep(seconds)
 
+# The blocking methods below drive the event loop with _wait. Each of them has
+# an awaitable *_async twin for callers that already run an asyncio event loop
+# (a web server, the Streamlit host, ...), where notifications are delivered
+# as soon as the loop gets control and no pumping is needed.
 class BleakBackend:
-    def __init__(self):
+    def __init__(self, blocking=True):
         self.connected = set()
-        atexit.register(self.stop)
-        # run the event loop when sleeping
-        global sleep
-        sleep = self.pump
+        # Only for the blocking methods: callers using the *_async ones own
+        # their event loop, which can't be driven from atexit or sleep.
+        if blocking:
+            atexit.register(self.stop)
+            # run the event loop when sleeping
+            global sleep
+            sleep = self.pump
     def start(self):
         pass
     def pump(self, seconds=1):
@@ -29,14 +36,21 @@ class BleakBackend:
     def stop(self):
         for device in [*self.connected]:
             device.disconnect()
+    async def stop_async(self):
+        for device in [*self.connected]:
+            await device.disconnect_async()
     def scan(self, timeout=10):
+        return _wait(self.scan_async(timeout))
+    async def scan_async(self, timeout=10):
         if isinstance(bleak, ModuleNotFoundError):
             raise bleak
-        devices = _wait(bleak.BleakScanner.discover(timeout))
+        devices = await bleak.BleakScanner.discover(timeout)
         return [{'name':device.name, 'address':device.address} for device in devices]
     def connect(self, address, retries):
+        return _wait(self.connect_async(address, retries))
+    async def connect_async(self, address, retries):
         result = BleakDevice(self, address)
-        if not result.connect(retries):
+        if not await result.connect_async(retries):
             return None
         return result
 
@@ -47,41 +61,52 @@ class BleakDevice:
         self._client = None
     # Use retries=-1 to continue attempting to reconnect forever
     def connect(self, retries):
+        return _wait(self.connect_async(retries))
+    async def connect_async(self, retries):
         attempts = 1
         while True:
             self._client = bleak.BleakClient(self._address)
             if attempts > 1:
                 print(f'Connection attempt {attempts}')
             try:
-                _wait(self._client.connect())
+                await self._client.connect()
             except (
                 bleak.exc.BleakDeviceNotFoundError, bleak.exc.BleakError
             ) as err:
                 print(f'Failed to connect: {err}', file=sys.stderr)
                 if attempts == 1 + retries:
                     return False
-                sleep(RETRY_SLEEP_TIMEOUT)
+                await asyncio.sleep(RETRY_SLEEP_TIMEOUT)
                 attempts += 1
             else:
                 break
         self._adapter.connected.add(self)
         return True
     def disconnect(self):
-        _wait(self._client.disconnect())
-        self._adapter.connected.remove(self)
+        _wait(self.disconnect_async())
+    async def disconnect_async(self):
+        try:
+            await self._client.disconnect()
+        finally:
+            # forgotten even when the link was already gone
+            self._adapter.connected.discard(self)
     # Characteristics have two handles: the declaration handle and the value handle.
     # Pygatt seems to use the value handle, which appears less common.  Bleak uses the
     # declaration handle used by d-bus.
     # With the muse, the declaration and value handles happen to be sequential.
     # So, we subtract 1 to get the declaration handle, and add 1 to get the value handle.
     def char_write_handle(self, value_handle, value, wait_for_response=True, timeout=30):
+        _wait(self.char_write_handle_async(value_handle, value, wait_for_response, timeout))
+    async def char_write_handle_async(self, value_handle, value, wait_for_response=True, timeout=30):
         declaration_handle = value_handle - 1
-        _wait(self._client.write_gatt_char(
+        await self._client.write_gatt_char(
             declaration_handle,
             bytearray(value),
-            wait_for_response))
+            wait_for_response)
     def subscribe(self, uuid, callback=None, indication=False, wait_for_response=True):
+        _wait(self.subscribe_async(uuid, callback, indication, wait_for_response))
+    async def subscribe_async(self, uuid, callback=None, indication=False, wait_for_response=True):
         def wrap(gatt_characteristic, data):
             value_handle = gatt_characteristic.handle + 1
             callback(value_handle, data)
-        _wait(self._client.start_notify(uuid, wrap))
+        await self._client.start_notify(uuid, wrap)
@@ -0,0 +1,105 @@
+import numpy as np
+
+# Frequency bands as (name, low, high, include_high), matching the classic
+# delta < 4 Hz, theta 4-8 Hz, alpha 8-12 Hz and beta 12-30 Hz split
+BANDS = (('delta', None, 4, False),
+         ('theta', 4, 8, True),
+         ('alpha', 8, 12, True),
+         ('beta', 12, 30, False))
+
+
+def nextpow2(i):
+    """
+    Find the next power of 2 for number i
+    """
+    n = 1
+    while n < i:
+        n *= 2
+    return n
+
+
+class BandPowerEngine():
+    """Band powers of fixed-length EEG epochs.
+
+    The Hamming window, FFT size and the FFT bins of each band are computed
+    once per (fs, epoch_length). All epochs and channels are then transformed
+    with a single vectorized rFFT call.
+
+    Features are ordered band-major: [delta of each channel, theta of each
+    channel, ...], as log10 of the mean spectral amplitude in each band.
+    """
+
+    def __init__(self, fs, epoch_length, bands=BANDS):
+        self.fs = fs
+        self.epoch_length = int(epoch_length)
+        self.bands = bands
+        self.n_fft = nextpow2(self.epoch_length)
+        self.window = np.hamming(self.epoch_length)
+
+        n_bins = int(self.n_fft / 2)
+        f = fs / 2 * np.linspace(0, 1, n_bins)
+        self.slices = []
+        for _, low, high, include_high in bands:
+            mask = f < high if not include_high else f <= high
+            if low is not None:
+                mask &= f >= low
+            ind, = np.where(mask)
+            self.slices.append(slice(ind[0], ind[-1] + 1))
+
+        self._buffer = None
+        self._n_buffered = 0
+
+    def compute(self, epochs):
+        """Band powers of one epoch or a stack of epochs.
+
+        epochs -- array of shape [epoch_length, n_channels] for one epoch, or
+                  [epoch_length, n_channels, n_epochs] as built by epoch()
+
+        Returns a feature vector of shape [n_bands * n_channels], or a feature
+        matrix of shape [n_epochs, n_bands * n_channels].
+        """
+        epochs = np.asarray(epochs, dtype=np.float64)
+        single = epochs.ndim == 2
+        if single:
+            epochs = epochs[:, :, np.newaxis]
+
+        # remove offset and apply the window along time, for every channel
+        # and epoch at once
+        centered = epochs - epochs.mean(axis=0)
+        windowed = centered * self.window[:, np.newaxis, np.newaxis]
+
+        Y = np.fft.rfft(windowed, n=self.n_fft, axis=0) / self.epoch_length
+        PSD = 2 * np.abs(Y[:int(self.n_fft / 2)])
+
+        # [n_bands, n_channels, n_epochs]
+        powers = np.stack([PSD[s].mean(axis=0) for s in self.slices])
+        features = np.log10(powers).reshape(-1, powers.shape[2]).T
+
+        return features[0] if single else features
+
+    def update(self, samples):
+        """Add new samples and return the band powers of the latest epoch.
+
+        samples -- array of shape [n_samples, n_channels], e.g. one hop of a
+                   sliding window
+
+        Returns None until a full epoch has been buffered, and for an empty
+        chunk of samples, which leaves the latest epoch as it was.
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if not len(samples):
+            return None
+        if samples.ndim == 1:
+            samples = samples[:, np.newaxis]
+        if self._buffer is None:
+            self._buffer = np.zeros((self.epoch_length, samples.shape[1]))
+
+        n = min(len(samples), self.epoch_length)
+        self._buffer[:-n] = self._buffer[n:]
+        self._buffer[-n:] = samples[-n:]
+        self._n_buffered = min(self._n_buffered + len(samples),
+                               self.epoch_length)
+
+        if self._n_buffered < self.epoch_length:
+            return None
+        return self.compute(self._buffer)
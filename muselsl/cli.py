@@ -1,7 +1,52 @@
 #!/usr/bin/python
 import sys
 import argparse
-from .constants import LOG_LEVELS
+from .constants import (GATEWAY_STATS_INTERVAL, LATENCY_STATS_DIR_ENV,
+                        LOG_LEVELS, REPLAY_NOISE, SHARED_BUFFER_LENGTH)
+
+
+def _band_amplitude(value):
+    """Parse a BAND=UV argument into a (band, amplitude) pair"""
+    # imported here so that the other commands don't load numpy
+    from .bandpower import BANDS
+    names = [band for band, _, _, _ in BANDS]
+    band, sep, uv = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(
+            "expected BAND=UV, e.g. alpha=10, got %r" % value)
+    if band not in names:
+        raise argparse.ArgumentTypeError(
+            "unknown band %r, choose from %s" % (band, ", ".join(names)))
+    try:
+        return band, float(uv)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "invalid amplitude %r for band %s" % (uv, band))
+
+
+def _chunk_packets(value):
+    """Parse --chunk-packets, a packet count of at least 1"""
+    try:
+        packets = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid packet count %r" % value)
+    if packets < 1:
+        raise argparse.ArgumentTypeError(
+            "must be at least 1 packet, got %d" % packets)
+    return packets
+
+
+def _chunk_ms(value):
+    """Parse --chunk-ms, a non-negative number of milliseconds"""
+    try:
+        ms = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid duration %r" % value)
+    if not ms >= 0:
+        raise argparse.ArgumentTypeError(
+            "must not be negative, got %s ms" % value)
+    return ms
+
 
 class CLI:
     def __init__(self, command):
@@ -36,7 +81,7 @@ class CLI:
             help='Set the logging level'
         )
         args = parser.parse_args(sys.argv[2:])
-        from . import list_muses
+        from .stream import list_muses
         list_muses(args.backend, args.interface, LOG_LEVELS[args.log_level])
 
     def stream(self):
@@ -120,6 +165,24 @@ class CLI:
             dest='retries',
             type=int,
             help="How many times to retry connecting to the device on a failed attempt")
+        parser.add_argument(
+            "--chunk-packets",
+            dest="chunk_packets",
+            type=_chunk_packets,
+            default=None,
+            help="Push to LSL once this many packets have been received")
+        parser.add_argument(
+            "--chunk-ms",
+            dest="chunk_ms",
+            type=_chunk_ms,
+            default=None,
+            help="Push to LSL once the oldest buffered packet is this many ms old")
+        parser.add_argument(
+            "--fill-gaps",
+            dest="fill_gaps",
+            choices=["nan", "interpolate"],
+            default=None,
+            help="Fill the samples of lost EEG packets with NaN or interpolated values")
         parser.add_argument(
             '-l',
             "--log", 
@@ -130,11 +193,291 @@ class CLI:
         )
 
         args = parser.parse_args(sys.argv[2:])
-        from . import stream
+        from .stream import stream
 
         stream(args.address, args.backend, args.interface, args.name, args.ppg,
                args.acc, args.gyro, args.disable_eeg, args.preset, args.disable_light,
-               args.lsl_time, args.retries, LOG_LEVELS[args.log_level])
+               args.lsl_time, args.retries, LOG_LEVELS[args.log_level],
+               args.chunk_packets, args.chunk_ms, args.fill_gaps)
+
+    def gateway(self):
+        parser = argparse.ArgumentParser(
+            description='Stream many Muse headsets to LSL from one process.')
+        parser.add_argument(
+            "-a",
+            "--address",
+            dest="addresses",
+            action="append",
+            default=None,
+            help="Device MAC address. Repeat to serve several devices.")
+        parser.add_argument(
+            "-n",
+            "--name",
+            dest="names",
+            action="append",
+            default=None,
+            help="Name of the device. Repeat to serve several devices.")
+        parser.add_argument(
+            "-b",
+            "--backend",
+            dest="backend",
+            type=str,
+            default="auto",
+            help="BLE backend to use. Only bleak (or auto) is supported.")
+        parser.add_argument("-P",
+            "--preset",
+            type=int,
+            default=None,
+            help="Select preset which dictates data channels to be streamed")
+        parser.add_argument(
+            "-p",
+            "--ppg",
+            default=False,
+            action="store_true",
+            help="Include PPG data")
+        parser.add_argument(
+            "-c",
+            "--acc",
+            default=False,
+            action="store_true",
+            help="Include accelerometer data")
+        parser.add_argument(
+            "-g",
+            "--gyro",
+            default=False,
+            action="store_true",
+            help="Include gyroscope data")
+        parser.add_argument(
+            '-d',
+            '--disable-eeg',
+            dest='disable_eeg',
+            action='store_true',
+            help="Disable EEG data")
+        parser.add_argument(
+            '-dl',
+            '--disable-light',
+            dest='disable_light',
+            action='store_true',
+            help='Turn off light on the Muse S headband')
+        parser.add_argument(
+            "-lslt",
+            "--lsltime",
+            default=False,
+            dest='lsl_time',
+            action="store_true",
+            help="Use pylsl's local_clock() for timestamps instead of Python's time.time()")
+        parser.add_argument(
+            "-r",
+            "--retries",
+            default=1,
+            dest='retries',
+            type=int,
+            help="How many times to retry the initial connection to each device")
+        parser.add_argument(
+            "--chunk-packets",
+            dest="chunk_packets",
+            type=_chunk_packets,
+            default=None,
+            help="Push to LSL once this many packets have been received")
+        parser.add_argument(
+            "--chunk-ms",
+            dest="chunk_ms",
+            type=_chunk_ms,
+            default=None,
+            help="Push to LSL once the oldest buffered packet is this many ms old")
+        parser.add_argument(
+            "-s",
+            "--stats-interval",
+            dest="stats_interval",
+            type=float,
+            default=GATEWAY_STATS_INTERVAL,
+            help="Print per-device throughput every this many seconds, 0 to disable")
+        parser.add_argument(
+            "--fill-gaps",
+            dest="fill_gaps",
+            choices=["nan", "interpolate"],
+            default=None,
+            help="Fill the samples of lost EEG packets with NaN or interpolated values")
+        parser.add_argument(
+            '-l',
+            "--log",
+            choices=LOG_LEVELS.keys(),
+            dest="log_level",
+            default='info',
+            help='Set the logging level'
+        )
+
+        args = parser.parse_args(sys.argv[2:])
+        from .gateway import gateway
+
+        gateway(args.addresses, args.names, args.backend, args.ppg, args.acc,
+                args.gyro, args.disable_eeg, args.preset, args.disable_light,
+                args.lsl_time, args.retries, LOG_LEVELS[args.log_level],
+                args.chunk_packets, args.chunk_ms, args.stats_interval,
+                args.fill_gaps)
+
+    def share(self):
+        parser = argparse.ArgumentParser(
+            description='Copy an LSL stream into shared memory for local consumers.')
+        parser.add_argument(
+            "-t",
+            "--type",
+            type=str,
+            default="EEG",
+            help="Data type to share. Either EEG, PPG, ACC, or GYRO.")
+        parser.add_argument(
+            "-n",
+            "--name",
+            dest="name",
+            type=str,
+            default=None,
+            help="Name of the shared-memory block. Defaults to muselsl_<type>.")
+        parser.add_argument(
+            "-w",
+            "--window",
+            dest="buffer_length",
+            type=float,
+            default=SHARED_BUFFER_LENGTH,
+            help="Seconds of data kept in the ring buffer.")
+
+        args = parser.parse_args(sys.argv[2:])
+        from .shared import share
+        share(args.type, args.name, args.buffer_length)
+
+    def replay(self):
+        parser = argparse.ArgumentParser(
+            description='Stream a recording or a synthetic signal to LSL as if from a Muse.')
+        parser.add_argument(
+            "-f",
+            "--filename",
+            dest="filename",
+            type=str,
+            default=None,
+            help="Recording to replay (csv, or binary with its JSON sidecar). Synthetic data if omitted.")
+        parser.add_argument(
+            "-t",
+            "--type",
+            type=str,
+            default="EEG",
+            help="Data type to stream. Either EEG, PPG, ACC, or GYRO.")
+        parser.add_argument(
+            "-s",
+            "--speed",
+            dest="speed",
+            type=float,
+            default=1.,
+            help="Playback speed, as a multiple of real time.")
+        parser.add_argument(
+            "-d",
+            "--duration",
+            dest="duration",
+            type=float,
+            default=None,
+            help="Seconds of data to stream. Endless for synthetic data if omitted.")
+        parser.add_argument(
+            "--loop",
+            default=False,
+            action="store_true",
+            help="Start the recording over when it ends.")
+        parser.add_argument(
+            "--band",
+            dest="bands",
+            type=_band_amplitude,
+            action="append",
+            default=None,
+            metavar="BAND=UV",
+            help="Amplitude in uV of a synthetic band rhythm (delta, theta, alpha or beta). Repeat for several bands.")
+        parser.add_argument(
+            "--noise",
+            dest="noise",
+            type=float,
+            default=REPLAY_NOISE,
+            help="Std of the synthetic white noise in uV.")
+        parser.add_argument(
+            "--blinks",
+            dest="blink_rate",
+            type=float,
+            default=0.,
+            help="Synthetic eye blinks per minute.")
+        parser.add_argument(
+            "--loss",
+            dest="loss",
+            type=float,
+            default=0.,
+            help="Probability of dropping each packet.")
+        parser.add_argument(
+            "--jitter-ms",
+            dest="jitter_ms",
+            type=float,
+            default=0.,
+            help="Std of the timestamp jitter added to each packet, in ms.")
+        parser.add_argument(
+            "-n",
+            "--name",
+            dest="name",
+            type=str,
+            default="Muse",
+            help="Name of the LSL stream.")
+        parser.add_argument(
+            "--seed",
+            dest="seed",
+            type=int,
+            default=None,
+            help="Seed of the synthetic signal, packet loss and jitter.")
+        parser.add_argument(
+            "--lsltime",
+            default=False,
+            dest='lsl_time',
+            action="store_true",
+            help="Use pylsl's local_clock() for timestamps instead of Python's time.time()")
+        parser.add_argument(
+            "--chunk-packets",
+            dest="chunk_packets",
+            type=_chunk_packets,
+            default=None,
+            help="Push to LSL once this many packets have been buffered")
+        parser.add_argument(
+            "--chunk-ms",
+            dest="chunk_ms",
+            type=_chunk_ms,
+            default=None,
+            help="Push to LSL once the oldest buffered packet is this many ms old")
+
+        args = parser.parse_args(sys.argv[2:])
+        bands = dict(args.bands) if args.bands else None
+        from .replay import replay
+        replay(args.filename, args.type, args.speed, args.duration, args.loop,
+               bands, args.noise, args.blink_rate, args.loss, args.jitter_ms,
+               name=args.name, lsl_time=args.lsl_time, seed=args.seed,
+               chunk_packets=args.chunk_packets, chunk_ms=args.chunk_ms)
+
+    def stats(self):
+        parser = argparse.ArgumentParser(
+            description='Show the pipeline latencies dumped by instrumented processes.')
+        parser.add_argument(
+            "-d",
+            "--directory",
+            dest="directory",
+            type=str,
+            default=None,
+            help="Directory the processes dump their latencies to. Defaults to $%s." % LATENCY_STATS_DIR_ENV)
+        parser.add_argument(
+            "-p",
+            "--prometheus",
+            default=False,
+            action="store_true",
+            help="Print the merged histograms in the Prometheus text format.")
+        parser.add_argument(
+            "-w",
+            "--watch",
+            dest="interval",
+            type=float,
+            default=None,
+            help="Refresh every this many seconds.")
+
+        args = parser.parse_args(sys.argv[2:])
+        from .latency import stats
+        stats(args.directory, args.prometheus, args.interval)
 
     def record(self):
         parser = argparse.ArgumentParser(
@@ -166,10 +509,18 @@ class CLI:
             type=str,
             default="EEG",
             help="Data type to record from. Either EEG, PPG, ACC, or GYRO.")
+        parser.add_argument(
+            "-F",
+            "--format",
+            dest="file_format",
+            choices=["csv", "binary"],
+            default="csv",
+            help="File format: csv, or binary float32 records with a JSON sidecar.")
 
         args = parser.parse_args(sys.argv[2:])
-        from . import record
-        record(args.duration, args.filename, args.dejitter, args.type)
+        from .record import record
+        record(args.duration, args.filename, args.dejitter, args.type,
+               file_format=args.file_format)
 
     def record_direct(self):
         parser = argparse.ArgumentParser(
@@ -218,7 +569,7 @@ class CLI:
             default=None,
             help="Name of the recording file.")
         args = parser.parse_args(sys.argv[2:])
-        from . import record_direct
+        from .record import record_direct
         record_direct(args.duration, args.address, args.filename, args.backend,
                       args.interface, args.name)
 
@@ -270,6 +621,6 @@ class CLI:
             default='TkAgg',
             help="Matplotlib backend to use. Default: %(default)s")
         args = parser.parse_args(sys.argv[2:])
-        from . import view
+        from .view import view
         view(args.window, args.scale, args.refresh, args.figure, args.version,
              args.backend)
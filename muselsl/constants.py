@@ -16,6 +16,11 @@ MUSE_NB_GYRO_CHANNELS = 3
 MUSE_SAMPLING_GYRO_RATE = 52
 LSL_GYRO_CHUNK = 1
 
+# Number of frames kept in the Muse sample assembly ring buffers
+MUSE_RING_FRAMES = 32
+# Longest EEG gap, in packets of 12 samples, filled in when fill_gaps is set
+MUSE_GAP_FILL_PACKETS = 64
+
 # 00001800-0000-1000-8000-00805f9b34fb Generic Access 0x05-0x0b
 # 00001801-0000-1000-8000-00805f9b34fb Generic Attribute 0x01-0x04
 MUSE_GATT_ATTR_SERVICECHANGED = '00002a05-0000-1000-8000-00805f9b34fb' # ble std 0x02-0x04
@@ -48,12 +53,44 @@ LIST_SCAN_TIMEOUT = 10.5
 AUTO_DISCONNECT_DELAY = 3
 # How long to wait in between connection attempts
 RETRY_SLEEP_TIMEOUT = 1
+# How often the gateway prints per-device throughput, in seconds
+GATEWAY_STATS_INTERVAL = 10
 
 LSL_SCAN_TIMEOUT = 5
 LSL_BUFFER = 360
 
+# How often record() appends new samples to the recording file, in seconds
+RECORD_FLUSH_INTERVAL = 5
+
 VIEW_SUBSAMPLE = 2
 VIEW_BUFFER = 12
+# Each level of the min/max envelope pyramid merges this many bins of the
+# level below
+VIEW_ENVELOPE_FACTOR = 2
+
+# Seconds of data kept by the background acquisition ring buffer
+ACQUISITION_BUFFER_LENGTH = 10
+# How long a background pull_chunk waits for data, in seconds
+ACQUISITION_PULL_TIMEOUT = 0.2
+
+# Seconds of data kept in the shared-memory ring, and its default name
+SHARED_BUFFER_LENGTH = 30
+SHARED_NAME = 'muselsl_%s'
+
+# Synthetic replay signal: amplitude in uV of the rhythm at the centre of each
+# band, white noise level in uV, and the amplitude and width in seconds of
+# the eye blinks added to the frontal channels
+REPLAY_BANDS = {'delta': 10., 'theta': 6., 'alpha': 12., 'beta': 4.}
+REPLAY_NOISE = 5.
+REPLAY_BLINK_AMPLITUDE = 150.
+REPLAY_BLINK_WIDTH = 0.1
+
+# Latency histograms: sub-buckets per power of two (HDR-style precision), how
+# often each instrumented process dumps them, and the environment variable
+# naming the directory they are dumped to (instrumentation is off if unset)
+LATENCY_SUB_BUCKET_BITS = 7
+LATENCY_DUMP_INTERVAL = 5
+LATENCY_STATS_DIR_ENV = 'MUSELSL_STATS_DIR'
 
 LOG_LEVELS = {
     'debug': logging.DEBUG,
@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class Dejitter():
+    """Online least-squares dejittering of LSL timestamps.
+
+    Fits timestamp = intercept + slope * sample_index over every sample seen
+    so far, like a batch LinearRegression on the whole history, but each
+    update only costs O(chunk): the fit is kept as running means and
+    co-moments that are merged chunk by chunk (Chan et al. pairwise update).
+    Timestamps are stored relative to the first one to keep precision.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.t0 = None
+        self.mean_x = 0.
+        self.mean_y = 0.
+        self.c_xx = 0.
+        self.c_xy = 0.
+
+    def update(self, timestamps):
+        """Add a chunk of timestamps to the fit.
+
+        Returns the dejittered timestamps of the chunk, predicted with the
+        fit that includes it.
+        """
+        y = np.asarray(timestamps, dtype=np.float64)
+        if not len(y):
+            return y
+        if self.t0 is None:
+            self.t0 = y[0]
+        y = y - self.t0
+        x = np.arange(self.n, self.n + len(y), dtype=np.float64)
+
+        n_b = len(y)
+        mean_x_b = x.mean()
+        mean_y_b = y.mean()
+        c_xx_b = np.dot(x - mean_x_b, x - mean_x_b)
+        c_xy_b = np.dot(x - mean_x_b, y - mean_y_b)
+
+        n = self.n + n_b
+        dx = mean_x_b - self.mean_x
+        dy = mean_y_b - self.mean_y
+        self.c_xx += c_xx_b + dx * dx * self.n * n_b / n
+        self.c_xy += c_xy_b + dx * dy * self.n * n_b / n
+        self.mean_x += dx * n_b / n
+        self.mean_y += dy * n_b / n
+        self.n = n
+
+        return self.predict(x)
+
+    @property
+    def slope(self):
+        return self.c_xy / self.c_xx if self.c_xx > 0 else 0.
+
+    def predict(self, sample_index):
+        """Dejittered timestamps of the given sample indices"""
+        sample_index = np.asarray(sample_index, dtype=np.float64)
+        return (self.t0 + self.mean_y +
+                self.slope * (sample_index - self.mean_x))
@@ -0,0 +1,84 @@
+import numpy as np
+
+from .constants import VIEW_ENVELOPE_FACTOR
+
+
+class MinMaxPyramid():
+    """Min/max envelope of a multichannel signal at several resolutions.
+
+    Level k keeps the min and max of consecutive bins of factor**(k + 1)
+    samples, for the last n_samples samples. Bins are updated as samples
+    arrive, so drawing a long window only costs as many points as there are
+    pixels, and short artifacts such as blinks survive the decimation.
+    Samples before the first push() read as zeros.
+    """
+
+    def __init__(self, n_samples, n_channels, factor=VIEW_ENVELOPE_FACTOR):
+        self.n_samples = n_samples
+        self.count = 0
+        self.bin_sizes = []
+        self.mins = []
+        self.maxs = []
+        size = factor
+        while size <= n_samples:
+            # room for a partial bin at both ends of the window
+            n_bins = n_samples // size + 2
+            self.bin_sizes.append(size)
+            self.mins.append(np.zeros((n_bins, n_channels)))
+            self.maxs.append(np.zeros((n_bins, n_channels)))
+            size *= factor
+
+    def push(self, samples):
+        samples = np.asarray(samples)
+        n = len(samples)
+        if n == 0:
+            return
+        skipped = max(0, n - self.n_samples)
+        if skipped:
+            # older samples would not fit in the window anyway
+            samples = samples[skipped:]
+            self.count += skipped
+            n -= skipped
+        for size, mins, maxs in zip(self.bin_sizes, self.mins, self.maxs):
+            first = self.count // size
+            # positions in samples where a new bin starts
+            starts = np.r_[0, np.arange((first + 1) * size, self.count + n,
+                                        size) - self.count]
+            bin_mins = np.minimum.reduceat(samples, starts, axis=0)
+            bin_maxs = np.maximum.reduceat(samples, starts, axis=0)
+            if self.count % size > skipped:
+                # the first bin already holds older samples
+                slot = first % len(mins)
+                bin_mins[0] = np.minimum(bin_mins[0], mins[slot])
+                bin_maxs[0] = np.maximum(bin_maxs[0], maxs[slot])
+            slots = (first + np.arange(len(starts))) % len(mins)
+            mins[slots] = bin_mins
+            maxs[slots] = bin_maxs
+        self.count += n
+
+    def level(self, n_samples, n_points):
+        """Coarsest level with at least n_points bins, None for raw samples"""
+        level = None
+        for ii, size in enumerate(self.bin_sizes):
+            if n_samples // size < n_points:
+                break
+            level = ii
+        return level
+
+    def envelope(self, n_samples, n_points):
+        """Envelope of the last n_samples samples, from oldest to newest.
+
+        Returns (offsets, mins, maxs) where offsets is the position of the
+        start of each bin relative to the next sample (-1 is the newest
+        sample), or None when the window is too short to need decimation
+        and the raw samples should be drawn instead.
+        """
+        level = self.level(n_samples, n_points)
+        if level is None:
+            return None
+        size = self.bin_sizes[level]
+        bins = np.arange((self.count - n_samples) // size,
+                         (self.count - 1) // size + 1)
+        slots = bins % len(self.mins[level])
+        return (bins * size - self.count, self.mins[level][slots],
+                self.maxs[level][slots])
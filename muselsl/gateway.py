@@ -0,0 +1,269 @@
+import asyncio
+import logging
+from time import time
+
+from pylsl import local_clock
+
+from . import backends, helper
+from .constants import (AUTO_DISCONNECT_DELAY, GATEWAY_STATS_INTERVAL,
+                        RETRY_SLEEP_TIMEOUT)
+from .muse import Muse
+from .outlets import create_gap_outlet, create_outlet, create_pusher
+from .stream import list_muses
+
+
+class GatewayDevice():
+    """One headset served by the gateway: its Muse, LSL outlets and counters"""
+
+    def __init__(self,
+                 address,
+                 name=None,
+                 sources=('EEG',),
+                 backend='bleak',
+                 preset=None,
+                 disable_light=False,
+                 time_func=time,
+                 chunk_packets=None,
+                 chunk_ms=None,
+                 fill_gaps=None,
+                 adapter=None,
+                 log_level=logging.ERROR):
+        self.address = address
+        self.name = name
+        self.time_func = time_func
+
+        # each device gets its own outlets, named after the headset so that
+        # consumers can tell the players apart
+        self.pushers = {}
+        for source in sources:
+            outlet = create_outlet(source, address, name or 'Muse')
+            self.pushers[source] = create_pusher(
+                outlet, source, chunk_packets=chunk_packets,
+                chunk_ms=chunk_ms, time_func=time_func)
+        self.gap_outlet = None
+        if 'EEG' in self.pushers:
+            self.gap_outlet = create_gap_outlet(address, name or 'Muse')
+
+        self.muse = Muse(address=address,
+                         callback_eeg=self.pushers.get('EEG'),
+                         callback_gap=self.push_gap if self.gap_outlet else None,
+                         fill_gaps=fill_gaps,
+                         callback_ppg=self.pushers.get('PPG'),
+                         callback_acc=self.pushers.get('ACC'),
+                         callback_gyro=self.pushers.get('GYRO'),
+                         backend=backend, name=name, preset=preset,
+                         disable_light=disable_light, time_func=time_func,
+                         adapter=adapter, log_level=log_level)
+
+        self.connected = False
+        self.reconnects = 0
+        self.next_attempt = 0
+        self._attempt = None
+        self._streamed = False
+        self._last_totals = {source: 0 for source in self.pushers}
+
+    def push_gap(self, n_samples, timestamp):
+        self.gap_outlet.push_sample([n_samples], timestamp)
+
+    @property
+    def label(self):
+        return '%s (%s)' % (self.name or 'Muse', self.address)
+
+    @property
+    def connecting(self):
+        return self._attempt is not None
+
+    def connect(self, retries=0):
+        """Start connecting and streaming on the shared event loop.
+
+        Returns at once: the attempt makes progress while the loop is pumped,
+        so that a slow headset doesn't hold up the others. poll() tells how
+        it went.
+        """
+        self._attempt = asyncio.get_event_loop().create_task(
+            self._connect(retries))
+
+    async def _connect(self, retries):
+        if not await self.muse.connect_async(retries=retries):
+            return False
+        await self.muse.start_async()
+        return True
+
+    def poll(self):
+        """Outcome of the last connection attempt, once it is over.
+
+        Returns True when the device is now streaming, False when the attempt
+        failed, in which case it is retried after RETRY_SLEEP_TIMEOUT, and
+        None while the attempt is still running or if there is none.
+        """
+        if self._attempt is None or not self._attempt.done():
+            return None
+        attempt, self._attempt = self._attempt, None
+        try:
+            self.connected = attempt.result()
+        except Exception as error:
+            print('Could not connect to %s: %r' % (self.label, error))
+            self.connected = False
+            try:
+                # a link that got as far as connecting must not linger
+                self.muse.disconnect()
+            except Exception:
+                pass
+        if self.connected:
+            if self._streamed:
+                self.reconnects += 1
+            self._streamed = True
+        else:
+            self.next_attempt = self.time_func() + RETRY_SLEEP_TIMEOUT
+        return self.connected
+
+    def is_stale(self):
+        """True when the device stopped sending data"""
+        return (self.time_func() - self.muse.last_timestamp >=
+                AUTO_DISCONNECT_DELAY)
+
+    def drop(self):
+        """Forget a lost connection so that it can be re-established"""
+        try:
+            for pusher in self.pushers.values():
+                pusher.flush()
+            self.muse.disconnect()
+        except Exception as error:
+            # usually the link is already gone, try again a bit later
+            print('Error disconnecting %s: %r' % (self.label, error))
+            self.next_attempt = self.time_func() + RETRY_SLEEP_TIMEOUT
+        finally:
+            self.connected = False
+
+    def stop(self):
+        """Stop streaming and disconnect"""
+        if self._attempt is not None:
+            self._attempt.cancel()
+            asyncio.get_event_loop().run_until_complete(
+                asyncio.gather(self._attempt, return_exceptions=True))
+            self._attempt = None
+        for pusher in self.pushers.values():
+            pusher.flush()
+        if self.connected:
+            try:
+                self.muse.stop()
+                self.muse.disconnect()
+            except Exception as error:
+                print('Error disconnecting %s: %r' % (self.label, error))
+            finally:
+                self.connected = False
+
+    def throughput(self, elapsed):
+        """Samples per second of each data source since the last call"""
+        rates = {}
+        for source, pusher in self.pushers.items():
+            rates[source] = ((pusher.total_samples - self._last_totals[source])
+                             / elapsed)
+            self._last_totals[source] = pusher.total_samples
+        return rates
+
+
+# Streams many Muse devices to LSL from a single process. All devices share
+# the one asyncio event loop driven by the bleak backend.
+def gateway(
+    addresses=None,
+    names=None,
+    backend='auto',
+    ppg_enabled=False,
+    acc_enabled=False,
+    gyro_enabled=False,
+    eeg_disabled=False,
+    preset=None,
+    disable_light=False,
+    lsl_time=False,
+    retries=1,
+    log_level=logging.ERROR,
+    chunk_packets=None,
+    chunk_ms=None,
+    stats_interval=GATEWAY_STATS_INTERVAL,
+    fill_gaps=None
+):
+    backend = helper.resolve_backend(backend)
+    if backend != 'bleak':
+        raise ValueError('The gateway shares a single asyncio event loop '
+                         'between devices and requires the bleak backend.')
+
+    sources = [source for source, enabled in
+               (('EEG', not eeg_disabled), ('PPG', ppg_enabled),
+                ('ACC', acc_enabled), ('GYRO', gyro_enabled)) if enabled]
+    if not sources:
+        print('Gateway initiation failed: At least one data source must be enabled.')
+        return
+
+    targets = [{'address': address, 'name': None}
+               for address in addresses or []]
+    if names or not targets:
+        muses = list_muses(backend, log_level=log_level)
+        if names:
+            targets += [m for m in muses if m['name'] in names]
+        else:
+            targets = muses
+    if not targets:
+        print('No Muses to stream.')
+        return
+
+    time_func = local_clock if lsl_time else time
+
+    # one adapter for all the devices and their reconnects, so that the
+    # event loop pump and the exit handler are only installed once
+    adapter = backends.BleakBackend()
+    devices = [GatewayDevice(target['address'], target['name'], sources,
+                             backend=backend, preset=preset,
+                             disable_light=disable_light, time_func=time_func,
+                             chunk_packets=chunk_packets, chunk_ms=chunk_ms,
+                             fill_gaps=fill_gaps, adapter=adapter,
+                             log_level=log_level)
+               for target in targets]
+
+    # all the devices connect at the same time, as the loop is pumped below
+    for device in devices:
+        print('Connecting to %s...' % device.label)
+        device.connect(retries=retries)
+
+    print('Streaming %s from %d device(s)...' % (' '.join(sources),
+                                                 len(devices)))
+
+    last_report = time_func()
+    while True:
+        try:
+            # pumps the shared event loop, delivering notifications of
+            # every connected device
+            backends.sleep(1)
+
+            # each device is handled on its own: errors of one headset are
+            # caught by poll() and drop() and only delay its own retry
+            for device in devices:
+                if device.poll():
+                    print('%s %s.' % ('Reconnected to' if device.reconnects
+                                      else 'Connected to', device.label))
+                if device.connected and device.is_stale():
+                    print('Lost %s, reconnecting...' % device.label)
+                    device.drop()
+                if not device.connected and not device.connecting and \
+                        time_func() >= device.next_attempt:
+                    device.connect()
+
+            now = time_func()
+            if stats_interval and now - last_report >= stats_interval:
+                for device in devices:
+                    rates = device.throughput(now - last_report)
+                    print('%s: %s | EEG loss: %.2f%% | reconnects: %d%s' % (
+                        device.label,
+                        ', '.join('%s %.1f Hz' % (source, rate)
+                                  for source, rate in rates.items()),
+                        100 * device.muse.eeg_loss_rate.max(),
+                        device.reconnects,
+                        '' if device.connected else ' | disconnected'))
+                last_report = now
+        except KeyboardInterrupt:
+            break
+
+    for device in devices:
+        device.stop()
+
+    print('Disconnected.')
@@ -0,0 +1,260 @@
+import atexit
+import os
+import re
+import sys
+from threading import Thread
+from time import sleep, time
+
+from .constants import (LATENCY_DUMP_INTERVAL, LATENCY_STATS_DIR_ENV,
+                        LATENCY_SUB_BUCKET_BITS)
+
+# Pipeline stages, in the order a sample goes through them:
+# receive -- the last of the 5 EEG notifications of a packet has arrived
+# decode -- its payload is unpacked
+# correct -- the packet timestamps are extrapolated by the regression
+# push -- the samples are handed to the LSL outlet
+# pull -- a consumer pulled them from its inlet
+# score -- a focus/mindfulness score was computed from them
+# render -- the score was sent to the dashboard
+STAGES = ('receive', 'decode', 'correct', 'push', 'pull', 'score', 'render')
+
+_METRIC = 'muselsl_latency_seconds'
+_LINE = re.compile(r'^(%s(?:_bucket|_sum|_count)|muselsl_latency_max_seconds)'
+                   r'\{([^}]*)\}\s+(\S+)$' % _METRIC)
+_LABEL = re.compile(r'(\w+)="([^"]*)"')
+
+# Off unless enable() is called or MUSELSL_STATS_DIR is set, so that the hot
+# paths only pay for a check of this flag
+ENABLED = False
+_histograms = {}
+_directory = None
+_name = None
+
+
+class LatencyHistogram():
+    """Counts of latencies in log-linear buckets, as in an HDR histogram.
+
+    Values are counted in microseconds. Below 2**bits us each microsecond
+    has its own bucket; above, every power of two is split in 2**(bits - 1)
+    buckets, so any value is known to a relative precision of
+    2**(1 - bits), with under a thousand buckets up to hours.
+    """
+
+    def __init__(self, bits=LATENCY_SUB_BUCKET_BITS):
+        self.bits = bits
+        self.half = 1 << (bits - 1)
+        self.counts = {}
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def index(self, microseconds):
+        shift = max(microseconds.bit_length() - self.bits, 0)
+        return shift * self.half + (microseconds >> shift)
+
+    def upper(self, index):
+        """Exclusive upper bound of a bucket, in seconds."""
+        if index < 2 * self.half:
+            return (index + 1) / 1e6
+        shift = index // self.half - 1
+        return ((index - shift * self.half + 1) << shift) / 1e6
+
+    def record(self, seconds):
+        seconds = max(float(seconds), 0.)
+        index = self.index(int(seconds * 1e6))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, in seconds."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.upper(index), self.max)
+        return self.max
+
+
+def enable(directory=None, name=None):
+    """Start recording latencies, dumped to directory every few seconds.
+
+    Each process writes <directory>/<name>.prom in the Prometheus text
+    format, which `muselsl stats` (or a node_exporter textfile collector)
+    reads. Without directory, latencies are only kept in memory.
+    """
+    global ENABLED, _directory, _name
+    _directory = directory
+    _name = name or '%s-%d' % (
+        os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python',
+        os.getpid())
+    if directory and not ENABLED:
+        os.makedirs(directory, exist_ok=True)
+        thread = Thread(target=_dump_periodically)
+        thread.daemon = True
+        thread.start()
+        atexit.register(dump)
+    ENABLED = True
+
+
+def record(stage, seconds):
+    """Count one latency of seconds at a pipeline stage."""
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        histogram = _histograms.setdefault(stage, LatencyHistogram())
+    histogram.record(seconds)
+
+
+def sample_age(timestamp):
+    """Seconds elapsed since an LSL sample timestamp on this machine.
+
+    Muse streams are stamped with time.time() unless started with
+    --lsltime, in which case they use pylsl's local_clock(), which counts
+    from boot; the clock is told apart by the magnitude of the timestamp.
+    """
+    if timestamp > 1e9:
+        return time() - timestamp
+    from pylsl import local_clock
+    return local_clock() - timestamp
+
+
+def histograms():
+    return dict(_histograms)
+
+
+def to_prometheus(histograms, process=None):
+    """Histograms by stage in the Prometheus text exposition format."""
+    lines = ['# HELP %s Age of the newest sample when it reaches each '
+             'pipeline stage.' % _METRIC,
+             '# TYPE %s histogram' % _METRIC]
+    maxima = ['# HELP muselsl_latency_max_seconds Largest latency seen at '
+              'each pipeline stage.',
+              '# TYPE muselsl_latency_max_seconds gauge']
+    for stage in _ordered(histograms):
+        histogram = histograms[stage]
+        labels = 'stage="%s"' % stage
+        if process:
+            labels = 'process="%s",%s' % (process, labels)
+        seen = 0
+        for index in sorted(histogram.counts):
+            seen += histogram.counts[index]
+            lines.append('%s_bucket{%s,le="%r"} %d' %
+                         (_METRIC, labels, histogram.upper(index), seen))
+        lines.append('%s_bucket{%s,le="+Inf"} %d' %
+                     (_METRIC, labels, histogram.count))
+        lines.append('%s_sum{%s} %r' % (_METRIC, labels, histogram.total))
+        lines.append('%s_count{%s} %d' % (_METRIC, labels, histogram.count))
+        maxima.append('muselsl_latency_max_seconds{%s} %r' %
+                      (labels, histogram.max))
+    return '\n'.join(lines + maxima) + '\n'
+
+
+def dump():
+    """Write this process's histograms to its file in the stats directory."""
+    if not _directory:
+        return
+    filename = os.path.join(_directory, _name + '.prom')
+    with open(filename + '.tmp', 'w') as f:
+        f.write(to_prometheus(histograms(), _name))
+    # replaced in one step, so that readers never see a partial file
+    os.replace(filename + '.tmp', filename)
+
+
+def _dump_periodically():
+    while True:
+        sleep(LATENCY_DUMP_INTERVAL)
+        dump()
+
+
+def _ordered(histograms):
+    return ([stage for stage in STAGES if stage in histograms] +
+            sorted(stage for stage in histograms if stage not in STAGES))
+
+
+def read_stats(directory):
+    """Histograms by stage merged across all the .prom files of directory."""
+    merged = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.prom'):
+            continue
+        parsed = {}
+        with open(os.path.join(directory, filename)) as f:
+            for line in f:
+                match = _LINE.match(line.strip())
+                if not match:
+                    continue
+                metric, labels, value = match.groups()
+                labels = dict(_LABEL.findall(labels))
+                histogram = parsed.setdefault(labels['stage'],
+                                              [LatencyHistogram(), 0])
+                if metric.endswith('_bucket') and labels['le'] != '+Inf':
+                    # buckets are cumulative, count each one's own samples
+                    histogram[0].counts[histogram[0].index(
+                        round(float(labels['le']) * 1e6) - 1)] = \
+                        int(value) - histogram[1]
+                    histogram[1] = int(value)
+                elif metric.endswith('_sum'):
+                    histogram[0].total = float(value)
+                elif metric.endswith('_count'):
+                    histogram[0].count = int(value)
+                elif metric == 'muselsl_latency_max_seconds':
+                    histogram[0].max = float(value)
+        for stage, (histogram, _) in parsed.items():
+            merged.setdefault(stage, LatencyHistogram()).merge(histogram)
+    return merged
+
+
+def stats(directory=None, prometheus=False, interval=None):
+    """Print the latencies dumped by the instrumented processes.
+
+    Shows the count, median, 90th and 99th percentiles and maximum of each
+    stage, or the merged histograms in the Prometheus format. With interval,
+    refreshes every interval seconds until interrupted.
+    """
+    directory = directory or os.environ.get(LATENCY_STATS_DIR_ENV)
+    if not directory or not os.path.isdir(directory):
+        print("No latency stats found. Set %s to a directory for the "
+              "processes to instrument." % LATENCY_STATS_DIR_ENV)
+        return
+
+    try:
+        while True:
+            merged = read_stats(directory)
+            if prometheus:
+                print(to_prometheus(merged), end='')
+            elif not merged:
+                print("No latency recorded yet in %s." % directory)
+            else:
+                print("%-8s %10s %9s %9s %9s %9s" %
+                      ('stage', 'count', 'p50 ms', 'p90 ms', 'p99 ms',
+                       'max ms'))
+                for stage in _ordered(merged):
+                    histogram = merged[stage]
+                    print("%-8s %10d %9.2f %9.2f %9.2f %9.2f" % (
+                        stage, histogram.count,
+                        1e3 * histogram.quantile(0.5),
+                        1e3 * histogram.quantile(0.9),
+                        1e3 * histogram.quantile(0.99),
+                        1e3 * histogram.max))
+            if interval is None:
+                return
+            sleep(interval)
+            print()
+    except KeyboardInterrupt:
+        pass
+
+
+if os.environ.get(LATENCY_STATS_DIR_ENV):
+    enable(os.environ[LATENCY_STATS_DIR_ENV])
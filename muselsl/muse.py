@@ -9,10 +9,39 @@ from sys import platform
 import subprocess
 from . import backends
 from . import helper
+from . import latency
 from .constants import *
 
 logger = logging.getLogger(__name__)
 
+
+def unpack_eeg_packets(packets):
+    """Decode one or many EEG channel packets without bitstring.
+
+    packets -- a single 20 byte packet (bytes, bytearray or array), or a
+               batch of packets stacked as an (N, 20) uint8 array
+
+    Each packet is a big-endian uint16 packet index followed by 12 samples
+    packed as 12 bit unsigned integers, i.e. every 3 bytes hold 2 samples.
+
+    Returns (packet_index, data) with shapes (N,) and (N, 12), data being
+    scaled to microvolts (12 bits on a 2 mVpp range).
+    """
+    if isinstance(packets, (bytes, bytearray, memoryview)):
+        packets = np.frombuffer(packets, dtype=np.uint8)
+    packets = np.atleast_2d(np.asarray(packets, dtype=np.uint8))
+
+    packet_index = (packets[:, 0].astype(np.uint16) << 8) | packets[:, 1]
+
+    # split the 18 payload bytes in groups of 3 bytes -> 2 samples each
+    triplets = packets[:, 2:20].reshape(-1, 6, 3).astype(np.int32)
+    samples = np.empty((packets.shape[0], 6, 2), dtype=np.int32)
+    samples[:, :, 0] = (triplets[:, :, 0] << 4) | (triplets[:, :, 1] >> 4)
+    samples[:, :, 1] = ((triplets[:, :, 1] & 0x0F) << 8) | triplets[:, :, 2]
+
+    data = 0.48828125 * (samples.reshape(-1, 12) - 2048)
+    return packet_index, data
+
 class Muse():
     """Muse headband"""
 
@@ -24,16 +53,25 @@ class Muse():
                  callback_acc=None,
                  callback_gyro=None,
                  callback_ppg=None,
+                 callback_gap=None,
                  backend='auto',
                  interface=None,
                  time_func=time,
                  name=None,
                  preset=None,
                  disable_light=False,
+                 copy_callback_data=False,
+                 ring_frames=MUSE_RING_FRAMES,
+                 fill_gaps=None,
+                 adapter=None,
                  log_level=logging.ERROR):
         """Initialize
 
         callback_eeg -- callback for eeg data, function(data, timestamps)
+        callback_ppg -- callback for ppg data, function(data, timestamps)
+        - data and timestamps are views into a ring buffer of ring_frames
+          frames and are overwritten once the ring wraps around. Keep a
+          copy, or set copy_callback_data=True, to hold on to them longer.
         callback_control -- function(message)
         callback_telemetry -- function(timestamp, battery, fuel_gauge,
                                        adc_volt, temperature)
@@ -41,7 +79,21 @@ class Muse():
         callback_acc -- function(timestamp, samples)
         callback_gyro -- function(timestamp, samples)
         - samples is a list of 3 samples, where each sample is [x, y, z]
+        callback_gap -- called when EEG packets were lost,
+                        function(n_samples, timestamp) with the number of
+                        missing samples and the timestamp of the first one
+        fill_gaps -- None, 'nan' or 'interpolate'. Push the samples of lost
+                     EEG packets (up to MUSE_GAP_FILL_PACKETS) as NaN or
+                     interpolated between their neighbours, so that the
+                     outgoing stream stays evenly sampled. Channels missing
+                     from a packet are set to NaN, or hold their last value.
+        adapter -- a backends.BleakBackend to connect through, e.g. one
+                   shared by several Muses. Without it, each connect()
+                   creates its own adapter, which disconnect() stops.
         """
+        if fill_gaps not in (None, 'nan', 'interpolate'):
+            raise ValueError("fill_gaps must be None, 'nan' or 'interpolate'.")
+
         logging.basicConfig(stream=sys.stdout, level=log_level)
 
         self.address = address
@@ -52,6 +104,8 @@ class Muse():
         self.callback_acc = callback_acc
         self.callback_gyro = callback_gyro
         self.callback_ppg = callback_ppg
+        self.callback_gap = callback_gap
+        self.fill_gaps = fill_gaps
 
         self.enable_eeg = not callback_eeg is None
         self.enable_control = not callback_control is None
@@ -65,6 +119,12 @@ class Muse():
         self.backend = helper.resolve_backend(backend)
         self.preset = preset
         self.disable_light = disable_light
+        self.copy_callback_data = copy_callback_data
+        self.ring_frames = ring_frames
+        self.adapter = adapter
+        self._shared_adapter = adapter is not None
+        self._init_loss_counters()
+        self._init_packet_sequence()
 
     def connect(self, interface=None, retries=0):
         """Connect to the device"""
@@ -81,7 +141,8 @@ class Muse():
                     self.interface = self.interface or 'hci0'
                     self.adapter = pygatt.GATTToolBackend(self.interface)
                 elif self.backend == 'bleak':
-                    self.adapter = backends.BleakBackend()
+                    if not self._shared_adapter:
+                        self.adapter = backends.BleakBackend()
                 else:
                     self.adapter = pygatt.BGAPIBackend(
                         serial_port=self.interface)
@@ -158,6 +219,65 @@ class Muse():
                 logger.error('Connection to', self.address, 'failed')
                 return False
 
+    async def connect_async(self, retries=0):
+        """Connect to the device from a running asyncio event loop.
+
+        Awaitable counterpart of connect(), only available with the bleak
+        backend. Notifications are delivered by the caller's event loop, so
+        no blocking pump or dedicated thread is needed.
+        """
+        if self.backend != 'bleak':
+            raise NotImplementedError(
+                'The asyncio API is only available with the bleak backend.')
+
+        logger.info('Connecting to %s: %s...' % (self.name
+                                           if self.name else 'Muse',
+                                           self.address))
+        if not self._shared_adapter:
+            self.adapter = backends.BleakBackend(blocking=False)
+        if ((device := await self.adapter.connect_async(self.address, retries))
+            is None):
+            return False
+        self.device = device
+
+        if self.preset is not None:
+            await self.select_preset_async(self.preset)
+
+        for uuid, callback in self._subscriptions():
+            await self.device.subscribe_async(uuid, callback=callback)
+        if self.enable_control:
+            self._init_control()
+
+        if self.disable_light:
+            await self._write_cmd_str_async('L0')
+
+        self.last_timestamp = self.time_func()
+
+        return True
+
+    def _subscriptions(self):
+        """List the (characteristic, handler) pairs of the enabled streams"""
+        subscriptions = []
+        if self.enable_eeg:
+            subscriptions += [(uuid, self._handle_eeg) for uuid in (
+                MUSE_GATT_ATTR_TP9, MUSE_GATT_ATTR_AF7, MUSE_GATT_ATTR_AF8,
+                MUSE_GATT_ATTR_TP10, MUSE_GATT_ATTR_RIGHTAUX)]
+        if self.enable_control:
+            subscriptions.append(
+                (MUSE_GATT_ATTR_STREAM_TOGGLE, self._handle_control))
+        if self.enable_telemetry:
+            subscriptions.append(
+                (MUSE_GATT_ATTR_TELEMETRY, self._handle_telemetry))
+        if self.enable_acc:
+            subscriptions.append(
+                (MUSE_GATT_ATTR_ACCELEROMETER, self._handle_acc))
+        if self.enable_gyro:
+            subscriptions.append((MUSE_GATT_ATTR_GYRO, self._handle_gyro))
+        if self.enable_ppg:
+            subscriptions += [(uuid, self._handle_ppg) for uuid in (
+                MUSE_GATT_ATTR_PPG1, MUSE_GATT_ATTR_PPG2, MUSE_GATT_ATTR_PPG3)]
+        return subscriptions
+
     def _write_cmd(self, cmd):
         """Wrapper to write a command to the Muse device.
         cmd -- list of bytes"""
@@ -166,7 +286,20 @@ class Muse():
     def _write_cmd_str(self, cmd):
         """Wrapper to encode and write a command string to the Muse device.
         cmd -- string to send"""
-        self._write_cmd([len(cmd) + 1, *(ord(char) for char in cmd), ord('\n')])
+        self._write_cmd(self._encode_cmd_str(cmd))
+
+    async def _write_cmd_async(self, cmd):
+        """Awaitable version of _write_cmd"""
+        await self.device.char_write_handle_async(0x000e, cmd, False)
+
+    async def _write_cmd_str_async(self, cmd):
+        """Awaitable version of _write_cmd_str"""
+        await self._write_cmd_async(self._encode_cmd_str(cmd))
+
+    @staticmethod
+    def _encode_cmd_str(cmd):
+        """Encode a command string as the list of bytes sent to the Muse"""
+        return [len(cmd) + 1, *(ord(char) for char in cmd), ord('\n')]
 
     def ask_control(self):
         """Send a message to Muse to ask for the control status.
@@ -227,18 +360,36 @@ class Muse():
                     shell=True)
             return
 
+        self._init_stream()
+        self.resume()
+
+    async def start_async(self):
+        """Start streaming, awaitable version of start() (bleak only)."""
+        self._init_stream()
+        await self.resume_async()
+
+    def _init_stream(self):
+        """Reset the sample assembly state before streaming starts"""
         self.first_sample = True
+        self._init_ring_buffers()
         self._init_sample()
         self._init_ppg_sample()
-        self.last_tm = 0
+        # -1 until the first packet, as 0 is a valid packet counter
+        self.last_tm = -1
         self.last_tm_ppg = 0
+        # the loss counters keep running across restarts and reconnections,
+        # only the packet sequence starts over
+        self._init_packet_sequence()
         self._init_control()
-        self.resume()
 
     def resume(self):
         """Resume streaming, sending 'd' command"""
         self._write_cmd_str('d')
 
+    async def resume_async(self):
+        """Resume streaming, awaitable version of resume()"""
+        await self._write_cmd_str_async('d')
+
     def stop(self):
         """Stop streaming."""
         if self.backend == 'bluemuse':
@@ -253,10 +404,18 @@ class Muse():
 
         self._write_cmd_str('h')
 
+    async def stop_async(self):
+        """Stop streaming, awaitable version of stop() (bleak only)."""
+        await self._write_cmd_str_async('h')
+
     def keep_alive(self):
         """Keep streaming, sending 'k' command"""
         self._write_cmd_str('k')
 
+    async def keep_alive_async(self):
+        """Keep streaming, awaitable version of keep_alive()"""
+        await self._write_cmd_str_async('k')
+
     def select_preset(self, preset=21):
         """Set preset for headband configuration
 
@@ -265,6 +424,16 @@ class Muse():
         Untested but possible values include 'p22','p23','p31','p32','p50','p51','p52','p53','p60','p61','p63','pAB','pAD'
         Default is 'p21'."""
 
+        self._write_cmd(self._encode_preset(preset))
+
+    async def select_preset_async(self, preset=21):
+        """Set preset for headband configuration, awaitable version of
+        select_preset()"""
+        await self._write_cmd_async(self._encode_preset(preset))
+
+    @staticmethod
+    def _encode_preset(preset):
+        """Encode the preset selection command"""
         if type(preset) is int:
             preset = str(preset)
         if preset[0] == 'p':
@@ -272,7 +441,7 @@ class Muse():
         if str(preset) != '21':
             logger.debug('Sending command for non-default preset: p' + preset)
         preset = bytes(preset, 'utf-8')
-        self._write_cmd([0x04, 0x70, *preset, 0x0a])
+        return [0x04, 0x70, *preset, 0x0a]
 
     def disconnect(self):
         """disconnect."""
@@ -281,9 +450,15 @@ class Muse():
             return
 
         self.device.disconnect()
-        if self.adapter:
+        if self.adapter and not self._shared_adapter:
             self.adapter.stop()
 
+    async def disconnect_async(self):
+        """disconnect, awaitable version of disconnect() (bleak only)."""
+        await self.device.disconnect_async()
+        if self.adapter and not self._shared_adapter:
+            await self.adapter.stop_async()
+
     def _subscribe_eeg(self):
         """subscribe to eeg stream."""
         self.device.subscribe(MUSE_GATT_ATTR_TP9, callback=self._handle_eeg)
@@ -299,30 +474,66 @@ class Muse():
         Each packet is encoded with a 16bit timestamp followed by 12 time
         samples with a 12 bit resolution.
         """
-        aa = bitstring.Bits(bytes=packet)
-        pattern = "uint:16,uint:12,uint:12,uint:12,uint:12,uint:12,uint:12, \
-                   uint:12,uint:12,uint:12,uint:12,uint:12,uint:12"
+        packetIndex, data = unpack_eeg_packets(packet)
+        return int(packetIndex[0]), data[0]
 
-        res = aa.unpack(pattern)
-        packetIndex = res[0]
-        data = res[1:]
-        # 12 bits on a 2 mVpp range
-        data = 0.48828125 * (np.array(data) - 2048)
-        return packetIndex, data
+    def _init_ring_buffers(self):
+        """Preallocate the ring buffers the handlers assemble frames into.
+
+        Each modality keeps ring_frames frames of samples, receive times and
+        corrected sample timestamps, so no array is allocated per packet.
+        """
+        n = self.ring_frames
+        self._eeg_ring = np.zeros((n, 5, 12))
+        self._eeg_ring_received = np.full((n, 5), np.nan)
+        self._eeg_ring_timestamps = np.zeros((n, 12))
+        self._eeg_frame = -1
+        self._eeg_offsets = np.arange(0, 12)
+        self._eeg_idxs = np.zeros(12, dtype=np.int64)
+
+        self._ppg_ring = np.zeros((n, 3, LSL_PPG_CHUNK))
+        self._ppg_ring_received = np.full((n, 3), np.nan)
+        self._ppg_ring_timestamps = np.zeros((n, LSL_PPG_CHUNK))
+        self._ppg_frame = -1
+        self._ppg_offsets = np.arange(0, LSL_PPG_CHUNK)
+        self._ppg_idxs = np.zeros(LSL_PPG_CHUNK, dtype=np.int64)
+
+    def _init_loss_counters(self):
+        """Reset the per-channel counts of received and lost EEG packets"""
+        self.eeg_packets_received = np.zeros(5, dtype=np.int64)
+        self.eeg_packets_lost = np.zeros(5, dtype=np.int64)
+        self.eeg_gaps = 0
+
+    def _init_packet_sequence(self):
+        """Forget the last EEG packet, so that no loss is counted against it"""
+        self._eeg_last_tm = np.full(5, -1, dtype=np.int64)
+        self._eeg_last_sample = None
+
+    @property
+    def eeg_loss_rate(self):
+        """Fraction of the EEG packets lost on each channel handle"""
+        total = self.eeg_packets_received + self.eeg_packets_lost
+        return self.eeg_packets_lost / np.maximum(total, 1)
 
     def _init_sample(self):
-        """initialize array to store the samples"""
-        self.timestamps = np.full(5, np.nan)
-        self.data = np.zeros((5, 12))
+        """Move to the next EEG ring slot and clear it in place"""
+        self._eeg_frame = (self._eeg_frame + 1) % self.ring_frames
+        self.timestamps = self._eeg_ring_received[self._eeg_frame]
+        self.data = self._eeg_ring[self._eeg_frame]
+        self.timestamps.fill(np.nan)
+        self.data.fill(0)
 
     def _init_ppg_sample(self):
-        """ Initialise array to store PPG samples
+        """ Move to the next PPG ring slot and clear it in place
 
             Must be separate from the EEG packets since they occur with a different sampling rate. Ideally the counters
             would always match, but this is not guaranteed
         """
-        self.timestamps_ppg = np.full(3, np.nan)
-        self.data_ppg = np.zeros((3, 6))
+        self._ppg_frame = (self._ppg_frame + 1) % self.ring_frames
+        self.timestamps_ppg = self._ppg_ring_received[self._ppg_frame]
+        self.data_ppg = self._ppg_ring[self._ppg_frame]
+        self.timestamps_ppg.fill(np.nan)
+        self.data_ppg.fill(0)
 
     def _init_timestamp_correction(self):
         """Init IRLS params"""
@@ -369,37 +580,78 @@ class Muse():
         index = int((handle - 32) / 3)
         tm, d = self._unpack_eeg_channel(data)
 
-        if self.last_tm == 0:
+        if self.last_tm < 0:
             self.last_tm = tm - 1
 
+        # each channel handle counts its own packets, the 16 bit counter
+        # wraps around
+        if self._eeg_last_tm[index] >= 0:
+            self.eeg_packets_lost[index] += \
+                (tm - self._eeg_last_tm[index] - 1) % 65536
+        self._eeg_last_tm[index] = tm
+        self.eeg_packets_received[index] += 1
+
         self.data[index] = d
         self.timestamps[index] = timestamp
         # last data received
         if handle == 35:
-            if tm != self.last_tm + 1:
-                if (tm - self.last_tm) != -65535:  # counter reset
-                    logger.debug("missing sample %d : %d" % (tm, self.last_tm))
-                    # correct sample index for timestamp estimation
-                    self.sample_index += 12 * (tm - self.last_tm + 1)
+            t_first = np.nanmin(self.timestamps)
+            if latency.ENABLED:
+                latency.record('receive', timestamp - t_first)
+                latency.record('decode', self.time_func() - t_first)
+
+            gap_start = self.sample_index
+            n_lost = (tm - self.last_tm - 1) % 65536
+            if n_lost:
+                logger.debug("missing sample %d : %d" % (tm, self.last_tm))
+                # correct sample index for timestamp estimation
+                self.sample_index += 12 * n_lost
+                self.eeg_gaps += 1
 
             self.last_tm = tm
 
             # calculate index of time samples
-            idxs = np.arange(0, 12) + self.sample_index
+            idxs = np.add(self._eeg_offsets, self.sample_index,
+                          out=self._eeg_idxs)
             self.sample_index += 12
 
             # update timestamp correction
             # We received the first packet as soon as the last timestamp got
             # sampled
-            self._update_timestamp_correction(idxs[-1], np.nanmin(
-                self.timestamps))
+            self._update_timestamp_correction(idxs[-1], t_first)
 
             # timestamps are extrapolated backwards based on sampling rate
             # and current time
-            timestamps = self.reg_params[1] * idxs + self.reg_params[0]
+            timestamps = self._eeg_ring_timestamps[self._eeg_frame]
+            np.multiply(self.reg_params[1], idxs, out=timestamps)
+            timestamps += self.reg_params[0]
+            if latency.ENABLED:
+                latency.record('correct', self.time_func() - t_first)
+
+            missing = np.isnan(self.timestamps)
+            if self.fill_gaps and missing.any():
+                # channels whose packet was lost within this frame
+                if self.fill_gaps == 'nan' or self._eeg_last_sample is None:
+                    self.data[missing] = np.nan
+                else:
+                    self.data[missing] = \
+                        self._eeg_last_sample[missing, None]
+
+            if n_lost:
+                gap_times = self.reg_params[0] + self.reg_params[1] * \
+                    np.arange(gap_start, gap_start + 12 * n_lost)
+                if self.callback_gap:
+                    self.callback_gap(12 * n_lost, gap_times[0])
+                if self.fill_gaps and n_lost <= MUSE_GAP_FILL_PACKETS:
+                    self._fill_eeg_gap(gap_times)
 
             # push data
-            self.callback_eeg(self.data, timestamps)
+            if self.copy_callback_data:
+                self.callback_eeg(self.data.copy(), timestamps.copy())
+            else:
+                self.callback_eeg(self.data, timestamps)
+            if self.fill_gaps:
+                self._eeg_last_sample = self.data[:, -1].copy()
 
             # save last timestamp for disconnection timer
             self.last_timestamp = timestamps[-1]
@@ -407,6 +659,24 @@ class Muse():
             # reset sample
             self._init_sample()
 
+    def _fill_eeg_gap(self, gap_times):
+        """Push the samples of lost EEG packets, as NaN or interpolated.
+
+        Interpolation is linear, from the last sample pushed to the first
+        sample of the frame being assembled.
+        """
+        n = len(gap_times)
+        if self.fill_gaps == 'nan' or self._eeg_last_sample is None:
+            fill = np.full((5, n), np.nan)
+        else:
+            weights = np.arange(1, n + 1) / (n + 1.)
+            first = self.data[:, 0]
+            first = np.where(np.isnan(first), self._eeg_last_sample, first)
+            fill = self._eeg_last_sample[:, None] + \
+                (first - self._eeg_last_sample)[:, None] * weights
+        for i in range(0, n, 12):
+            self.callback_eeg(fill[:, i:i + 12], gap_times[i:i + 12])
+
     def _init_control(self):
         """Variable to store the current incoming message."""
         self._current_msg = ""
@@ -578,19 +848,24 @@ class Muse():
             self.last_tm_ppg = tm
 
             # calculate index of time samples
-            idxs = np.arange(0, LSL_PPG_CHUNK) + self.sample_index_ppg
+            idxs = np.add(self._ppg_offsets, self.sample_index_ppg,
+                          out=self._ppg_idxs)
             self.sample_index_ppg += LSL_PPG_CHUNK
 
             # timestamps are extrapolated backwards based on sampling rate and current time
-            timestamps = self.reg_ppg_sample_rate[1] * \
-                idxs + self.reg_ppg_sample_rate[0]
+            timestamps = self._ppg_ring_timestamps[self._ppg_frame]
+            np.multiply(self.reg_ppg_sample_rate[1], idxs, out=timestamps)
+            timestamps += self.reg_ppg_sample_rate[0]
 
             # save last timestamp for disconnection timer
             self.last_timestamp = timestamps[-1]
 
             # push data
             if self.callback_ppg:
-                self.callback_ppg(self.data_ppg, timestamps)
+                if self.copy_callback_data:
+                    self.callback_ppg(self.data_ppg.copy(), timestamps.copy())
+                else:
+                    self.callback_ppg(self.data_ppg, timestamps)
 
             # reset sample
             self._init_ppg_sample()
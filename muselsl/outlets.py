@@ -0,0 +1,150 @@
+from time import time
+
+import numpy as np
+from pylsl import IRREGULAR_RATE, StreamInfo, StreamOutlet
+
+from . import latency
+from .constants import (LSL_ACC_CHUNK, LSL_EEG_CHUNK, LSL_GYRO_CHUNK,
+                        LSL_PPG_CHUNK, MUSE_NB_ACC_CHANNELS,
+                        MUSE_NB_EEG_CHANNELS, MUSE_NB_GYRO_CHANNELS,
+                        MUSE_NB_PPG_CHANNELS, MUSE_SAMPLING_ACC_RATE,
+                        MUSE_SAMPLING_EEG_RATE, MUSE_SAMPLING_GYRO_RATE,
+                        MUSE_SAMPLING_PPG_RATE)
+
+
+class ChunkPusher:
+    """Coalesce decoded Muse blocks and push them to an LSL outlet as chunks.
+
+    Blocks handed over by the Muse callbacks are copied into a preallocated
+    C-contiguous float32 buffer and pushed with a single push_chunk call,
+    instead of one push_sample call per sample.
+
+    chunk_packets -- push once this many blocks have been buffered
+    chunk_ms -- push once the oldest buffered block is this many ms old
+    If neither is given, every block is pushed as soon as it arrives.
+    """
+
+    def __init__(self, outlet, n_channels, block_size, sampling_rate,
+                 chunk_packets=None, chunk_ms=None, time_func=time):
+        if chunk_packets is not None and chunk_packets < 1:
+            raise ValueError("chunk_packets must be at least 1, got %r." %
+                             chunk_packets)
+        if chunk_ms is not None and chunk_ms < 0:
+            raise ValueError("chunk_ms must not be negative, got %r." %
+                             chunk_ms)
+        if chunk_packets is None and chunk_ms is None:
+            chunk_packets = 1
+
+        self.outlet = outlet
+        self.chunk_packets = chunk_packets
+        self.chunk_ms = chunk_ms
+        self.time_func = time_func
+
+        n_blocks = chunk_packets or 1
+        if chunk_ms is not None:
+            n_blocks = max(n_blocks, int(np.ceil(
+                chunk_ms / 1000. * sampling_rate / block_size)) + 1)
+        self.capacity = n_blocks * block_size
+
+        self.data = np.zeros((self.capacity, n_channels), dtype=np.float32)
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self.n_samples = 0
+        self.n_packets = 0
+        self.first_time = None
+        self.total_samples = 0
+        self.total_packets = 0
+
+        # pylsl >= 1.16 accepts one timestamp per sample, older versions
+        # only take the timestamp of the most recent sample
+        self.per_sample_timestamps = hasattr(outlet, 'do_push_chunk_n')
+
+    def __call__(self, data, timestamps):
+        n_new = data.shape[1]
+        if self.n_samples + n_new > self.capacity:
+            self.flush()
+        if self.n_samples == 0:
+            self.first_time = self.time_func()
+
+        end = self.n_samples + n_new
+        self.data[self.n_samples:end] = data.T
+        self.timestamps[self.n_samples:end] = timestamps
+        self.n_samples = end
+        self.n_packets += 1
+        self.total_samples += n_new
+        self.total_packets += 1
+
+        if self.chunk_packets is not None and \
+                self.n_packets >= self.chunk_packets:
+            self.flush()
+        elif self.chunk_ms is not None and \
+                (self.time_func() - self.first_time) * 1000. >= self.chunk_ms:
+            self.flush()
+
+    def flush(self):
+        """Push all buffered samples to the outlet."""
+        if self.n_samples == 0:
+            return
+        if self.per_sample_timestamps:
+            timestamp = self.timestamps[:self.n_samples].tolist()
+        else:
+            timestamp = self.timestamps[self.n_samples - 1]
+        self.outlet.push_chunk(self.data[:self.n_samples], timestamp)
+        if latency.ENABLED:
+            latency.record('push', self.time_func() -
+                           self.timestamps[self.n_samples - 1])
+        self.n_samples = 0
+        self.n_packets = 0
+
+
+# LSL stream layout for each Muse data source:
+# channel count, sampling rate, outlet chunk size, samples per decoded block,
+# channel labels, unit and channel type
+_MUSE_STREAMS = {
+    'EEG': (MUSE_NB_EEG_CHANNELS, MUSE_SAMPLING_EEG_RATE, LSL_EEG_CHUNK, 12,
+            ['TP9', 'AF7', 'AF8', 'TP10', 'Right AUX'], 'microvolts', 'EEG'),
+    'PPG': (MUSE_NB_PPG_CHANNELS, MUSE_SAMPLING_PPG_RATE, LSL_PPG_CHUNK,
+            LSL_PPG_CHUNK, ['PPG1', 'PPG2', 'PPG3'], 'mmHg', 'PPG'),
+    'ACC': (MUSE_NB_ACC_CHANNELS, MUSE_SAMPLING_ACC_RATE, LSL_ACC_CHUNK, 3,
+            ['X', 'Y', 'Z'], 'g', 'accelerometer'),
+    'GYRO': (MUSE_NB_GYRO_CHANNELS, MUSE_SAMPLING_GYRO_RATE, LSL_GYRO_CHUNK, 3,
+             ['X', 'Y', 'Z'], 'dps', 'gyroscope'),
+}
+
+
+def create_outlet(source, address, name='Muse'):
+    """Create the LSL outlet for one Muse data source (EEG, PPG, ACC, GYRO)."""
+    n_channels, sampling_rate, chunk, _, labels, unit, channel_type = \
+        _MUSE_STREAMS[source]
+    info = StreamInfo(name, source, n_channels, sampling_rate, 'float32',
+                      'Muse%s' % address)
+    info.desc().append_child_value("manufacturer", "Muse")
+    channels = info.desc().append_child("channels")
+
+    for c in labels:
+        channels.append_child("channel") \
+            .append_child_value("label", c) \
+            .append_child_value("unit", unit) \
+            .append_child_value("type", channel_type)
+
+    return StreamOutlet(info, chunk)
+
+
+def create_gap_outlet(address, name='Muse'):
+    """Create the marker outlet announcing lost EEG packets.
+
+    Each gap is pushed as one int32 sample, the number of missing samples,
+    stamped with the timestamp of the first of them.
+    """
+    info = StreamInfo(name + 'Gaps', 'Markers', 1, IRREGULAR_RATE, 'int32',
+                      'Muse%sGaps' % address)
+    info.desc().append_child_value("manufacturer", "Muse")
+    info.desc().append_child("channels").append_child("channel") \
+        .append_child_value("label", "missing_samples") \
+        .append_child_value("type", "Markers")
+    return StreamOutlet(info)
+
+
+def create_pusher(outlet, source, **kwargs):
+    """Create the ChunkPusher feeding the outlet of one Muse data source."""
+    n_channels, sampling_rate, _, block_size, _, _, _ = _MUSE_STREAMS[source]
+    return ChunkPusher(outlet, n_channels, block_size, sampling_rate, **kwargs)
@@ -1,19 +1,15 @@
-import bleak
+import json
 import numpy as np
-import pandas as pd
 import os
 import sys
-from typing import Union, List, Optional
-from pathlib import Path
+from typing import Optional
 from pylsl import StreamInlet, resolve_byprop
-from sklearn.linear_model import LinearRegression
 from time import time, strftime, gmtime
-from .stream import find_muse
-from . import backends
-from .muse import Muse
-from .constants import LSL_SCAN_TIMEOUT, LSL_EEG_CHUNK, LSL_PPG_CHUNK, LSL_ACC_CHUNK, LSL_GYRO_CHUNK
+from .dejitter import Dejitter
+from .constants import LSL_SCAN_TIMEOUT, LSL_EEG_CHUNK, LSL_PPG_CHUNK, LSL_ACC_CHUNK, LSL_GYRO_CHUNK, RECORD_FLUSH_INTERVAL
 
-# Records a fixed duration of EEG data from an LSL stream into a CSV file
+# Records a fixed duration of EEG data from an LSL stream into a CSV file,
+# or into an append-only binary file with a JSON metadata sidecar
 
 def record(
     duration: int,
@@ -21,6 +17,7 @@ def record(
     dejitter=False,
     data_source="EEG",
     continuous: bool = True,
+    file_format: str = "csv",
 ) -> None:
     chunk_length = LSL_EEG_CHUNK
     if data_source == "PPG":
@@ -30,10 +27,15 @@ def record(
     if data_source == "GYRO":
         chunk_length = LSL_GYRO_CHUNK
 
+    if file_format not in RECORDING_WRITERS:
+        raise ValueError("file_format must be one of: %s." %
+                         ", ".join(RECORDING_WRITERS))
+
     if not filename:
-        filename = os.path.join(os.getcwd(), "%s_recording_%s.csv" %
+        filename = os.path.join(os.getcwd(), "%s_recording_%s.%s" %
                                 (data_source,
-                                 strftime('%Y-%m-%d-%H.%M.%S', gmtime())))
+                                 strftime('%Y-%m-%d-%H.%M.%S', gmtime()),
+                                 RECORDING_EXTENSIONS[file_format]))
 
     print("Looking for a %s stream..." % (data_source))
     streams = resolve_byprop('type', data_source, timeout=LSL_SCAN_TIMEOUT)
@@ -52,8 +54,10 @@ def record(
 
     if marker_streams:
         inlet_marker = StreamInlet(marker_streams[0])
+        n_markers = inlet_marker.info().channel_count()
     else:
         inlet_marker = False
+        n_markers = 0
         print("Can't find Markers stream.")
 
     info = inlet.info()
@@ -67,12 +71,18 @@ def record(
         ch = ch.next_sibling()
         ch_names.append(ch.child_value('label'))
 
+    writer = RECORDING_WRITERS[file_format](
+        filename, ch_names, n_markers, data_source=data_source,
+        sampling_rate=info.nominal_srate(), dejitter=dejitter)
+
+    # only the samples and markers received since the last flush are kept
     res = []
     timestamps = []
     markers = []
+    dejitter = Dejitter() if dejitter else None
     t_init = time()
     time_correction = inlet.time_correction()
-    last_written_timestamp = None
+    last_flush = None
     print('Start recording at time t=%.3f' % t_init)
     print('Time correction: ', time_correction)
     while (time() - t_init) < duration:
@@ -89,20 +99,21 @@ def record(
                 if timestamp:
                     markers.append([marker, timestamp])
 
-            # Save every 5s
-            if continuous and (last_written_timestamp is None or last_written_timestamp + 5 < timestamps[-1]):
-                _save(
-                    filename,
+            # Save every RECORD_FLUSH_INTERVAL seconds
+            if continuous and timestamps and (
+                    last_flush is None or
+                    last_flush + RECORD_FLUSH_INTERVAL < timestamps[-1]):
+                last_flush = timestamps[-1]
+                markers = _save(
+                    writer,
                     res,
                     timestamps,
                     time_correction,
                     dejitter,
-                    inlet_marker,
                     markers,
-                    ch_names,
-                    last_written_timestamp=last_written_timestamp,
                 )
-                last_written_timestamp = timestamps[-1]
+                res = []
+                timestamps = []
 
         except KeyboardInterrupt:
             break
@@ -111,68 +122,252 @@ def record(
     print("Time correction: ", time_correction)
 
     _save(
-        filename,
+        writer,
         res,
         timestamps,
         time_correction,
         dejitter,
-        inlet_marker,
         markers,
-        ch_names,
+        final=True,
     )
+    writer.close(time_correction=time_correction)
 
     print("Done - wrote file: {}".format(filename))
 
 
 def _save(
-    filename: Union[str, Path],
+    writer,
     res: list,
     timestamps: list,
     time_correction,
-    dejitter: bool,
-    inlet_marker,
+    dejitter: Optional[Dejitter],
     markers,
-    ch_names: List[str],
-    last_written_timestamp: Optional[float] = None,
+    final: bool = False,
 ):
+    """Append the samples received since the last flush to the recording.
+
+    Returns the markers that could not be placed yet because they are more
+    recent than the last sample, they are placed on the next flush. On the
+    final flush, markers left without a sample to go on are put on the last
+    sample written.
+    """
+    if not timestamps:
+        if final and writer.n_markers and markers and writer.n_samples:
+            # the most recent one wins, as when markers share a sample
+            writer.mark_last(markers[-1][0][:writer.n_markers])
+        return markers
+
     res = np.concatenate(res, axis=0)
     timestamps = np.array(timestamps) + time_correction
 
     if dejitter:
-        y = timestamps
-        X = np.atleast_2d(np.arange(0, len(y))).T
-        lr = LinearRegression()
-        lr.fit(X, y)
-        timestamps = lr.predict(X)
-
-    res = np.c_[timestamps, res]
-    data = pd.DataFrame(data=res, columns=["timestamps"] + ch_names)
-
-    directory = os.path.dirname(filename)
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-
-    if inlet_marker and markers:
-        n_markers = len(markers[0][0])
-        for ii in range(n_markers):
-            data['Marker%d' % ii] = 0
-        # process markers:
-        for marker in markers:
-            # find index of markers
-            ix = np.argmin(np.abs(marker[1] - timestamps))
-            for ii in range(n_markers):
-                data.loc[ix, "Marker%d" % ii] = marker[0][ii]
-
-    # If file doesn't exist, create with headers
-    # If it does exist, just append new rows
-    if not Path(filename).exists():
-        # print("Saving whole file")
-        data.to_csv(filename, float_format='%.3f', index=False)
-    else:
-        # print("Appending file")
-        # truncate already written timestamps
-        data = data[data['timestamps'] > last_written_timestamp]
-        data.to_csv(filename, float_format='%.3f', index=False, mode='a', header=False)
+        timestamps = dejitter.update(timestamps)
+
+    marker_values = None
+    pending = []
+    if writer.n_markers and markers:
+        marker_times = np.array([marker[1] for marker in markers])
+        if final:
+            placed = np.ones(len(markers), dtype=bool)
+        else:
+            placed = marker_times <= timestamps[-1]
+            pending = [marker for marker, done in zip(markers, placed)
+                       if not done]
+
+        if placed.any():
+            values = np.empty((placed.sum(), writer.n_markers), dtype=object)
+            values[:] = [marker[0][:writer.n_markers]
+                         for marker, done in zip(markers, placed) if done]
+            ix = _nearest_indices(timestamps, marker_times[placed])
+            # markers falling on the same sample: the most recent one wins
+            ix, last = np.unique(ix[::-1], return_index=True)
+            marker_values = np.zeros((len(timestamps), writer.n_markers),
+                                     dtype=object)
+            marker_values[ix] = values[::-1][last]
+
+    writer.write(timestamps, res, marker_values)
+    return pending
+
+
+def _nearest_indices(timestamps, times):
+    """Index of the sample closest to each of times, with one searchsorted
+    call for all of them.
+
+    Gives the same index as np.argmin(np.abs(timestamps - time)) for each
+    time: ties, whether between repeated timestamps or between samples at
+    the same distance, go to the sample that comes first in timestamps,
+    even when timestamps are not sorted.
+    """
+    order = None
+    if np.any(np.diff(timestamps) < 0):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+
+    right = np.clip(np.searchsorted(timestamps, times), 1,
+                    len(timestamps) - 1)
+    if len(timestamps) == 1:
+        right = np.zeros_like(right)
+    # first of any repeated timestamps, as np.argmin would pick
+    left = np.searchsorted(timestamps, timestamps[np.maximum(right - 1, 0)])
+    d_left = np.abs(times - timestamps[left])
+    d_right = np.abs(timestamps[right] - times)
+    if order is None:
+        return np.where(d_left <= d_right, left, right)
+    # sorting moved the samples, so a tie goes to the first of the two in
+    # the original order, which need not be the earlier one in time
+    return np.where(d_left < d_right, order[left],
+                    np.where(d_left > d_right, order[right],
+                             np.minimum(order[left], order[right])))
+
+
+class CsvRecordingWriter():
+    """Append recorded samples to a CSV file, one block per flush"""
+
+    def __init__(self, filename, ch_names, n_markers, **metadata):
+        self.filename = filename
+        self.n_markers = n_markers
+        self.columns = (["timestamps"] + list(ch_names) +
+                        ["Marker%d" % ii for ii in range(n_markers)])
+        self.n_samples = 0
+        self._last_row = None
+        self._last_row_at = None
+
+        directory = os.path.dirname(filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._file = open(filename, 'w', newline='')
+        self._file.write(",".join(self.columns) + "\n")
+
+    def write(self, timestamps, data, marker_values=None):
+        import pandas as pd
+
+        block = np.c_[timestamps, data]
+        block = pd.DataFrame(data=block, columns=self.columns[:block.shape[1]])
+        for ii in range(self.n_markers):
+            block['Marker%d' % ii] = (0 if marker_values is None
+                                      else marker_values[:, ii])
+        # the last row is written on its own, so that mark_last can rewrite it
+        self._write_rows(block.iloc[:-1])
+        self._last_row_at = self._file.tell()
+        self._last_row = block.iloc[-1:].copy()
+        self._write_rows(self._last_row)
+        self.n_samples += len(block)
+
+    def mark_last(self, values):
+        """Set the markers of the last sample written."""
+        for ii in range(self.n_markers):
+            self._last_row['Marker%d' % ii] = values[ii]
+        self._file.seek(self._last_row_at)
+        self._file.truncate()
+        self._write_rows(self._last_row)
+
+    def _write_rows(self, rows):
+        rows.to_csv(self._file, float_format='%.3f', index=False,
+                    header=False)
+        self._file.flush()
+
+    def close(self, **metadata):
+        self._file.close()
+
+
+class BinaryRecordingWriter():
+    """Append recorded samples to a binary file of fixed-size records.
+
+    Each record holds a float64 timestamp followed by one float32 value per
+    channel. The layout is described in a JSON sidecar (<filename>.json),
+    and markers are appended to <filename>.markers.csv. Recordings can be
+    read back with read_binary_recording.
+    """
+
+    def __init__(self, filename, ch_names, n_markers, **metadata):
+        self.filename = filename
+        self.n_markers = n_markers
+        self.dtype = np.dtype([("timestamps", "<f8")] +
+                              [(ch, "<f4") for ch in ch_names])
+        self.n_samples = 0
+        self._last_timestamp = None
+
+        directory = os.path.dirname(filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.metadata = dict(metadata, channels=list(ch_names),
+                             dtype=self.dtype.descr, n_markers=n_markers,
+                             start_time=time())
+        self._write_metadata()
+
+        self._file = open(filename, 'wb')
+        self._block = np.zeros(0, dtype=self.dtype)
+
+        self._marker_file = None
+        if n_markers:
+            self._marker_file = open(filename + '.markers.csv', 'w',
+                                     newline='')
+            self._marker_file.write(",".join(
+                ["sample", "timestamps"] +
+                ["Marker%d" % ii for ii in range(n_markers)]) + "\n")
+
+    def write(self, timestamps, data, marker_values=None):
+        n = len(timestamps)
+        if len(self._block) < n:
+            self._block = np.zeros(n, dtype=self.dtype)
+        block = self._block[:n]
+        block["timestamps"] = timestamps
+        data = np.asarray(data)
+        for ii, ch in enumerate(self.dtype.names[1:]):
+            block[ch] = data[:, ii]
+        block.tofile(self._file)
+        self._file.flush()
+        self._last_timestamp = timestamps[-1]
+
+        if marker_values is not None:
+            for ix in np.flatnonzero(np.any(marker_values != 0, axis=1)):
+                self._write_marker(self.n_samples + ix, timestamps[ix],
+                                   marker_values[ix])
+            self._marker_file.flush()
+
+        self.n_samples += n
+
+    def mark_last(self, values):
+        """Add markers on the last sample written."""
+        self._write_marker(self.n_samples - 1, self._last_timestamp, values)
+        self._marker_file.flush()
+
+    def _write_marker(self, sample, timestamp, values):
+        self._marker_file.write(",".join(
+            [str(sample), "%.3f" % timestamp] +
+            [str(value) for value in values]) + "\n")
+
+    def close(self, **metadata):
+        self._file.close()
+        if self._marker_file:
+            self._marker_file.close()
+        self.metadata.update(metadata, n_samples=self.n_samples)
+        self._write_metadata()
+
+    def _write_metadata(self):
+        with open(self.filename + '.json', 'w') as f:
+            json.dump(self.metadata, f, indent=2)
+
+
+def read_binary_recording(filename):
+    """Memory-map a recording written with file_format='binary'.
+
+    Returns (data, metadata) where data is a structured array with a
+    'timestamps' field and one field per channel.
+    """
+    with open(filename + '.json') as f:
+        metadata = json.load(f)
+    dtype = np.dtype([tuple(field) for field in metadata["dtype"]])
+    if os.path.getsize(filename) == 0:
+        return np.zeros(0, dtype=dtype), metadata
+    return np.memmap(filename, dtype=dtype, mode='r'), metadata
+
+
+RECORDING_WRITERS = {"csv": CsvRecordingWriter,
+                     "binary": BinaryRecordingWriter}
+RECORDING_EXTENSIONS = {"csv": "csv", "binary": "bin"}
 
 
 
@@ -185,6 +380,12 @@ def record_direct(duration,
                   backend='auto',
                   interface=None,
                   name=None):
+    import bleak
+    import pandas as pd
+    from . import backends
+    from .muse import Muse
+    from .stream import find_muse
+
     if backend == 'bluemuse':
         raise (NotImplementedError(
             'Direct record not supported with BlueMuse backend. Use record after starting stream instead.'
@@ -212,7 +413,7 @@ def record_direct(duration,
         eeg_samples.append(new_samples)
         timestamps.append(new_timestamps)
 
-    muse = Muse(address, save_eeg, backend=backend)
+    muse = Muse(address, save_eeg, backend=backend, copy_callback_data=True)
     if not muse.connect():
         print(f'Failed to connect to Muse: {address}', file=sys.stderr)
         return
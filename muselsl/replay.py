@@ -0,0 +1,190 @@
+import os
+from time import sleep, time
+
+import numpy as np
+
+from .bandpower import BANDS
+from .constants import (REPLAY_BANDS, REPLAY_BLINK_AMPLITUDE,
+                        REPLAY_BLINK_WIDTH, REPLAY_NOISE)
+
+# Channels where eye blinks show up in the synthetic EEG (AF7 and AF8)
+_FRONTAL_CHANNELS = [1, 2]
+
+
+class SyntheticEEG():
+    """Endless synthetic signal built from band rhythms, noise and blinks.
+
+    Each band in bands adds a sinusoid at the centre of that band (see
+    bandpower.BANDS) with the given amplitude in uV and a random phase per
+    channel. White noise of std noise uV is added on top, and eye blinks
+    occur on the frontal channels as a Poisson process of blink_rate blinks
+    per minute. Consecutive blocks are continuous.
+    """
+
+    def __init__(self, n_channels, sfreq, bands=REPLAY_BANDS,
+                 noise=REPLAY_NOISE, blink_rate=0., seed=None):
+        self.n_channels = n_channels
+        self.sfreq = sfreq
+        self.noise = noise
+        self.blink_rate = blink_rate
+        self.rng = np.random.default_rng(seed)
+
+        edges = {band: (low or 0, high) for band, low, high, _ in BANDS}
+        self.freqs = np.array([sum(edges[band]) / 2. for band in bands])
+        self.amplitudes = np.array([bands[band] for band in bands])
+        self.phases = self.rng.uniform(0, 2 * np.pi,
+                                       (n_channels, len(self.freqs)))
+
+        # blinks are drawn this many samples ahead so that their rising
+        # edge is not cut at block boundaries
+        self.blink_width = REPLAY_BLINK_WIDTH * sfreq
+        self._lookahead = int(4 * self.blink_width)
+        self._blinks = np.zeros(0)
+        self.n_generated = 0
+
+    def __call__(self, n_samples):
+        """Next n_samples as an array of shape (n_channels, n_samples)."""
+        i0 = self.n_generated
+        index = np.arange(i0, i0 + n_samples)
+        t = index / self.sfreq
+
+        # one sinusoid per band and channel, summed over bands
+        angles = 2 * np.pi * self.freqs * t[:, None, None] + self.phases
+        data = (self.amplitudes * np.sin(angles)).sum(axis=2).T
+        data += self.rng.normal(0, self.noise, data.shape)
+
+        if self.blink_rate and self.n_channels > max(_FRONTAL_CHANNELS):
+            n_new = self.rng.poisson(
+                self.blink_rate / 60. * n_samples / self.sfreq)
+            new = self.rng.uniform(i0, i0 + n_samples, n_new) + self._lookahead
+            self._blinks = np.concatenate([
+                self._blinks[self._blinks + self._lookahead >= i0], new])
+            if len(self._blinks):
+                blinks = REPLAY_BLINK_AMPLITUDE * np.exp(
+                    -0.5 * ((index[:, None] - self._blinks) /
+                            self.blink_width) ** 2).sum(axis=1)
+                data[_FRONTAL_CHANNELS] += blinks
+
+        self.n_generated += n_samples
+        return data
+
+
+def read_recording(filename, n_channels):
+    """Timestamps and the first n_channels channels of a recording.
+
+    Reads the CSV files written by record(), or the binary ones with their
+    JSON sidecar. Returns (timestamps, data), with data of shape
+    (n_samples, n_channels).
+    """
+    if os.path.exists(filename + '.json'):
+        from .record import read_binary_recording
+        records, _ = read_binary_recording(filename)
+        names = records.dtype.names[1:]
+        timestamps = np.asarray(records['timestamps'])
+        columns = [records[name] for name in names[:n_channels]]
+    else:
+        import pandas as pd
+        frame = pd.read_csv(filename)
+        names = [name for name in frame.columns[1:]
+                 if not name.startswith('Marker')]
+        timestamps = frame['timestamps'].to_numpy(np.float64)
+        columns = [frame[name].to_numpy() for name in names[:n_channels]]
+
+    if len(columns) < n_channels:
+        raise ValueError("%s has %d channels, %d are needed." %
+                         (filename, len(columns), n_channels))
+    return timestamps, np.column_stack(columns).astype(np.float32)
+
+
+def _recorded_blocks(timestamps, data, block_size, sfreq, loop):
+    """(samples, relative timestamps) blocks of a recording, looped if asked."""
+    times = timestamps - timestamps[0]
+    period = times[-1] + 1. / sfreq
+    offset = 0.
+    while True:
+        for i in range(0, len(times), block_size):
+            yield (data[i:i + block_size].T,
+                   times[i:i + block_size] + offset)
+        if not loop:
+            return
+        offset += period
+
+
+def _synthetic_blocks(generator, block_size, sfreq):
+    """Endless (samples, relative timestamps) blocks of a SyntheticEEG."""
+    while True:
+        i0 = generator.n_generated
+        yield (generator(block_size),
+               np.arange(i0, i0 + block_size) / sfreq)
+
+
+def replay(filename=None, data_source='EEG', speed=1., duration=None,
+           loop=False, bands=None, noise=REPLAY_NOISE, blink_rate=0.,
+           loss=0., jitter_ms=0., name='Muse', address='Replay',
+           lsl_time=False, seed=None, chunk_packets=None, chunk_ms=None):
+    """Publish a recording or a synthetic signal as a Muse LSL stream.
+
+    The outlet has the same metadata as the one stream() creates, and
+    samples are pushed in blocks of the size the headset sends, so
+    consumers cannot tell the replay from a headset. Without filename, a
+    SyntheticEEG with the given bands, noise and blink_rate is streamed.
+
+    speed -- play back this many times faster than real time. Timestamps are
+             compressed accordingly, the nominal rate stays the headset's.
+    duration -- stop after this many seconds of data (recorded time)
+    loop -- start a recording over when it ends
+    loss -- probability of dropping each block, as lost BLE packets
+    jitter_ms -- std of the gaussian jitter added to each block's timestamps
+    """
+    from pylsl import local_clock
+    from .outlets import _MUSE_STREAMS, create_outlet, create_pusher
+
+    n_channels, sfreq, _, block_size, _, _, _ = _MUSE_STREAMS[data_source]
+    if filename:
+        timestamps, data = read_recording(filename, n_channels)
+        if not len(timestamps):
+            print("%s holds no samples." % filename)
+            return
+        blocks = _recorded_blocks(timestamps, data, block_size, sfreq, loop)
+        print("Replaying %s (%.1f s) at %gx." %
+              (filename, timestamps[-1] - timestamps[0], speed))
+    else:
+        if bands is None:
+            bands = REPLAY_BANDS if data_source == 'EEG' else {}
+        generator = SyntheticEEG(n_channels, sfreq, bands, noise, blink_rate,
+                                 seed)
+        blocks = _synthetic_blocks(generator, block_size, sfreq)
+        print("Streaming synthetic %s at %gx." % (data_source, speed))
+
+    time_func = local_clock if lsl_time else time
+    pusher = create_pusher(create_outlet(data_source, address, name),
+                           data_source, chunk_packets=chunk_packets,
+                           chunk_ms=chunk_ms, time_func=time_func)
+    rng = np.random.default_rng(seed)
+
+    n_dropped = 0
+    t_start = time_func()
+    try:
+        for samples, times in blocks:
+            if duration is not None and times[0] >= duration:
+                break
+            # each block is due when its last sample would have been sent
+            delay = t_start + times[-1] / speed - time_func()
+            if delay > 0:
+                sleep(delay)
+            if loss and rng.random() < loss:
+                n_dropped += 1
+                continue
+            stamps = t_start + times / speed
+            if jitter_ms:
+                stamps = stamps + rng.normal(0, jitter_ms / 1000.)
+            pusher(samples, stamps)
+    except KeyboardInterrupt:
+        pass
+    pusher.flush()
+
+    elapsed = time_func() - t_start
+    print("Pushed %d samples in %d blocks (%d dropped) in %.2f s, "
+          "%.0f samples/s." % (pusher.total_samples, pusher.total_packets,
+                               n_dropped, elapsed,
+                               pusher.total_samples / max(elapsed, 1e-9)))
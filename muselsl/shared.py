@@ -0,0 +1,169 @@
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from . import latency
+from .constants import (ACQUISITION_PULL_TIMEOUT, LSL_SCAN_TIMEOUT,
+                        SHARED_BUFFER_LENGTH, SHARED_NAME)
+
+# header: samples published, samples being written, ring length, channel
+# count (int64) and sampling rate (float64)
+_HEADER_BYTES = 40
+
+
+class SharedRing():
+    """Ring buffer of timestamped samples in a named shared-memory block.
+
+    A single producer writes with write(); any number of local processes
+    attach() by name and read the same memory without copying through LSL.
+    The producer announces how far it is about to write, writes the rows,
+    then publishes them by bumping the sample counter. Readers never take a
+    lock: they check the announced position after copying and retry if the
+    rows they copied may have been overwritten meanwhile.
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self._header = np.ndarray((4,), dtype=np.int64, buffer=shm.buf)
+        self.n_samples = int(self._header[2])
+        self.n_channels = int(self._header[3])
+        self.sfreq = float(
+            np.ndarray((1,), dtype=np.float64, buffer=shm.buf, offset=32)[0])
+
+        offset = _HEADER_BYTES
+        self.timestamps = np.ndarray((self.n_samples,), dtype=np.float64,
+                                     buffer=shm.buf, offset=offset)
+        offset += self.timestamps.nbytes
+        self.data = np.ndarray((self.n_samples, self.n_channels),
+                               dtype=np.float32, buffer=shm.buf, offset=offset)
+
+    @classmethod
+    def create(cls, name, n_samples, n_channels, sfreq=0.):
+        if n_samples < 1:
+            raise ValueError("A shared ring needs at least one sample.")
+        size = _HEADER_BYTES + n_samples * (8 + 4 * n_channels)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        np.ndarray((4,), dtype=np.int64, buffer=shm.buf)[:] = (
+            0, 0, n_samples, n_channels)
+        np.ndarray((1,), dtype=np.float64, buffer=shm.buf, offset=32)[0] = sfreq
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        # a consumer must not unlink the block when it exits
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm)
+
+    @property
+    def count(self):
+        """Total number of samples written since the ring was created"""
+        return int(self._header[0])
+
+    def _overwritten(self, start):
+        """True if rows from start on may have been overwritten"""
+        return self._header[1] - self.n_samples > start
+
+    def write(self, samples, timestamps):
+        samples = np.asarray(samples, dtype=np.float32)
+        n = len(timestamps)
+        if n > self.n_samples:
+            samples, timestamps = samples[-self.n_samples:], \
+                timestamps[-self.n_samples:]
+            skipped, n = n - self.n_samples, self.n_samples
+        else:
+            skipped = 0
+        count = self.count + skipped
+        self._header[1] = count + n
+        start = count % self.n_samples
+        first = min(n, self.n_samples - start)
+        self.data[start:start + first] = samples[:first]
+        self.timestamps[start:start + first] = timestamps[:first]
+        self.data[:n - first] = samples[first:]
+        self.timestamps[:n - first] = timestamps[first:]
+        # publish only once the rows are in place
+        self._header[0] = count + n
+
+    def _copy(self, start, stop):
+        ix = np.arange(start, stop) % self.n_samples
+        return self.data[ix], self.timestamps[ix]
+
+    def latest(self, n_samples):
+        """Copy of the newest n_samples as (data, timestamps), or None"""
+        while True:
+            count = self.count
+            if n_samples > min(count, self.n_samples):
+                return None
+            data, timestamps = self._copy(count - n_samples, count)
+            if not self._overwritten(count - n_samples):
+                return data, timestamps
+
+    def read_since(self, position):
+        """Samples written after position, as (data, timestamps, position).
+
+        Pass the returned position to the next call to get every sample
+        exactly once. A reader that falls more than a ring length behind
+        skips the overwritten samples.
+        """
+        while True:
+            count = self.count
+            start = max(position, count - self.n_samples)
+            data, timestamps = self._copy(start, count)
+            if not self._overwritten(start):
+                return data, timestamps, count
+
+    def close(self):
+        del self._header, self.timestamps, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def share(stream_type='EEG', name=None, buffer_length=SHARED_BUFFER_LENGTH,
+          timeout=LSL_SCAN_TIMEOUT):
+    """Copy an LSL stream into a shared-memory ring until interrupted.
+
+    Run once per stream; viewers, recorders and dashboards on the same
+    machine then SharedRing.attach(name) instead of opening their own inlet.
+    """
+    from pylsl import StreamInlet, resolve_byprop
+
+    name = name or SHARED_NAME % stream_type
+    print("Looking for a %s stream..." % stream_type)
+    streams = resolve_byprop('type', stream_type, timeout=timeout)
+    if len(streams) == 0:
+        print("Can't find %s stream." % stream_type)
+        return
+
+    inlet = StreamInlet(streams[0], max_chunklen=12)
+    info = inlet.info()
+    sfreq = info.nominal_srate()
+    if sfreq <= 0:
+        # the ring is sized from the nominal rate
+        print("Can't share %s stream: it has an irregular sampling rate." %
+              stream_type)
+        return
+    ring = SharedRing.create(name, int(sfreq * buffer_length),
+                             info.channel_count(), sfreq)
+    print("Sharing %s stream as '%s' (%d samples)." %
+          (stream_type, name, ring.n_samples))
+
+    try:
+        while True:
+            samples, timestamps = inlet.pull_chunk(
+                timeout=ACQUISITION_PULL_TIMEOUT, max_samples=ring.n_samples)
+            if timestamps:
+                if latency.ENABLED:
+                    latency.record('pull',
+                                   latency.sample_age(timestamps[-1]))
+                ring.write(samples, timestamps)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+        print("Stopped sharing '%s'." % name)
@@ -1,22 +1,15 @@
 import re
 import subprocess
-from functools import partial
 from shutil import which
 from sys import platform
 from time import time
 import logging
 
-import pygatt
-from pylsl import StreamInfo, StreamOutlet, local_clock
+from . import helper
+from .constants import AUTO_DISCONNECT_DELAY, LIST_SCAN_TIMEOUT, LOG_LEVELS
 
-from . import backends, helper
-from .constants import (AUTO_DISCONNECT_DELAY, LSL_ACC_CHUNK, LSL_EEG_CHUNK,
-                        LSL_GYRO_CHUNK, LSL_PPG_CHUNK, MUSE_NB_ACC_CHANNELS,
-                        MUSE_NB_EEG_CHANNELS, MUSE_NB_GYRO_CHANNELS,
-                        MUSE_NB_PPG_CHANNELS, MUSE_SAMPLING_ACC_RATE,
-                        MUSE_SAMPLING_EEG_RATE, MUSE_SAMPLING_GYRO_RATE,
-                        MUSE_SAMPLING_PPG_RATE, LIST_SCAN_TIMEOUT, LOG_LEVELS)
-from .muse import Muse
+# pylsl, pygatt, bleak and the Muse decoder are imported where they are used,
+# so that listing devices does not pay for the streaming dependencies.
 
 
 def _print_muse_list(muses):
@@ -35,6 +28,12 @@ def list_muses(backend='auto', interface=None, log_level=logging.ERROR):
 
     backend = helper.resolve_backend(backend)
 
+    # pygatt is only needed, and imported, for the gatt and bgapi backends
+    BLEError = ()
+    if backend in ('gatt', 'bgapi'):
+        import pygatt
+        BLEError = pygatt.exceptions.BLEError
+
     if backend == 'gatt':
         interface = interface or 'hci0'
         adapter = pygatt.GATTToolBackend(interface)
@@ -43,6 +42,7 @@ def list_muses(backend='auto', interface=None, log_level=logging.ERROR):
         subprocess.call('start bluemuse:', shell=True)
         return
     elif backend == 'bleak':
+        from . import backends
         adapter = backends.BleakBackend()
     elif backend == 'bgapi':
         adapter = pygatt.BGAPIBackend(serial_port=interface)
@@ -52,7 +52,7 @@ def list_muses(backend='auto', interface=None, log_level=logging.ERROR):
         print('Searching for Muses, this may take up to 10 seconds...')
         devices = adapter.scan(timeout=LIST_SCAN_TIMEOUT)
         adapter.stop()
-    except pygatt.exceptions.BLEError as e:
+    except BLEError as e:
         if backend == 'gatt':
             print('pygatt failed to scan for BLE devices. Trying with '
                   'bluetoothctl.')
@@ -137,7 +137,10 @@ def stream(
     disable_light=False,
     lsl_time=False,
     retries=1,
-    log_level=logging.ERROR
+    log_level=logging.ERROR,
+    chunk_packets=None,
+    chunk_ms=None,
+    fill_gaps=None
 ):
     # If no data types are enabled, we warn the user and return immediately.
     if eeg_disabled and not ppg_enabled and not acc_enabled and not gyro_enabled:
@@ -154,74 +157,35 @@ def stream(
                 address = found_muse['address']
                 name = found_muse['name']
 
-        if not eeg_disabled:
-            eeg_info = StreamInfo('Muse', 'EEG', MUSE_NB_EEG_CHANNELS, MUSE_SAMPLING_EEG_RATE, 'float32',
-                                'Muse%s' % address)
-            eeg_info.desc().append_child_value("manufacturer", "Muse")
-            eeg_channels = eeg_info.desc().append_child("channels")
-
-            for c in ['TP9', 'AF7', 'AF8', 'TP10', 'Right AUX']:
-                eeg_channels.append_child("channel") \
-                    .append_child_value("label", c) \
-                    .append_child_value("unit", "microvolts") \
-                    .append_child_value("type", "EEG")
-
-            eeg_outlet = StreamOutlet(eeg_info, LSL_EEG_CHUNK)
-
-        if ppg_enabled:
-            ppg_info = StreamInfo('Muse', 'PPG', MUSE_NB_PPG_CHANNELS, MUSE_SAMPLING_PPG_RATE,
-                                'float32', 'Muse%s' % address)
-            ppg_info.desc().append_child_value("manufacturer", "Muse")
-            ppg_channels = ppg_info.desc().append_child("channels")
-
-            for c in ['PPG1', 'PPG2', 'PPG3']:
-                ppg_channels.append_child("channel") \
-                    .append_child_value("label", c) \
-                    .append_child_value("unit", "mmHg") \
-                    .append_child_value("type", "PPG")
-
-            ppg_outlet = StreamOutlet(ppg_info, LSL_PPG_CHUNK)
-
-        if acc_enabled:
-            acc_info = StreamInfo('Muse', 'ACC', MUSE_NB_ACC_CHANNELS, MUSE_SAMPLING_ACC_RATE,
-                                'float32', 'Muse%s' % address)
-            acc_info.desc().append_child_value("manufacturer", "Muse")
-            acc_channels = acc_info.desc().append_child("channels")
-
-            for c in ['X', 'Y', 'Z']:
-                acc_channels.append_child("channel") \
-                    .append_child_value("label", c) \
-                    .append_child_value("unit", "g") \
-                    .append_child_value("type", "accelerometer")
-
-            acc_outlet = StreamOutlet(acc_info, LSL_ACC_CHUNK)
-
-        if gyro_enabled:
-            gyro_info = StreamInfo('Muse', 'GYRO', MUSE_NB_GYRO_CHANNELS, MUSE_SAMPLING_GYRO_RATE,
-                                'float32', 'Muse%s' % address)
-            gyro_info.desc().append_child_value("manufacturer", "Muse")
-            gyro_channels = gyro_info.desc().append_child("channels")
-
-            for c in ['X', 'Y', 'Z']:
-                gyro_channels.append_child("channel") \
-                    .append_child_value("label", c) \
-                    .append_child_value("unit", "dps") \
-                    .append_child_value("type", "gyroscope")
-
-            gyro_outlet = StreamOutlet(gyro_info, LSL_GYRO_CHUNK)
-
-        def push(data, timestamps, outlet):
-            for ii in range(data.shape[1]):
-                outlet.push_sample(data[:, ii], timestamps[ii])
-
-        push_eeg = partial(push, outlet=eeg_outlet) if not eeg_disabled else None
-        push_ppg = partial(push, outlet=ppg_outlet) if ppg_enabled else None
-        push_acc = partial(push, outlet=acc_outlet) if acc_enabled else None
-        push_gyro = partial(push, outlet=gyro_outlet) if gyro_enabled else None
+        from pylsl import local_clock
+        from . import backends
+        from .muse import Muse
+        from .outlets import create_gap_outlet, create_outlet, create_pusher
 
         time_func = local_clock if lsl_time else time
 
+        pushers = {}
+        for source, enabled in (('EEG', not eeg_disabled), ('PPG', ppg_enabled),
+                                ('ACC', acc_enabled), ('GYRO', gyro_enabled)):
+            if enabled:
+                pushers[source] = create_pusher(
+                    create_outlet(source, address), source,
+                    chunk_packets=chunk_packets, chunk_ms=chunk_ms,
+                    time_func=time_func)
+
+        push_eeg = pushers.get('EEG')
+        push_gap = None
+        if push_eeg:
+            gap_outlet = create_gap_outlet(address)
+
+            def push_gap(n_samples, timestamp):
+                gap_outlet.push_sample([n_samples], timestamp)
+        push_ppg = pushers.get('PPG')
+        push_acc = pushers.get('ACC')
+        push_gyro = pushers.get('GYRO')
+
         muse = Muse(address=address, callback_eeg=push_eeg, callback_ppg=push_ppg, callback_acc=push_acc, callback_gyro=push_gyro,
+                    callback_gap=push_gap, fill_gaps=fill_gaps,
                     backend=backend, interface=interface, name=name, preset=preset, disable_light=disable_light, time_func=time_func, log_level=log_level)
 
         didConnect = muse.connect(retries=retries)
@@ -246,6 +210,14 @@ def stream(
                     muse.disconnect()
                     break
 
+            for pusher in pushers.values():
+                pusher.flush()
+
+            if push_eeg and muse.eeg_gaps:
+                print('EEG gaps: %d, packets lost per channel: %s' % (
+                    muse.eeg_gaps, ', '.join(
+                        '%.2f%%' % (100 * rate) for rate in muse.eeg_loss_rate)))
+
             print('Disconnected.')
 
     # For bluemuse backend, we don't need to create LSL streams directly, since these are handled in BlueMuse itself.
@@ -256,6 +228,7 @@ def stream(
         subprocess.call('start bluemuse://setting?key=accelerometer_enabled!value={}'.format('true' if acc_enabled else 'false'), shell=True)
         subprocess.call('start bluemuse://setting?key=gyroscope_enabled!value={}'.format('true' if gyro_enabled else 'false'), shell=True)
 
+        from .muse import Muse
         muse = Muse(address=address, callback_eeg=None, callback_ppg=None, callback_acc=None, callback_gyro=None,
                     backend=backend, interface=interface, name=name)
         muse.connect(retries=retries)
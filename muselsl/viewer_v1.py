@@ -6,6 +6,7 @@ from pylsl import StreamInlet, resolve_byprop
 import seaborn as sns
 from threading import Thread
 from .constants import VIEW_BUFFER, VIEW_SUBSAMPLE, LSL_SCAN_TIMEOUT, LSL_EEG_CHUNK
+from .envelope import MinMaxPyramid
 
 
 def view(window, scale, refresh, figure, backend, version=1):
@@ -73,8 +74,12 @@ class LSLViewer():
 
         sns.despine(left=True)
 
+        # circular buffers, self.head is the index of the oldest sample (and
+        # the next one to be overwritten)
+        self.head = 0
         self.data = np.zeros((self.n_samples, self.n_chan))
-        self.times = np.arange(-self.window, 0, 1. / self.sfreq)
+        self.times = np.arange(-self.n_samples, 0) / self.sfreq
+        self.last_time = self.times[-1]
         impedances = np.std(self.data, axis=0)
         lines = []
 
@@ -104,6 +109,52 @@ class LSLViewer():
         zi = lfilter_zi(self.bf, self.af)
         self.filt_state = np.tile(zi, (self.n_chan, 1)).transpose()
         self.data_f = np.zeros((self.n_samples, self.n_chan))
+        self.envelope = MinMaxPyramid(self.n_samples, self.n_chan)
+        self.envelope_f = MinMaxPyramid(self.n_samples, self.n_chan)
+
+    def ordered(self, buffer):
+        """Copy of a circular buffer from the oldest to the newest sample"""
+        return np.concatenate([buffer[self.head:], buffer[:self.head]])
+
+    def resize(self, n_samples):
+        """Change the buffer length, keeping the most recent samples"""
+        times = self.ordered(self.times)
+        pad = n_samples - len(times)
+        if pad > 0:
+            # extend the time axis backwards, as if zeros had been received
+            times = np.concatenate(
+                [times[0] - np.arange(pad, 0, -1) / self.sfreq, times])
+        self.times = times[-n_samples:]
+        for name in ('data', 'data_f'):
+            data = self.ordered(getattr(self, name))
+            if pad > 0:
+                data = np.vstack([np.zeros((pad, self.n_chan)), data])
+            setattr(self, name, data[-n_samples:])
+        self.head = 0
+        self.n_samples = n_samples
+        self.envelope = MinMaxPyramid(n_samples, self.n_chan)
+        self.envelope.push(self.data)
+        self.envelope_f = MinMaxPyramid(n_samples, self.n_chan)
+        self.envelope_f.push(self.data_f)
+
+    def push(self, timestamps, samples, filt_samples):
+        """Write a chunk at the head of the circular buffers"""
+        self.envelope.push(samples)
+        self.envelope_f.push(filt_samples)
+        n = len(timestamps)
+        if n > self.n_samples:
+            timestamps = timestamps[-self.n_samples:]
+            samples = samples[-self.n_samples:]
+            filt_samples = filt_samples[-self.n_samples:]
+            n = self.n_samples
+        first = min(n, self.n_samples - self.head)
+        for buffer, values in ((self.times, timestamps),
+                               (self.data, samples),
+                               (self.data_f, filt_samples)):
+            buffer[self.head:self.head + first] = values[:first]
+            buffer[:n - first] = values[first:]
+        self.head = (self.head + n) % self.n_samples
+        self.last_time = timestamps[-1]
 
     def update_plot(self):
         k = 0
@@ -116,31 +167,43 @@ class LSLViewer():
                     if self.dejitter:
                         timestamps = np.float64(np.arange(len(timestamps)))
                         timestamps /= self.sfreq
-                        timestamps += self.times[-1] + 1. / self.sfreq
-                    self.times = np.concatenate([self.times, timestamps])
-                    self.n_samples = int(self.sfreq * self.window)
-                    self.times = self.times[-self.n_samples:]
-                    self.data = np.vstack([self.data, samples])
-                    self.data = self.data[-self.n_samples:]
+                        timestamps += self.last_time + 1. / self.sfreq
+                    n_samples = int(self.sfreq * self.window)
+                    if n_samples != self.n_samples:
+                        self.resize(n_samples)
+                    samples = np.asarray(samples)
                     filt_samples, self.filt_state = lfilter(
                         self.bf, self.af,
                         samples,
                         axis=0, zi=self.filt_state)
-                    self.data_f = np.vstack([self.data_f, filt_samples])
-                    self.data_f = self.data_f[-self.n_samples:]
+                    self.push(np.asarray(timestamps), samples, filt_samples)
                     k += 1
                     if k == self.display_every:
-
                         if self.filt:
-                            plot_data = self.data_f
+                            data, envelope = self.data_f, self.envelope_f
+                            offset = 0
                         elif not self.filt:
-                            plot_data = self.data - self.data.mean(axis=0)
+                            data, envelope = self.data, self.envelope
+                            offset = data.mean(axis=0)
+                        # draw the min/max envelope once there are more
+                        # samples than pixels, at the matching resolution
+                        bins = envelope.envelope(
+                            self.n_samples, int(self.axes.bbox.width))
+                        if bins is None:
+                            # the rolled views are only built for drawn frames
+                            times = self.ordered(self.times)
+                            x = times[::self.subsample] - times[-1]
+                            y = self.ordered(data)[::self.subsample] - offset
+                        else:
+                            starts, mins, maxs = bins
+                            x = np.repeat((starts + 1) / self.sfreq, 2)
+                            y = np.empty((2 * len(starts), self.n_chan))
+                            y[0::2] = mins - offset
+                            y[1::2] = maxs - offset
+                        impedances = np.std(data, axis=0)
                         for ii in range(self.n_chan):
-                            self.lines[ii].set_xdata(self.times[::self.subsample] -
-                                                     self.times[-1])
-                            self.lines[ii].set_ydata(plot_data[::self.subsample, ii] /
-                                                     self.scale - ii)
-                            impedances = np.std(plot_data, axis=0)
+                            self.lines[ii].set_xdata(x)
+                            self.lines[ii].set_ydata(y[:, ii] / self.scale - ii)
 
                         ticks_labels = ['%s - %.2f' % (self.ch_names[ii],
                                                        impedances[ii])
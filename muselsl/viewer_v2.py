@@ -29,19 +29,27 @@ varying vec3 v_index;
 uniform vec2 u_scale;
 // Size of the table.
 uniform vec2 u_size;
-// Number of samples per signal.
+// Number of samples per signal. Each signal has one more vertex, a copy of
+// its first sample, that draws the segment from the last sample of the
+// buffer back to the first one.
 uniform float u_n;
+// Time index of the oldest sample in the circular buffer.
+uniform float u_head;
 // Color.
 attribute vec3 a_color;
 varying vec4 v_color;
 // Varying variables used for clipping in the fragment shader.
 varying vec2 v_position;
 varying vec4 v_ab;
+varying float v_shift;
 void main() {
     float n_rows = u_size.x;
     float n_cols = u_size.y;
-    // Compute the x coordinate from the time index.
-    float x = -1 + 2*a_index.z / (u_n-1);
+    // Compute the x coordinate from the time index, relative to the oldest
+    // sample of the circular buffer.
+    float t = mod(a_index.z - u_head, u_n);
+    float x = -1 + 2*t / (u_n-1);
+    v_shift = a_index.z - t;
     vec2 position = vec2(x - (1 - 1 / u_scale.x), a_position);
     // Find the affine transformation for the subplots.
     vec2 a = vec2(1./n_cols, 1./n_rows)*.9;
@@ -63,11 +71,19 @@ varying vec4 v_color;
 varying vec3 v_index;
 varying vec2 v_position;
 varying vec4 v_ab;
+varying float v_shift;
+uniform float u_n;
+uniform float u_head;
 void main() {
     gl_FragColor = v_color;
     // Discard the fragments between the signals (emulate glMultiDrawArrays).
     if ((fract(v_index.x) > 0.) || (fract(v_index.y) > 0.))
         discard;
+    // Discard the segment joining the newest sample to the oldest one, the
+    // only one along which v_shift - u_head is not a multiple of u_n.
+    float d = v_shift - u_head;
+    if (abs(d - u_n*floor(d/u_n + .5)) > .5)
+        discard;
     // Clipping test.
     vec2 test = abs((v_position.xy-v_ab.zw)/v_ab.xy);
     if ((test.x > 1))
@@ -120,28 +136,31 @@ class Canvas(app.Canvas):
         # Number of samples per signal.
         n = n_samples
 
-        # Various signal amplitudes.
-        amplitudes = np.zeros((m, n)).astype(np.float32)
+        # Various signal amplitudes, with the copy of the first sample that
+        # closes the circular buffer.
+        amplitudes = np.zeros((m, n + 1)).astype(np.float32)
         # gamma = np.ones((m, n)).astype(np.float32)
         # Generate the signals as a (m, n) array.
         y = amplitudes
 
         color = color_palette("RdBu_r", n_rows)
 
-        color = np.repeat(color, n, axis=0).astype(np.float32)
+        color = np.repeat(color, n + 1, axis=0).astype(np.float32)
         # Signal 2D index of each vertex (row and col) and x-index (sample index
         # within each signal).
-        index = np.c_[np.repeat(np.repeat(np.arange(n_cols), n_rows), n),
-                      np.repeat(np.tile(np.arange(n_rows), n_cols), n),
-                      np.tile(np.arange(n), m)].astype(np.float32)
+        index = np.c_[np.repeat(np.repeat(np.arange(n_cols), n_rows), n + 1),
+                      np.repeat(np.tile(np.arange(n_rows), n_cols), n + 1),
+                      np.tile(np.arange(n + 1), m)].astype(np.float32)
 
         self.program = gloo.Program(VERT_SHADER, FRAG_SHADER)
-        self.program['a_position'] = y.reshape(-1, 1)
+        self.positions = gloo.VertexBuffer(y.reshape(-1, 1))
+        self.program['a_position'] = self.positions
         self.program['a_color'] = color
         self.program['a_index'] = index
         self.program['u_scale'] = (1., 1.)
         self.program['u_size'] = (n_rows, n_cols)
         self.program['u_n'] = n
+        self.program['u_head'] = 0.
 
         # text
         self.font_size = 48.
@@ -160,8 +179,12 @@ class Canvas(app.Canvas):
         self.filt = filt
         self.af = [1.0]
 
+        # circular buffers, in the same order as the vertices of each signal;
+        # self.head is the index of the oldest sample
+        self.head = 0
         self.data_f = np.zeros((n_samples, self.n_chans))
         self.data = np.zeros((n_samples, self.n_chans))
+        self.upload_all = False
 
         self.bf = create_filter(self.data_f.T, self.sfreq, 3, 40.,
                                 method='fir')
@@ -181,6 +204,7 @@ class Canvas(app.Canvas):
         # toggle filtering
         if event.key.name == 'D':
             self.filt = not self.filt
+            self.upload_all = True
 
         # increase time scale
         if event.key.name in ['+', '-']:
@@ -203,6 +227,40 @@ class Canvas(app.Canvas):
         self.program['u_scale'] = (max(1, scale_x_new), max(0.01, scale_y_new))
         self.update()
 
+    def push(self, samples, filt_samples):
+        """Write new samples at the head of the circular buffers.
+
+        Returns the index of the first written sample.
+        """
+        samples = samples[-self.n_samples:]
+        filt_samples = filt_samples[-self.n_samples:]
+        n = len(samples)
+        start = self.head
+        ix = (start + np.arange(n)) % self.n_samples
+        self.data[ix] = samples
+        self.data_f[ix] = filt_samples
+        self.head = (start + n) % self.n_samples
+        return start
+
+    def upload(self, values, start):
+        """Upload values (samples x channels) to the vertices from start"""
+        values = values.astype(np.float32)
+        n = len(values)
+        first = min(n, self.n_samples - start)
+        # the sample written at index 0, if any, also goes to the last vertex
+        wrapped = 0 if start == 0 else first if first < n else None
+        for ii in range(self.n_chans):
+            offset = ii * (self.n_samples + 1)
+            self.positions.set_subdata(
+                np.ascontiguousarray(values[:first, ii]), offset=offset + start)
+            if first < n:
+                self.positions.set_subdata(
+                    np.ascontiguousarray(values[first:, ii]), offset=offset)
+            if wrapped is not None:
+                self.positions.set_subdata(
+                    values[wrapped:wrapped + 1, ii].copy(),
+                    offset=offset + self.n_samples)
+
     def on_timer(self, event):
         """Add some data at the end of each signal (real-time signals)."""
 
@@ -211,20 +269,18 @@ class Canvas(app.Canvas):
         if timestamps:
             samples = np.array(samples)[:, ::-1]
 
-            self.data = np.vstack([self.data, samples])
-            self.data = self.data[-self.n_samples:]
             filt_samples, self.filt_state = lfilter(self.bf, self.af, samples,
                                                     axis=0, zi=self.filt_state)
-            self.data_f = np.vstack([self.data_f, filt_samples])
-            self.data_f = self.data_f[-self.n_samples:]
+            start = self.push(samples, filt_samples)
 
+            last_second = (self.head - int(self.sfreq) +
+                           np.arange(int(self.sfreq))) % self.n_samples
             if self.filt:
-                plot_data = self.data_f / self.scale
+                plot_data = self.data_f[last_second] / self.scale
             elif not self.filt:
-                plot_data = (self.data - self.data.mean(axis=0)) / self.scale
+                plot_data = self.data[last_second] / self.scale
 
-            sd = np.std(plot_data[-int(self.sfreq):],
-                        axis=0)[::-1] * self.scale
+            sd = np.std(plot_data, axis=0)[::-1] * self.scale
             co = np.int32(np.tanh((sd - 30) / 15) * 5 + 5)
             for ii in range(self.n_chans):
                 self.quality[ii].text = '%.2f' % (sd[ii])
@@ -234,8 +290,20 @@ class Canvas(app.Canvas):
                 self.names[ii].font_size = 12 + co[ii]
                 self.names[ii].color = self.quality_colors[co[ii]]
 
-            self.program['a_position'].set_data(
-                plot_data.T.ravel().astype(np.float32))
+            if not self.filt:
+                # the window mean moves with every chunk, so every vertex
+                # changes
+                values = (self.data - self.data.mean(axis=0)) / self.scale
+                self.positions.set_data(
+                    np.r_[values, values[:1]].T.ravel().astype(np.float32))
+            elif self.upload_all:
+                self.upload(self.data_f / self.scale, 0)
+            else:
+                # only the new samples, the shader shifts the others
+                self.upload(filt_samples[-self.n_samples:] / self.scale,
+                            start)
+            self.upload_all = False
+            self.program['u_head'] = float(self.head)
             self.update()
 
     def on_resize(self, event):
@@ -0,0 +1,76 @@
+import math
+
+import numpy as np
+
+# Edges of the focus score histogram bins
+FOCUS_BINS = np.linspace(0., 10., 21)
+
+
+class SessionStats:
+    """Session aggregates updated as scores and putts arrive.
+
+    Mean and variance use Welford's online algorithm and the focus histogram
+    has fixed bins, so a recap never has to go back over the raw logs.
+    """
+
+    def __init__(self):
+        self.n_focus = 0
+        self.focus_mean = 0.
+        self.focus_m2 = 0.
+        self.focus_min = math.inf
+        self.focus_max = -math.inf
+        self.histogram = np.zeros(len(FOCUS_BINS) - 1, dtype=np.int64)
+        self.n_putts = 0
+        self.made = 0
+        self.missed = 0
+        self.nudges = 0
+
+    def add_focus(self, score):
+        score = float(score)
+        self.n_focus += 1
+        delta = score - self.focus_mean
+        self.focus_mean += delta / self.n_focus
+        self.focus_m2 += delta * (score - self.focus_mean)
+        self.focus_min = min(self.focus_min, score)
+        self.focus_max = max(self.focus_max, score)
+        # out of range scores count in the first or last bin
+        i = np.searchsorted(FOCUS_BINS, score, side="right") - 1
+        self.histogram[min(max(i, 0), len(self.histogram) - 1)] += 1
+
+    def add_putt(self, putt):
+        self.n_putts += 1
+        if putt["result"] == "made":
+            self.made += 1
+        elif putt["result"] == "miss":
+            self.missed += 1
+        self.nudges += bool(putt["nudge"])
+
+    @property
+    def focus_var(self):
+        """Sample variance of the focus scores (None below two scores)."""
+        return self.focus_m2 / (self.n_focus - 1) if self.n_focus > 1 else None
+
+    def to_dict(self):
+        return {
+            "n_focus": self.n_focus,
+            "focus_mean": self.focus_mean,
+            "focus_m2": self.focus_m2,
+            "focus_min": self.focus_min if self.n_focus else None,
+            "focus_max": self.focus_max if self.n_focus else None,
+            "histogram": self.histogram.tolist(),
+            "n_putts": self.n_putts,
+            "made": self.made,
+            "missed": self.missed,
+            "nudges": self.nudges,
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        stats = cls()
+        for key, value in values.items():
+            if key == "histogram":
+                value = np.array(value, dtype=np.int64)
+            elif key in ("focus_min", "focus_max") and value is None:
+                value = math.inf if key == "focus_min" else -math.inf
+            setattr(stats, key, value)
+        return stats
@@ -0,0 +1,164 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from focus_log import FocusLog
+from session_stats import SessionStats
+
+DEFAULT_DB_PATH = "caddy_sessions.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    n_focus INTEGER NOT NULL,
+    n_putts INTEGER NOT NULL,
+    made INTEGER NOT NULL,
+    missed INTEGER NOT NULL,
+    nudges INTEGER NOT NULL,
+    focus_mean REAL,
+    focus_var REAL,
+    stats TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_start ON sessions (start);
+CREATE INDEX IF NOT EXISTS sessions_player_start ON sessions (player, start);
+CREATE TABLE IF NOT EXISTS focus (
+    session_id INTEGER PRIMARY KEY REFERENCES sessions (id) ON DELETE CASCADE,
+    threshold REAL NOT NULL,
+    times BLOB NOT NULL,
+    scores BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS putts (
+    session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    timestamp TEXT NOT NULL,
+    focus REAL,
+    result TEXT NOT NULL,
+    nudge INTEGER NOT NULL,
+    low_focus_last_10s INTEGER NOT NULL,
+    low_focus_last INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS putts_session ON putts (session_id);
+"""
+
+PUTT_COLUMNS = ("timestamp", "focus", "result", "nudge", "low_focus_last_10s", "low_focus_last")
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _sql_value(value):
+    # NumPy scalars (e.g. scores) are not accepted by sqlite3
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class SessionStore:
+    """Finished sessions in SQLite: one summary row per session, raw logs fetched on demand.
+
+    Summaries come from the session's running SessionStats and are indexed by
+    start time and player, so listing history is a paginated query that never
+    touches the focus or putt logs.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # a connection per call, Streamlit serves each session on its own thread
+        db = sqlite3.connect(self.path)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA foreign_keys = ON")
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def save(self, player, start, end, focus_log, putt_log, stats):
+        """Store a finished session with its SessionStats and return its summary."""
+        row = {
+            "player": player,
+            "start": start,
+            "end": end,
+            "n_focus": stats.n_focus,
+            "n_putts": stats.n_putts,
+            "made": stats.made,
+            "missed": stats.missed,
+            "nudges": stats.nudges,
+            "focus_mean": stats.focus_mean if stats.n_focus else None,
+            "focus_var": stats.focus_var,
+            "stats": json.dumps(stats.to_dict()),
+        }
+        with self._connect() as db:
+            cursor = db.execute(
+                "INSERT INTO sessions (%s) VALUES (%s)" % (", ".join(row), ", ".join("?" * len(row))),
+                tuple(row.values()))
+            session_id = cursor.lastrowid
+            db.execute("INSERT INTO focus VALUES (?, ?, ?, ?)",
+                       (session_id, focus_log.threshold,
+                        focus_log.times.tobytes(), focus_log.scores.tobytes()))
+            db.executemany("INSERT INTO putts VALUES (?, %s)" % ", ".join("?" * len(PUTT_COLUMNS)),
+                           [(session_id,) + tuple(_sql_value(putt[key]) for key in PUTT_COLUMNS)
+                            for putt in putt_log])
+        return self.get(session_id)
+
+    @staticmethod
+    def _summary(row):
+        summary = dict(row)
+        summary["start"] = datetime.fromtimestamp(row["start"]).strftime(TIME_FORMAT)
+        summary["end"] = datetime.fromtimestamp(row["end"]).strftime(TIME_FORMAT)
+        summary["duration"] = str(timedelta(seconds=int(row["end"] - row["start"])))
+        summary["stats"] = SessionStats.from_dict(json.loads(row["stats"]))
+        return summary
+
+    def _where(self, player):
+        return ("WHERE player = ?", (player,)) if player is not None else ("", ())
+
+    def count(self, player=None):
+        where, args = self._where(player)
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM sessions " + where, args).fetchone()[0]
+
+    def sessions(self, player=None, limit=10, offset=0):
+        """Summaries of the most recent sessions first, one page at a time."""
+        where, args = self._where(player)
+        with self._connect() as db:
+            rows = db.execute("SELECT * FROM sessions %s ORDER BY start DESC LIMIT ? OFFSET ?" % where,
+                              args + (limit, offset)).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def get(self, session_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return self._summary(row) if row is not None else None
+
+    def focus_log(self, session_id):
+        with self._connect() as db:
+            row = db.execute("SELECT threshold, times, scores FROM focus WHERE session_id = ?",
+                             (session_id,)).fetchone()
+        if row is None:
+            return FocusLog()
+        return FocusLog.from_arrays(np.frombuffer(row["times"], dtype=np.float64),
+                                    np.frombuffer(row["scores"], dtype=np.float32),
+                                    row["threshold"])
+
+    def putt_log(self, session_id):
+        with self._connect() as db:
+            rows = db.execute("SELECT %s FROM putts WHERE session_id = ? ORDER BY rowid" % ", ".join(PUTT_COLUMNS),
+                              (session_id,)).fetchall()
+        putts = [dict(row) for row in rows]
+        for putt in putts:
+            for key in ("nudge", "low_focus_last_10s", "low_focus_last"):
+                putt[key] = bool(putt[key])
+        return putts
+
+    def clear(self, player=None):
+        where, args = self._where(player)
+        with self._connect() as db:
+            db.execute("DELETE FROM sessions " + where, args)
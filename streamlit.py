@@ -1,6 +1,7 @@
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
-from pylsl import StreamInlet, resolve_byprop
+from muselsl import latency
+from muselsl.acquisition import EEGAcquisition
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
@@ -25,17 +26,20 @@ if "latest_focus" not in st.session_state:
 
 
 # Connect to Muse LSL EEG stream (once per session)
-if "inlet" not in st.session_state:
-   st.write("🔌 Connecting to Muse EEG stream...")
-   streams = resolve_byprop("type", "EEG", timeout=10)
-   if not streams:
-       st.error("No EEG stream found. Please run 'muselsl stream' in a terminal.")
-       st.stop()
-   st.session_state.inlet = StreamInlet(streams[0])
-   st.success("✅ Connected to Muse EEG stream.")
-
-
-inlet = st.session_state.inlet
+@st.cache_resource
+def get_acquisition():
+   # One background thread per server keeps draining the inlet, so a
+   # rerun only copies the latest window out of its ring buffer
+   acquisition = EEGAcquisition("EEG", timeout=10)
+   acquisition.start()
+   return acquisition
+
+
+try:
+   acquisition = get_acquisition()
+except RuntimeError:
+   st.error("No EEG stream found. Please run 'muselsl stream' in a terminal.")
+   st.stop()
 
 
 # Calibration block (non-blocking)
@@ -50,17 +54,11 @@ if not st.session_state.calibrated:
    st.info(f"Step {st.session_state.calibration_steps + 1} of 6 – Please sit still...")
 
 
-   eeg_window = [[], [], [], []]
-   collected = 0
-   while collected < 256:
-       sample, _ = inlet.pull_sample(timeout=0.1)
-       if sample and len(sample) >= 4:
-           for i in range(4):
-               eeg_window[i].append(sample[i])
-           collected += 1
-
-
-   eeg_data = np.array(eeg_window)
+   window = acquisition.latest(256)
+   # windows straddling lost packets (NaN with --fill-gaps nan) are skipped
+   if window is None or np.isnan(window[0]).any():
+      st.stop()
+   eeg_data = window[0][:, :4].T
    powers = np.mean(np.square(eeg_data), axis=1)
    avg_power = np.mean(powers)
 
@@ -81,24 +79,10 @@ if not st.session_state.calibrated:
 
 
 def get_focus_score():
-   eeg_window = [[], [], [], []]  # 4 Muse channels
-   samples_needed = 256
-
-
-   start_time = time.time()
-   while len(eeg_window[0]) < samples_needed:
-       if time.time() - start_time > 10:
-           print("⚠️ Timeout while collecting EEG samples.")
-           return st.session_state.latest_focus
-
-
-       sample, _ = inlet.pull_sample(timeout=1.0)
-       if sample and len(sample) >= 4:
-           for i in range(4):  # TP9, AF7, AF8, TP10
-               eeg_window[i].append(sample[i])
-
-
-   eeg_data = np.array(eeg_window)
+   window = acquisition.latest(256)
+   if window is None or np.isnan(window[0]).any():
+      return st.session_state.latest_focus
+   eeg_data = window[0][:, :4].T  # TP9, AF7, AF8, TP10
    powers = np.mean(np.square(eeg_data), axis=1)
    avg_power = np.mean(powers)
 
@@ -108,6 +92,10 @@ def get_focus_score():
    power_clipped = np.clip(avg_power, focus_max, focus_min)
    normalized = 10 - ((power_clipped - focus_max) / (focus_min - focus_max)) * 9.0
    score = round(min(max(1.0, normalized), 10.0), 2)
+   if latency.ENABLED:
+       # age of the newest sample behind the score, see `muselsl stats`
+       latency.record("score", latency.sample_age(window[1][-1]))
+       st.session_state.scored_sample_time = window[1][-1]
 
 
    print(f"EEG Power (µV²): {avg_power:.2f} → Focus Score: {score}")
@@ -130,6 +118,8 @@ st.session_state.visible_focus_log.append({"timestamp": timestamp, "focus": focu
 # UI
 st.title("⛳ Caddy.ai – Live Focus from Muse 2")
 st.metric("🧠 Focus Score", focus_score)
+if latency.ENABLED and "scored_sample_time" in st.session_state:
+   latency.record("render", latency.sample_age(st.session_state.scored_sample_time))
 if focus_score < 3.5:
    st.error("🔴 Nudge Triggered: Take a Breath")
 else:
@@ -1,11 +1,16 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from streamlit_autorefresh import st_autorefresh
 import random
 import altair as alt
 
+from focus_log import FocusLog, FocusTrend, NUDGE_THRESHOLD
+from session_stats import SessionStats, FOCUS_BINS
+from session_store import SessionStore
+
 # Auto-refresh every second
 st_autorefresh(interval=2000, key="focus_refresh")
 
@@ -14,19 +19,28 @@ if "start" not in st.session_state:
     st.session_state.start = False
 if "start_time" not in st.session_state:
     st.session_state.start_time = None
-if "history" not in st.session_state:
-    st.session_state.history = []
 if "focus_log" not in st.session_state:
-    st.session_state.focus_log = []
+    st.session_state.focus_log = FocusLog()
+if "focus_trend" not in st.session_state:
+    st.session_state.focus_trend = FocusTrend()
 if "putt_log" not in st.session_state:
     st.session_state.putt_log = []
-if "visible_focus_log" not in st.session_state:
-    st.session_state.visible_focus_log = []
+if "stats" not in st.session_state:
+    st.session_state.stats = SessionStats()
 if "latest_focus" not in st.session_state:
     st.session_state.latest_focus = None
 if "session_summary" not in st.session_state:
     st.session_state.session_summary = None
 
+# Sessions listed per page of the history
+HISTORY_PAGE_SIZE = 10
+
+
+@st.cache_resource
+def get_store():
+    return SessionStore()
+
+
 # --- Timer display ---
 def show_timer():
     if st.session_state.start and st.session_state.start_time:
@@ -37,38 +51,34 @@ def show_timer():
 
 # --- Log Putt Function ---
 def log_putt(result_label):
-    putt_time = datetime.now()
-    last_putt_time = datetime.fromisoformat(st.session_state.putt_log[-1]["timestamp"]) if st.session_state.putt_log else datetime.fromisoformat(st.session_state.focus_log[0]["timestamp"])
+    focus_log = st.session_state.focus_log
+    putt_time = time.time()
+    if st.session_state.putt_log:
+        last_putt_time = datetime.fromisoformat(st.session_state.putt_log[-1]["timestamp"]).timestamp()
+    else:
+        last_putt_time = focus_log.times[0] if len(focus_log) else putt_time
 
     # Nudge occurred between last putt and now
-    nudge_during_window = any(
-        last_putt_time <= datetime.fromisoformat(entry["timestamp"]) <= putt_time and entry["focus"] < 2.2
-        for entry in st.session_state.visible_focus_log
-    )
+    nudge_during_window = focus_log.any_below(NUDGE_THRESHOLD, last_putt_time, putt_time)
 
     # Any low focus in last 10s
-    ten_sec_window = putt_time - timedelta(seconds=10)
-    low_focus_last_10s = any(
-        datetime.fromisoformat(entry["timestamp"]) >= ten_sec_window and entry["focus"] < 2.2
-        for entry in st.session_state.focus_log
-    )
+    low_focus_last_10s = focus_log.any_below(NUDGE_THRESHOLD, putt_time - 10)
 
     # Was the last focus entry before this one also low?
-    last_focus_entry = next(
-        (entry for entry in reversed(st.session_state.focus_log)
-         if datetime.fromisoformat(entry["timestamp"]) < putt_time), None
-    )
-    low_focus_last = last_focus_entry is not None and last_focus_entry["focus"] < 2.2
+    last_focus_entry = focus_log.last_before(putt_time)
+    low_focus_last = last_focus_entry is not None and last_focus_entry[1] < NUDGE_THRESHOLD
 
     # Log it
-    st.session_state.putt_log.append({
-        "timestamp": putt_time.isoformat(),
+    putt = {
+        "timestamp": datetime.fromtimestamp(putt_time).isoformat(),
         "focus": st.session_state.latest_focus,
         "result": result_label,
         "nudge": nudge_during_window,
         "low_focus_last_10s": low_focus_last_10s,
         "low_focus_last": low_focus_last
-    })
+    }
+    st.session_state.putt_log.append(putt)
+    st.session_state.stats.add_putt(putt)
 
 # --- Start/End Session Toggle ---
 def toggle_session():
@@ -77,57 +87,45 @@ def toggle_session():
 
         if st.session_state.start:
             st.session_state.start_time = time.time()
-            st.session_state.focus_log = []
+            st.session_state.focus_log = FocusLog()
+            st.session_state.focus_trend = FocusTrend()
             st.session_state.putt_log = []
-            st.session_state.visible_focus_log = []
+            st.session_state.stats = SessionStats()
             st.session_state.session_summary = None
         else:
-            end_time = time.time()
-            elapsed = int(end_time - st.session_state.start_time)
-            duration = str(timedelta(seconds=elapsed))
-
-            session_data = {
-                "start": datetime.fromtimestamp(st.session_state.start_time).strftime("%Y-%m-%d %H:%M:%S"),
-                "end": datetime.fromtimestamp(end_time).strftime("%Y-%m-%d %H:%M:%S"),
-                "duration": duration,
-                "focus_log": st.session_state.focus_log.copy(),
-                "putt_log": st.session_state.putt_log.copy(),
-            }
-
-            st.session_state.history.append(session_data)
-            st.session_state.session_summary = session_data
+            # the running aggregates are stored with the session and the logs go to disk
+            st.session_state.session_summary = get_store().save(
+                st.session_state.player, st.session_state.start_time, time.time(),
+                st.session_state.focus_log, st.session_state.putt_log,
+                st.session_state.stats)
             st.session_state.start_time = None
         st.rerun()
-def draw_focus_trend(focus_log, putt_log):
-    if len(focus_log) > 1:
-        focus_df = pd.DataFrame(focus_log)
-        focus_df["timestamp"] = pd.to_datetime(focus_df["timestamp"])
-        focus_df["event"] = ""
-        focus_df["color"] = "purple"
-
-        for putt in putt_log:
-            t = pd.to_datetime(putt["timestamp"])
-            closest_idx = focus_df["timestamp"].sub(t).abs().idxmin()
-            if putt["nudge"]:
-                focus_df.loc[closest_idx, ["event", "color"]] = ["Nudge", "yellow"]
-            elif putt["result"] == "made":
-                focus_df.loc[closest_idx, ["event", "color"]] = ["Made", "green"]
-            elif putt["result"] == "miss":
-                focus_df.loc[closest_idx, ["event", "color"]] = ["Miss", "red"]
-
-        base = alt.Chart(focus_df).mark_line().encode(
-            x="timestamp:T",
-            y="focus:Q"
-        )
 
-        points = alt.Chart(focus_df).mark_circle(size=60).encode(
-            x="timestamp:T",
-            y="focus:Q",
-            color=alt.Color("color", scale=None),
-            tooltip=["timestamp:T", "focus:Q", "event"]
-        ).transform_filter("datum.event != ''")
+def focus_chart(focus_df):
+    """Focus trend line with the putts marked on it."""
+    base = alt.Chart(focus_df).mark_line().encode(
+        x="timestamp:T",
+        y="focus:Q"
+    )
+
+    points = alt.Chart(focus_df[focus_df["event"] != ""]).mark_circle(size=60).encode(
+        x="timestamp:T",
+        y="focus:Q",
+        color=alt.Color("color", scale=None),
+        tooltip=["timestamp:T", "focus:Q", "event"]
+    )
+
+    return base + points
 
-        st.altair_chart(base + points, use_container_width=True)
+
+def draw_focus_trend(focus_log, putt_log, trend=None):
+    """Chart a focus log. A live session passes its FocusTrend from the session
+    state, so that a rerun only adds the samples logged since the last one."""
+    if len(focus_log) > 1:
+        if trend is None:
+            trend = FocusTrend()
+        trend.update(focus_log)
+        st.altair_chart(focus_chart(trend.to_frame(focus_log, putt_log)), use_container_width=True)
     else:
         st.info("Focus trend will appear after a few updates.")
 
@@ -142,15 +140,14 @@ def home():
     if st.session_state.start:
         # Simulate a focus score
         focus_score = round(random.uniform(1.5, 4.5), 2)
-        timestamp = datetime.now().isoformat()
         st.session_state.latest_focus = focus_score
         st.metric("🧠 Focus Score", focus_score)
 
-        st.session_state.focus_log.append({"timestamp": timestamp, "focus": focus_score})
-        st.session_state.visible_focus_log.append({"timestamp": timestamp, "focus": focus_score})
+        st.session_state.focus_log.append(time.time(), focus_score)
+        st.session_state.stats.add_focus(focus_score)
 
         # Display nudges
-        if focus_score < 2.2:
+        if focus_score < NUDGE_THRESHOLD:
             st.warning("🔴 Nudge Triggered: Take a Breath")
         else:
             st.success("🟢 Focus is Stable")
@@ -189,7 +186,8 @@ def home():
         # else:
         #     st.info("Focus trend will appear after a few updates.")
         
-        draw_focus_trend(st.session_state.focus_log, st.session_state.putt_log)
+        draw_focus_trend(st.session_state.focus_log, st.session_state.putt_log,
+                         st.session_state.focus_trend)
 
         # --- Putt Logging ---
         col1, col2 = st.columns(2)
@@ -215,89 +213,106 @@ def home():
         st.write(f"**Start:** {summary['start']}")
         st.write(f"**End:** {summary['end']}")
         st.write(f"**Duration:** {summary['duration']}")
-        st.write("**Focus Readings:**", len(summary["focus_log"]))
-        st.write("**Putts:**", len(summary["putt_log"]))
+        st.write("**Focus Readings:**", summary["n_focus"])
+        st.write("**Putts:**", summary["n_putts"])
 
 def session_page():
     st.title("Session Recap")
-    if not st.session_state.history:
-            st.info("No putts have been logged yet.")
-
-
-    if not st.session_state.start and st.session_state.start_time is None and st.session_state.focus_log:
-
-        # 1. Putt Outcomes Pie Chart
-        st.subheader("🏌️‍♂️ Putt Outcomes")
-        if st.session_state.putt_log:
-            putt_df = pd.DataFrame(st.session_state.putt_log)
-            pie_data = putt_df["result"].value_counts().reset_index()
-            pie_data.columns = ["Result", "Count"]
-            st.altair_chart(
-                alt.Chart(pie_data).mark_arc().encode(
-                    theta=alt.Theta(field="Count", type="quantitative"),
-                    color=alt.Color(field="Result", type="nominal"),
-                    tooltip=["Result", "Count"]
-                ),
-                use_container_width=True
-            )
-        
-
-        # 2. Nudges Count
-        st.markdown("---")
-        st.subheader("⚠️ Nudges Triggered")
-        nudge_count = sum(p["nudge"] for p in st.session_state.putt_log)
-        st.metric("Total Nudges", nudge_count)
+    summary = st.session_state.session_summary
+    if summary is None or st.session_state.start:
+        st.info("No putts have been logged yet.")
+        return
+
+    # everything below comes from the aggregates kept during the session
+    stats = summary["stats"]
+
+    # 1. Putt Outcomes Pie Chart
+    st.subheader("🏌️‍♂️ Putt Outcomes")
+    if stats.n_putts:
+        pie_data = pd.DataFrame({"Result": ["made", "miss"],
+                                 "Count": [stats.made, stats.missed]})
+        st.altair_chart(
+            alt.Chart(pie_data[pie_data["Count"] > 0]).mark_arc().encode(
+                theta=alt.Theta(field="Count", type="quantitative"),
+                color=alt.Color(field="Result", type="nominal"),
+                tooltip=["Result", "Count"]
+            ),
+            use_container_width=True
+        )
 
-        # 3. Focus Score Distribution Histogram
-        st.subheader("📶 Focus Score Distribution")
-        focus_df = pd.DataFrame(st.session_state.focus_log)
+    # 2. Nudges Count
+    st.markdown("---")
+    st.subheader("⚠️ Nudges Triggered")
+    st.metric("Total Nudges", stats.nudges)
+
+    # 3. Focus Score Distribution Histogram
+    st.subheader("📶 Focus Score Distribution")
+    if stats.n_focus:
+        hist_df = pd.DataFrame({"start": FOCUS_BINS[:-1], "end": FOCUS_BINS[1:],
+                                "count": stats.histogram})
+        hist_df = hist_df[hist_df["count"] > 0]
         st.altair_chart(
-            alt.Chart(focus_df).mark_bar().encode(
-                alt.X("focus:Q", bin=True, title="Focus Score"),
-                y='count()',
+            alt.Chart(hist_df).mark_bar().encode(
+                alt.X("start:Q", bin="binned", title="Focus Score"),
+                alt.X2("end:Q"),
+                alt.Y("count:Q", title="Count of Records"),
             ),
             use_container_width=True
         )
+        spread = f" ± {np.sqrt(stats.focus_var):.2f}" if stats.focus_var is not None else ""
+        st.write(f"Mean focus: **{stats.focus_mean:.2f}**{spread} "
+                 f"(min {stats.focus_min:.2f}, max {stats.focus_max:.2f})")
 
-        # 4. Session Duration Summary
-        if st.session_state.history:
-            st.markdown("---")
-            last_session = st.session_state.history[-1]
-            st.subheader("⏱️ Session Duration")
-            st.write(f"Start: {last_session['start']}\n\nEnd: {last_session['end']}\n\nDuration: {last_session['duration']}")
+    # 4. Session Duration Summary
+    st.markdown("---")
+    st.subheader("⏱️ Session Duration")
+    st.write(f"Start: {summary['start']}\n\nEnd: {summary['end']}\n\nDuration: {summary['duration']}")
 
-        
 
 def history_page():
     st.title("📜 Session History")
-    
-    if not st.session_state.history:
+    store = get_store()
+    player = st.session_state.player
+    n_sessions = store.count(player)
+
+    if not n_sessions:
         st.info("No sessions recorded yet.")
     else:
-        for i, session in enumerate(reversed(st.session_state.history), 1):
-            with st.expander(f"Session {len(st.session_state.history) - i + 1} | {session['start']} → {session['end']}"):
+        n_pages = -(-n_sessions // HISTORY_PAGE_SIZE)
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1) if n_pages > 1 else 1
+        offset = (page - 1) * HISTORY_PAGE_SIZE
+
+        for i, session in enumerate(store.sessions(player, HISTORY_PAGE_SIZE, offset)):
+            with st.expander(f"Session {n_sessions - offset - i} | {session['start']} → {session['end']}"):
                 st.write(f"**Duration:** {session['duration']}")
-                st.write(f"**Focus Logs:** {len(session['focus_log'])}")
-                st.write(f"**Putts:** {len(session['putt_log'])}")
+                st.write(f"**Focus Logs:** {session['n_focus']}")
+                st.write(f"**Putts:** {session['n_putts']}")
+
+                # the raw logs are only read from disk when asked for
+                if not st.checkbox("Show logs", key=f"show_logs_{session['id']}"):
+                    continue
+                focus_log = store.focus_log(session["id"])
+                putt_log = store.putt_log(session["id"])
 
-                if session["focus_log"]:
+                if focus_log:
                     st.write("Focus Log")
-                    st.dataframe(pd.DataFrame(session["focus_log"]))
+                    st.dataframe(focus_log.to_frame())
 
-                if session["putt_log"]:
+                if putt_log:
                     st.write("Putt Log")
-                    st.dataframe(pd.DataFrame(session["putt_log"]))
+                    st.dataframe(pd.DataFrame(putt_log))
 
                 # 🧠 Insert the Focus Trend Graph here
-                if session["focus_log"]:
+                if focus_log:
                     st.markdown("### 📈 Focus Trend")
-                    draw_focus_trend(session["focus_log"], session["putt_log"] if session["putt_log"] else [])
+                    draw_focus_trend(focus_log, putt_log)
 
         if st.button("🗑️ Clear History"):
-            st.session_state.history = []
-            st.session_state.focus_log = []
+            store.clear(player)
+            st.session_state.focus_log = FocusLog()
+            st.session_state.focus_trend = FocusTrend()
             st.session_state.putt_log = []
-            st.session_state.visible_focus_log = []
+            st.session_state.stats = SessionStats()
             st.session_state.session_summary = None
             st.success("Session history cleared.")
             st.rerun()
@@ -307,6 +322,7 @@ def history_page():
 
 # --- Navigation ---
 st.sidebar.title("🏌️‍♂️ Navigation")
+st.sidebar.text_input("Player", value="Guest", key="player")
 selected_page = st.sidebar.radio("Go to", ["Home", "Most Recent Session", "History"])
 
 if selected_page == "Home":
@@ -7,6 +7,13 @@ from datetime import datetime, timedelta
 import time
 import altair as alt
 
+try:
+    # score and render latencies for `muselsl stats`, when this repo's
+    # muselsl is importable (e.g. PYTHONPATH set to the repo root)
+    from muselsl import latency
+except ImportError:
+    latency = None
+
 # Set page config and refresh
 st.set_page_config(page_title="Caddy.ai + Muse 2", layout="centered")
 st_autorefresh(interval=4000, key="focus_refresh")  # Refresh every 2 seconds
@@ -29,10 +36,33 @@ if "inlet" not in st.session_state:
         st.error("No EEG stream found. Please run 'muselsl stream' in a terminal.")
         st.stop()
     st.session_state.inlet = StreamInlet(streams[0])
+    st.session_state.eeg_data = np.zeros((0, st.session_state.inlet.info().channel_count()))
+    st.session_state.eeg_times = np.zeros(0)
     st.success("✅ Connected to Muse EEG stream.")
 
 inlet = st.session_state.inlet
 
+
+def latest_window(n_samples):
+    """Most recent n_samples as (data, timestamps), None until enough arrived.
+
+    Everything the inlet buffered since the last rerun is drained without
+    waiting, so a rerun never blocks on the stream and no sample is skipped.
+    """
+    while True:
+        samples, timestamps = inlet.pull_chunk(timeout=0.0, max_samples=1024)
+        if not timestamps:
+            break
+        if latency and latency.ENABLED:
+            latency.record("pull", latency.sample_age(timestamps[-1]))
+        st.session_state.eeg_data = np.concatenate(
+            [st.session_state.eeg_data, samples])[-n_samples:]
+        st.session_state.eeg_times = np.concatenate(
+            [st.session_state.eeg_times, timestamps])[-n_samples:]
+    if len(st.session_state.eeg_times) < n_samples:
+        return None
+    return st.session_state.eeg_data, st.session_state.eeg_times
+
 # Calibration block (non-blocking)
 if "calibrated" not in st.session_state:
     st.session_state.calibrated = False
@@ -43,16 +73,10 @@ if not st.session_state.calibrated:
     st.title("🧘 Calibration In Progress")
     st.info(f"Step {st.session_state.calibration_steps + 1} of 6 – Please sit still...")
 
-    eeg_window = [[], [], [], []]
-    collected = 0
-    while collected < 256:
-        sample, _ = inlet.pull_sample(timeout=0.1)
-        if sample and len(sample) >= 4:
-            for i in range(4):
-                eeg_window[i].append(sample[i])
-            collected += 1
-
-    eeg_data = np.array(eeg_window)
+    window = latest_window(256)
+    if window is None or np.isnan(window[0]).any():
+        st.stop()
+    eeg_data = window[0][:, :4].T
     powers = np.mean(np.square(eeg_data), axis=1)
     avg_power = np.mean(powers)
 
@@ -70,21 +94,11 @@ if not st.session_state.calibrated:
         st.stop()
 
 def get_focus_score():
-    eeg_window = [[], [], [], []]  # 4 Muse channels
-    samples_needed = 256
-
-    start_time = time.time()
-    while len(eeg_window[0]) < samples_needed:
-        if time.time() - start_time > 10:
-            print("⚠️ Timeout while collecting EEG samples.")
-            return st.session_state.latest_focus
-
-        sample, _ = inlet.pull_sample(timeout=1.0)
-        if sample and len(sample) >= 4:
-            for i in range(4):  # TP9, AF7, AF8, TP10
-                eeg_window[i].append(sample[i])
-
-    eeg_data = np.array(eeg_window)
+    window = latest_window(256)
+    # windows straddling lost packets (NaN with --fill-gaps nan) are skipped
+    if window is None or np.isnan(window[0]).any():
+        return st.session_state.latest_focus
+    eeg_data = window[0][:, :4].T  # TP9, AF7, AF8, TP10
     powers = np.mean(np.square(eeg_data), axis=1)
     avg_power = np.mean(powers)
 
@@ -93,6 +107,10 @@ def get_focus_score():
     power_clipped = np.clip(avg_power, focus_max, focus_min)
     normalized = 10 - ((power_clipped - focus_max) / (focus_min - focus_max)) * 9.0
     score = round(min(max(1.0, normalized), 10.0), 2)
+    if latency and latency.ENABLED:
+        # age of the newest sample behind the score, see `muselsl stats`
+        latency.record("score", latency.sample_age(window[1][-1]))
+        st.session_state.scored_sample_time = window[1][-1]
 
     print(f"EEG Power (µV²): {avg_power:.2f} → Focus Score: {score}")
     return score
@@ -111,6 +129,8 @@ st.session_state.visible_focus_log.append({"timestamp": timestamp, "focus": focu
 # UI
 st.title("⛳ Caddy.ai – Live Focus from Muse 2")
 st.metric("🧠 Focus Score", focus_score)
+if latency and latency.ENABLED and "scored_sample_time" in st.session_state:
+    latency.record("render", latency.sample_age(st.session_state.scored_sample_time))
 if focus_score < 3.5:
     st.error("🔴 Nudge Triggered: Take a Breath")
 else:
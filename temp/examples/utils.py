@@ -18,9 +18,19 @@ import numpy as np
 from sklearn import svm
 from scipy.signal import butter, lfilter, lfilter_zi
 
+try:
+    # vectorized band powers, when this repo's muselsl is importable (e.g.
+    # PYTHONPATH set to the repo root); the loops below are used otherwise
+    from muselsl.bandpower import BandPowerEngine
+except ImportError:
+    BandPowerEngine = None
+
 
 NOTCH_B, NOTCH_A = butter(4, np.array([55, 65]) / (256 / 2), btype='bandstop')
 
+# BandPowerEngine instances, one per (sampling rate, epoch length)
+_ENGINES = {}
+
 
 def epoch(data, samples_epoch, samples_overlap=0):
     """Extract epochs from a time series.
@@ -72,6 +82,9 @@ def compute_band_powers(eegdata, fs):
         (numpy.ndarray): feature matrix of shape [number of feature points,
             number of different features]
     """
+    if BandPowerEngine is not None:
+        return get_band_power_engine(fs, eegdata.shape[0]).compute(eegdata)
+
     # 1. Compute the PSD
     winSampleLength, nbCh = eegdata.shape
 
@@ -118,10 +131,25 @@ def nextpow2(i):
     return n
 
 
+def get_band_power_engine(fs, epoch_length):
+    """
+    Return the BandPowerEngine for this sampling rate and epoch length,
+    creating it on first use
+    """
+    key = (fs, epoch_length)
+    if key not in _ENGINES:
+        _ENGINES[key] = BandPowerEngine(fs, epoch_length)
+    return _ENGINES[key]
+
+
 def compute_feature_matrix(epochs, fs):
     """
-    Call compute_feature_vector for each EEG epoch
+    Call compute_feature_vector for each EEG epoch, or compute them all in
+    one vectorized call with muselsl's BandPowerEngine
     """
+    if BandPowerEngine is not None:
+        return get_band_power_engine(fs, epochs.shape[0]).compute(epochs)
+
     n_epochs = epochs.shape[2]
 
     for i_epoch in range(n_epochs):
@@ -0,0 +1,18 @@
+import atexit
+
+from muselsl import backends
+
+
+def test_async_backend_leaves_sleep_and_atexit_alone(monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+    monkeypatch.setattr(backends, 'sleep', backends.sleep)
+    sleep = backends.sleep
+
+    adapter = backends.BleakBackend(blocking=False)
+    assert backends.sleep is sleep
+    assert registered == []
+
+    adapter = backends.BleakBackend()
+    assert backends.sleep == adapter.pump
+    assert registered == [adapter.stop]
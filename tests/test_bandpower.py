@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from muselsl.bandpower import BandPowerEngine, nextpow2
+
+
+def compute_band_powers(eegdata, fs):
+    """The per-epoch band powers of the examples' utils, as a reference."""
+    winSampleLength, nbCh = eegdata.shape
+    w = np.hamming(winSampleLength)
+    dataWinCentered = eegdata - np.mean(eegdata, axis=0)
+    dataWinCenteredHam = (dataWinCentered.T * w).T
+
+    NFFT = nextpow2(winSampleLength)
+    Y = np.fft.fft(dataWinCenteredHam, n=NFFT, axis=0) / winSampleLength
+    PSD = 2 * np.abs(Y[0:int(NFFT / 2), :])
+    f = fs / 2 * np.linspace(0, 1, int(NFFT / 2))
+
+    ind_delta, = np.where(f < 4)
+    meanDelta = np.mean(PSD[ind_delta, :], axis=0)
+    ind_theta, = np.where((f >= 4) & (f <= 8))
+    meanTheta = np.mean(PSD[ind_theta, :], axis=0)
+    ind_alpha, = np.where((f >= 8) & (f <= 12))
+    meanAlpha = np.mean(PSD[ind_alpha, :], axis=0)
+    ind_beta, = np.where((f >= 12) & (f < 30))
+    meanBeta = np.mean(PSD[ind_beta, :], axis=0)
+
+    return np.log10(np.concatenate((meanDelta, meanTheta, meanAlpha,
+                                    meanBeta), axis=0))
+
+
+@pytest.fixture
+def eeg():
+    return np.random.default_rng(0).normal(0, 20, (256 * 10, 4))
+
+
+@pytest.mark.parametrize("fs, epoch_length", [(256, 256), (256, 200),
+                                              (220, 330), (256, 512)])
+def test_single_epoch_matches_reference(eeg, fs, epoch_length):
+    engine = BandPowerEngine(fs, epoch_length)
+    epoch = eeg[:epoch_length]
+    np.testing.assert_allclose(engine.compute(epoch),
+                               compute_band_powers(epoch, fs), rtol=1e-12)
+
+
+def test_stacked_epochs_match_reference(eeg):
+    engine = BandPowerEngine(256, 256)
+    starts = range(0, len(eeg) - 256 + 1, 205)
+    epochs = np.stack([eeg[i:i + 256] for i in starts], axis=2)
+    expected = np.array([compute_band_powers(eeg[i:i + 256], 256)
+                         for i in starts])
+    np.testing.assert_allclose(engine.compute(epochs), expected, rtol=1e-12)
+
+
+def test_update_matches_latest_epoch(eeg):
+    engine = BandPowerEngine(256, 256)
+    rng = np.random.default_rng(1)
+    stop = 0
+    while stop < len(eeg):
+        start, stop = stop, min(stop + int(rng.integers(0, 400)), len(eeg))
+        features = engine.update(eeg[start:stop])
+        if stop < 256 or start == stop:
+            assert features is None
+        else:
+            np.testing.assert_allclose(
+                features, compute_band_powers(eeg[stop - 256:stop], 256),
+                rtol=1e-12)
+
+
+def test_update_with_empty_chunks(eeg):
+    engine = BandPowerEngine(256, 256)
+    assert engine.update(np.zeros((0, 4))) is None
+    engine.update(eeg[:300])
+    assert engine.update(np.zeros((0, 4))) is None
+    np.testing.assert_allclose(engine.update(eeg[300:310]),
+                               compute_band_powers(eeg[54:310], 256),
+                               rtol=1e-12)
@@ -0,0 +1,32 @@
+import pytest
+from brainflow.board_shim import BoardIds
+
+from board_manager import BoardManager
+
+
+class FakeBoard():
+
+    def __init__(self, fail_stop=False):
+        self.fail_stop = fail_stop
+        self.released = False
+
+    def stop_stream(self):
+        if self.fail_stop:
+            raise RuntimeError("stream already stopped")
+
+    def release_session(self):
+        self.released = True
+
+
+@pytest.mark.parametrize("fail_stop", [False, True])
+def test_stop_releases_the_session(fail_stop):
+    manager = BoardManager(BoardIds.SYNTHETIC_BOARD.value, scorer=None)
+    board = manager.board = FakeBoard(fail_stop)
+    if fail_stop:
+        with pytest.raises(RuntimeError):
+            manager.stop()
+    else:
+        manager.stop()
+    assert board.released and manager.board is None
+    # a second stop has nothing left to release
+    manager.stop()
@@ -0,0 +1,43 @@
+import argparse
+
+import pytest
+
+from muselsl.cli import CLI, _band_amplitude, _chunk_ms, _chunk_packets
+
+
+def test_band_amplitude():
+    assert _band_amplitude("alpha=10") == ("alpha", 10.)
+    assert _band_amplitude("delta=0.5") == ("delta", .5)
+
+
+@pytest.mark.parametrize("value", ["gamma=5", "alpha", "alpha=x", "=3", ""])
+def test_invalid_band_amplitude(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        _band_amplitude(value)
+
+
+def test_chunking_arguments():
+    assert _chunk_packets("4") == 4
+    assert _chunk_ms("0") == 0. and _chunk_ms("12.5") == 12.5
+
+
+@pytest.mark.parametrize("parse, value", [(_chunk_packets, "0"),
+                                          (_chunk_packets, "-2"),
+                                          (_chunk_packets, "1.5"),
+                                          (_chunk_ms, "-1"),
+                                          (_chunk_ms, "nan"),
+                                          (_chunk_ms, "soon")])
+def test_invalid_chunking_arguments(parse, value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse(value)
+
+
+@pytest.mark.parametrize("command", ["stream", "gateway", "replay"])
+@pytest.mark.parametrize("option", ["--chunk-packets=0", "--chunk-ms=-5"])
+def test_commands_reject_invalid_chunking(monkeypatch, capsys, command,
+                                          option):
+    monkeypatch.setattr("sys.argv", ["muselsl", command, option])
+    with pytest.raises(SystemExit) as error:
+        CLI(command)
+    assert error.value.code == 2
+    assert option.split("=")[0] in capsys.readouterr().err
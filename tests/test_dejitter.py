@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from muselsl.dejitter import Dejitter
+
+
+def batch_fit(timestamps):
+    """Least-squares fit of timestamps on the sample index, all at once."""
+    x = np.arange(len(timestamps), dtype=np.float64)
+    y = timestamps - timestamps[0]
+    A = np.column_stack([np.ones_like(x), x])
+    (intercept, slope), *_ = np.linalg.lstsq(A, y, rcond=None)
+    return timestamps[0] + intercept + slope * x, slope
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_batch_fit(seed):
+    rng = np.random.default_rng(seed)
+    n_samples = 256 * 120
+    # epoch timestamps of a 256 Hz stream with a slightly fast clock,
+    # jittered by the BLE chunking
+    timestamps = (1.7e9 + np.arange(n_samples) / 256. * (1 + 2e-5) +
+                  rng.normal(0, 5e-3, n_samples))
+
+    dejitter = Dejitter()
+    start = 0
+    while start < n_samples:
+        stop = min(start + int(rng.integers(1, 200)), n_samples)
+        chunk = dejitter.update(timestamps[start:stop])
+        expected, slope = batch_fit(timestamps[:stop])
+        assert dejitter.n == stop
+        np.testing.assert_allclose(chunk, expected[start:stop],
+                                   rtol=0, atol=1e-6)
+        start = stop
+
+    assert dejitter.slope == pytest.approx(slope, rel=1e-9)
+    np.testing.assert_allclose(dejitter.predict(np.arange(n_samples)),
+                               expected, rtol=0, atol=1e-6)
+
+
+def test_single_sample_and_empty_chunk():
+    dejitter = Dejitter()
+    assert len(dejitter.update([])) == 0
+    assert dejitter.update([1.7e9]) == pytest.approx([1.7e9])
+    assert dejitter.slope == 0.
+    np.testing.assert_allclose(dejitter.update([1.7e9 + 1, 1.7e9 + 2]),
+                               [1.7e9 + 1, 1.7e9 + 2], rtol=0, atol=1e-9)
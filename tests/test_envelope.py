@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from muselsl.envelope import MinMaxPyramid
+
+
+def brute_force(history, seen, start, stop):
+    """Min and max of the samples of [start, stop) that were pushed.
+
+    Samples dropped by push() because they didn't fit in the window are not
+    seen, and samples before the first push read as zeros.
+    """
+    if stop <= 0:
+        return np.zeros(history.shape[1]), np.zeros(history.shape[1])
+    values = history[max(start, 0):stop][seen[max(start, 0):stop]]
+    return values.min(axis=0), values.max(axis=0)
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("n_samples, factor", [(100, 4), (256, 2), (500, 5)])
+def test_matches_brute_force(seed, n_samples, factor):
+    rng = np.random.default_rng(seed)
+    pyramid = MinMaxPyramid(n_samples, 2, factor)
+    history = np.zeros((0, 2))
+    seen = np.zeros(0, dtype=bool)
+
+    for _ in range(60):
+        # mostly short chunks, with some longer than the whole window, often
+        # by less than a bin
+        n = int(rng.choice([rng.integers(0, 30),
+                            rng.integers(0, 3 * n_samples),
+                            n_samples + rng.integers(1, n_samples)],
+                           p=[.7, .1, .2]))
+        samples = rng.normal(size=(n, 2))
+        pyramid.push(samples)
+        history = np.r_[history, samples]
+        seen = np.r_[seen, np.arange(n) >= n - n_samples]
+
+        for level, size in enumerate(pyramid.bin_sizes):
+            n_points = n_samples // size
+            assert pyramid.level(n_samples, n_points) == level
+            offsets, mins, maxs = pyramid.envelope(n_samples, n_points)
+            for offset, low, high in zip(offsets, mins, maxs):
+                start = len(history) + offset
+                expected = brute_force(history, seen, start, start + size)
+                assert np.array_equal(low, expected[0])
+                assert np.array_equal(high, expected[1])
+
+
+def test_push_longer_than_window_drops_old_bins():
+    pyramid = MinMaxPyramid(8, 1, factor=2)
+    pyramid.push(np.full((16, 1), -100.))
+    # one sample too many for the window: the first bin kept starts with
+    # the second sample pushed and holds nothing older
+    pyramid.push(np.ones((9, 1)))
+    for level, size in enumerate(pyramid.bin_sizes):
+        _, mins, maxs = pyramid.envelope(8, 8 // size)
+        assert (mins == 1).all() and (maxs == 1).all()
@@ -0,0 +1,142 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from focus_log import FocusLog, FocusTrend, PUTT_EVENTS
+
+
+def random_log(rng, n, t0=1.7e9):
+    # one decimal, so that the bucket extremes have ties
+    return FocusLog.from_arrays(t0 + 2 * np.arange(n),
+                                np.round(rng.uniform(1.5, 4.5, n), 1))
+
+
+def test_any_below_bounds_are_inclusive():
+    log = FocusLog.from_arrays([10., 20., 30., 40.], [3., 2., 3., 1.])
+    assert log.any_below(2.2, 20, 20)
+    assert log.any_below(2.2, 15, 25)
+    assert not log.any_below(2.2, 20.5, 39.5)
+    assert not log.any_below(2.2, 21, 30)
+    assert log.any_below(2.2, 21, 40)
+    assert not log.any_below(2.2, 41)
+    assert not log.any_below(2.2, t1=9.99)
+    assert log.any_below(2.2)
+    # empty and reversed windows
+    assert not log.any_below(2.2, 20, 19)
+    assert not FocusLog().any_below(2.2)
+
+
+@pytest.mark.parametrize("threshold", [2.2, 1.5, 3.])
+def test_any_below_matches_a_scan(threshold):
+    rng = np.random.default_rng(0)
+    log = random_log(rng, 300)
+    # the running count is only used for the log's own threshold
+    assert log.threshold == 2.2
+    for _ in range(500):
+        t0, t1 = np.sort(rng.uniform(log.times[0] - 5, log.times[-1] + 5, 2))
+        if rng.random() < .3:
+            # windows starting or ending exactly on a sample
+            t0 = log.times[rng.integers(len(log))]
+        window = (log.times >= t0) & (log.times <= t1)
+        assert log.any_below(threshold, t0, t1) == \
+            bool((log.scores[window] < threshold).any())
+
+
+def test_last_before_is_strictly_before():
+    log = FocusLog()
+    assert log.last_before(10.) is None
+    for t, score in [(10., 3.47), (20., 2.1), (30., 4.)]:
+        log.append(t, score)
+    assert log.last_before(10.) is None
+    assert log.last_before(10.5) == (10., 3.47)
+    assert log.last_before(20.) == (10., 3.47)
+    assert log.last_before(20.001) == (20., 2.1)
+    assert log.last_before(1e12) == (30., 4.)
+
+
+def test_append_grows_past_the_capacity():
+    log = FocusLog(capacity=2)
+    for i in range(9):
+        log.append(float(i), i / 2)
+    assert np.array_equal(log.times, np.arange(9.))
+    assert np.array_equal(log.scores, np.arange(9) / 2)
+    assert log.any_below(2.2, 4, 4) and not log.any_below(2.2, 5)
+    copy = log.copy()
+    copy.append(9., 0.)
+    assert len(log) == 9 and len(copy) == 10
+    assert copy.any_below(2.2, 9) and not log.any_below(2.2, 9)
+
+
+def random_putts(rng, log, n):
+    times = rng.uniform(log.times[0] - 10, log.times[-1] + 10, n)
+    return [{"timestamp": datetime.fromtimestamp(t).isoformat(),
+             "nudge": bool(rng.random() < .3),
+             "result": str(rng.choice(["made", "miss", "skipped"]))}
+            for t in times]
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 199, 200, 201, 400, 401, 1000, 8100])
+def test_trend_keeps_each_bucket_min_and_max(n):
+    log = random_log(np.random.default_rng(n), n)
+    trend = FocusTrend(max_points=400)
+    trend.update(log)
+    assert len(trend) == n
+
+    expected = {0, n - 1} if n else set()
+    for i in range(0, n, trend.size):
+        bucket = log.scores[i:i + trend.size]
+        expected |= {i + int(np.argmin(bucket)), i + int(np.argmax(bucket))}
+    assert set(trend.downsample().tolist()) == expected
+    assert len(expected) <= 400 + 4
+
+
+def test_trend_updates_with_new_samples_only():
+    rng = np.random.default_rng(0)
+    full = random_log(rng, 3000)
+    trend = FocusTrend(max_points=100)
+    log = FocusLog()
+    for i, (t, score) in enumerate(zip(full.times, full.scores)):
+        log.append(t, score)
+        # a few samples per rerun, sometimes none
+        if rng.random() < .3:
+            trend.update(log)
+            assert len(trend) == i + 1
+    trend.update(log)
+
+    expected = FocusTrend(max_points=100)
+    expected.update(full)
+    assert trend.size == expected.size
+    assert np.array_equal(trend.downsample(), expected.downsample())
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_annotated_points_survive_downsample(seed):
+    rng = np.random.default_rng(seed)
+    log = random_log(rng, int(rng.integers(2, 5000)))
+    putts = random_putts(rng, log, int(rng.integers(1, 40)))
+    trend = FocusTrend(max_points=50)
+    trend.update(log)
+    frame = trend.to_frame(log, putts)
+
+    # every putt is drawn on its closest sample, with the exact timestamp
+    # and score, whichever samples the buckets kept
+    everything = log.to_frame()
+    putt_times = [datetime.fromisoformat(p["timestamp"]).timestamp() for p in putts]
+    closest = log.nearest(putt_times)
+    events = {}
+    for putt, i in zip(putts, closest):
+        kind = "nudge" if putt["nudge"] else putt["result"]
+        if kind in PUTT_EVENTS:
+            events[i] = PUTT_EVENTS[kind]
+    marked = frame[frame["event"] != ""]
+    assert len(marked) == len(events)
+    for (_, row), i in zip(marked.iterrows(), sorted(events)):
+        assert row["timestamp"] == everything["timestamp"][i]
+        assert row["focus"] == everything["focus"][i]
+        assert (row["event"], row["color"]) == events[i]
+
+    # the line goes through the kept samples and the putts, in order
+    keep = np.union1d(trend.downsample(), sorted(events))
+    assert frame["timestamp"].tolist() == everything["timestamp"][keep].tolist()
+    assert (frame.loc[frame["event"] == "", "color"] == "purple").all()
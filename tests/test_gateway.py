@@ -0,0 +1,164 @@
+import asyncio
+from importlib import import_module
+from time import time
+
+import pytest
+
+from muselsl import backends
+from muselsl.gateway import GatewayDevice, gateway
+from muselsl.muse import Muse
+
+# muselsl.gateway is the function once the package is imported
+gateway_module = import_module('muselsl.gateway')
+
+
+class FakeMuse():
+    """Stands in for Muse, failing as its address says"""
+
+    instances = []
+
+    def __init__(self, address, **kwargs):
+        self.address = address
+        self.connects = 0
+        self.disconnects = 0
+        self.started = False
+        self.eeg_loss_rate = Muse(address).eeg_loss_rate
+        FakeMuse.instances.append(self)
+
+    @property
+    def last_timestamp(self):
+        return time()
+
+    async def connect_async(self, retries=0):
+        self.connects += 1
+        if self.address == 'timeout':
+            raise asyncio.TimeoutError()
+        if self.address == 'slow':
+            await asyncio.sleep(10)
+        return self.address != 'absent'
+
+    async def start_async(self):
+        if self.address == 'start':
+            raise OSError('link lost while writing')
+        self.started = True
+
+    def stop(self):
+        pass
+
+    def disconnect(self):
+        self.disconnects += 1
+        if self.address in ('timeout', 'start'):
+            raise OSError('not connected')
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    monkeypatch.setattr(gateway_module, 'Muse', FakeMuse)
+    FakeMuse.instances = []
+    yield loop
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+def pump(loop, seconds=0.01):
+    loop.run_until_complete(asyncio.sleep(seconds))
+
+
+@pytest.mark.parametrize('address', ['timeout', 'start', 'absent'])
+def test_failed_connection_is_retried_later(loop, address):
+    now = [100.]
+    device = GatewayDevice(address, time_func=lambda: now[0])
+    device.connect()
+    assert device.connecting
+    pump(loop)
+
+    assert device.poll() is False
+    assert not device.connected and not device.connecting
+    assert device.next_attempt > now[0]
+    assert device.poll() is None
+
+
+def test_slow_device_does_not_hold_up_others(loop):
+    slow = GatewayDevice('slow')
+    fast = GatewayDevice('fast')
+    slow.connect()
+    fast.connect()
+    pump(loop)
+
+    assert fast.poll() is True and fast.muse.started
+    assert slow.poll() is None and slow.connecting
+    slow.stop()
+    assert not slow.connecting
+
+
+def test_reconnects_are_counted(loop):
+    device = GatewayDevice('fast')
+    for _ in range(3):
+        device.connect()
+        pump(loop)
+        assert device.poll() is True
+        device.drop()
+    assert device.reconnects == 2
+    assert device.muse.disconnects == 3
+
+
+def test_gateway_survives_failing_headsets(loop, monkeypatch):
+    class Adapter(backends.BleakBackend):
+        pumps = 0
+
+        def pump(self, seconds=1):
+            Adapter.pumps += 1
+            if Adapter.pumps > 20:
+                raise KeyboardInterrupt
+            pump(loop)
+
+    monkeypatch.setattr(backends, 'BleakBackend', Adapter)
+    monkeypatch.setattr(backends, 'sleep', backends.sleep)
+    monkeypatch.setattr(gateway_module, 'RETRY_SLEEP_TIMEOUT', 0)
+    monkeypatch.setattr('atexit.register', lambda func: None)
+
+    gateway(addresses=['timeout', 'fast', 'start'], backend='bleak')
+
+    failing = [m for m in FakeMuse.instances if m.address != 'fast']
+    good, = [m for m in FakeMuse.instances if m.address == 'fast']
+    assert all(muse.connects > 1 for muse in failing)
+    assert good.connects == 1 and good.started
+
+
+def test_loss_counters_survive_restart():
+    muse = Muse('00:00:00:00:00:00')
+    muse.eeg_packets_lost[:] = 3
+    muse.eeg_gaps = 2
+    muse._eeg_last_tm[:] = 10
+    muse._init_stream()
+    assert (muse.eeg_packets_lost == 3).all() and muse.eeg_gaps == 2
+    assert (muse._eeg_last_tm == -1).all()
+
+
+@pytest.mark.parametrize('address', ['fast', 'start'])
+@pytest.mark.parametrize('disconnect', ['drop', 'stop'])
+def test_buffered_samples_are_pushed_on_disconnect(loop, address, disconnect):
+    import numpy as np
+
+    class Outlet():
+        chunks = []
+
+        def push_chunk(self, data, timestamp):
+            self.chunks.append((np.array(data), timestamp))
+
+    device = GatewayDevice(address, chunk_packets=10)
+    device.connected = True
+    pusher = device.pushers['EEG']
+    pusher.outlet = outlet = Outlet()
+    for i in range(3):
+        pusher(np.full((5, 12), i), 1000. + np.arange(12 * i, 12 * i + 12))
+    assert outlet.chunks == []
+
+    # even when the headset fails to disconnect cleanly
+    getattr(device, disconnect)()
+    assert not device.connected
+    data, timestamps = outlet.chunks[0]
+    assert len(outlet.chunks) == 1 and data.shape == (36, 5)
+    assert np.array_equal(timestamps, 1000. + np.arange(36))
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from muselsl import latency
+from muselsl.latency import LatencyHistogram
+
+
+@pytest.fixture
+def stats_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(latency, '_histograms', {})
+    monkeypatch.setattr(latency, '_directory', str(tmp_path))
+    return tmp_path
+
+
+def record_random(stage, n, seed):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(np.log(0.02), 1.5, n)
+    for value in values:
+        latency.record(stage, value)
+    return values
+
+
+def test_quantiles_within_bucket_precision():
+    histogram = LatencyHistogram()
+    values = np.random.default_rng(0).lognormal(np.log(0.02), 2, 10000)
+    for value in values:
+        histogram.record(value)
+    precision = 2. ** (1 - histogram.bits)
+    for q in (0.5, 0.9, 0.99):
+        exact = np.quantile(values, q)
+        assert exact <= histogram.quantile(q) <= exact * (1 + precision) + 1e-6
+    assert histogram.max == values.max()
+    assert histogram.quantile(1.) == values.max()
+
+
+def test_dump_and_read_round_trip(stats_dir, monkeypatch):
+    monkeypatch.setattr(latency, '_name', 'streamer-1')
+    record_random('receive', 1000, 0)
+    record_random('custom', 10, 1)
+    latency.dump()
+    written = latency.histograms()
+    assert sorted(f.name for f in stats_dir.iterdir()) == ['streamer-1.prom']
+
+    read = latency.read_stats(str(stats_dir))
+    assert sorted(read) == sorted(written)
+    for stage, histogram in written.items():
+        assert read[stage].counts == histogram.counts
+        assert read[stage].count == histogram.count
+        assert read[stage].total == pytest.approx(histogram.total)
+        assert read[stage].max == histogram.max
+        for q in (0.5, 0.9, 0.99):
+            assert read[stage].quantile(q) == histogram.quantile(q)
+
+
+def test_read_merges_processes(stats_dir, monkeypatch):
+    merged = LatencyHistogram()
+    for process in range(3):
+        monkeypatch.setattr(latency, '_histograms', {})
+        monkeypatch.setattr(latency, '_name', 'app-%d' % process)
+        for value in record_random('score', 200, process):
+            merged.record(value)
+        latency.dump()
+    (stats_dir / 'notes.txt').write_text('not a histogram')
+
+    read = latency.read_stats(str(stats_dir))['score']
+    assert read.counts == merged.counts
+    assert read.count == 600
+    assert read.max == merged.max
+    assert read.total == pytest.approx(merged.total)
+
+
+def test_stats_output(stats_dir, monkeypatch, capsys):
+    monkeypatch.setattr(latency, '_name', 'app')
+    record_random('pull', 100, 0)
+    record_random('render', 100, 1)
+    latency.dump()
+
+    latency.stats(str(stats_dir))
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split()[0] == 'stage'
+    assert [line.split()[:2] for line in lines[1:]] == [['pull', '100'],
+                                                        ['render', '100']]
+
+    latency.stats(str(stats_dir), prometheus=True)
+    out = capsys.readouterr().out
+    assert 'muselsl_latency_seconds_count{stage="pull"} 100' in out
@@ -0,0 +1,217 @@
+import bitstring
+import numpy as np
+import pytest
+
+from muselsl.muse import Muse, unpack_eeg_packets
+
+
+def unpack_bitstring(packet):
+    """The bitstring decoder unpack_eeg_packets replaced, as a reference."""
+    aa = bitstring.Bits(bytes=packet)
+    pattern = "uint:16,uint:12,uint:12,uint:12,uint:12,uint:12,uint:12, \
+               uint:12,uint:12,uint:12,uint:12,uint:12,uint:12"
+    res = aa.unpack(pattern)
+    return res[0], 0.48828125 * (np.array(res[1:]) - 2048)
+
+
+@pytest.fixture
+def packets():
+    rng = np.random.default_rng(0)
+    packets = rng.integers(0, 256, (5000, 20), dtype=np.uint8)
+    # extremes of the index and of the 12 bit samples
+    packets[0] = 0
+    packets[1] = 0xFF
+    packets[2] = [0x80, 0x00] + [0x80, 0x08, 0x00] * 6
+    return packets
+
+
+def test_single_packets_match_bitstring(packets):
+    for packet in packets:
+        index, data = unpack_eeg_packets(packet.tobytes())
+        expected_index, expected_data = unpack_bitstring(packet.tobytes())
+        assert index.shape == (1,) and data.shape == (1, 12)
+        assert index[0] == expected_index
+        assert np.array_equal(data[0], expected_data)
+
+
+def test_batch_matches_bitstring(packets):
+    index, data = unpack_eeg_packets(packets)
+    expected = [unpack_bitstring(packet.tobytes()) for packet in packets]
+    assert np.array_equal(index, [e[0] for e in expected])
+    assert np.array_equal(data, np.array([e[1] for e in expected]))
+
+
+@pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview,
+                                  lambda b: np.frombuffer(b, np.uint8)])
+def test_input_types(packets, wrap):
+    packet = packets[10].tobytes()
+    index, data = unpack_eeg_packets(wrap(packet))
+    expected_index, expected_data = unpack_bitstring(packet)
+    assert index[0] == expected_index
+    assert np.array_equal(data[0], expected_data)
+
+
+def test_unpack_eeg_channel(packets):
+    muse = Muse('00:00:00:00:00:00')
+    packet = bytearray(packets[3].tobytes())
+    index, data = muse._unpack_eeg_channel(packet)
+    expected_index, expected_data = unpack_bitstring(bytes(packet))
+    assert index == expected_index and isinstance(index, int)
+    assert np.array_equal(data, expected_data)
+
+
+HANDLES = (44, 41, 38, 32, 35)
+
+
+def eeg_packet(tm, value):
+    """20 byte packet with counter tm and 12 samples of the raw value"""
+    packet = bytearray([tm >> 8, tm & 0xFF])
+    for _ in range(6):
+        packet += bytes([value >> 4, ((value & 0x0F) << 4) | (value >> 8),
+                         value & 0xFF])
+    return packet
+
+
+class Stream():
+    """Feed EEG packets to a Muse and keep what it pushes"""
+
+    def __init__(self, fill_gaps=None):
+        self.chunks = []
+        self.gaps = []
+        self.clock = 1000.
+        self.muse = Muse('00:00:00:00:00:00',
+                         callback_eeg=self.push, callback_gap=self.gap,
+                         fill_gaps=fill_gaps, time_func=self.time,
+                         copy_callback_data=True)
+        self.muse._init_stream()
+        # a fixed 256 Hz clock, so that timestamps don't depend on the
+        # regression converging
+        self.muse._update_timestamp_correction = lambda *args: None
+
+    def time(self):
+        return self.clock
+
+    def push(self, data, timestamps):
+        self.chunks.append((data, timestamps))
+
+    def gap(self, n_samples, timestamp):
+        self.gaps.append((n_samples, timestamp))
+
+    def frame(self, tm, value, skip=()):
+        """One packet per channel, but those in skip. Channel 1 (handle 35)
+        comes last and completes the frame."""
+        self.clock += 12 / 256.
+        for handle in HANDLES:
+            channel = (handle - 32) // 3
+            if channel not in skip:
+                self.muse._handle_eeg(handle,
+                                      eeg_packet(tm, value + 16 * channel))
+
+    @property
+    def data(self):
+        return np.concatenate([data for data, _ in self.chunks], axis=1)
+
+    @property
+    def timestamps(self):
+        return np.concatenate([times for _, times in self.chunks])
+
+
+def microvolts(value):
+    return 0.48828125 * (value - 2048)
+
+
+def test_eeg_packet():
+    index, data = unpack_eeg_packets(eeg_packet(513, 0xABC))
+    assert index[0] == 513 and (data == microvolts(0xABC)).all()
+
+
+def test_counter_wraparound_is_not_a_loss():
+    stream = Stream()
+    for tm in (65534, 65535, 0, 1, 2):
+        stream.frame(tm, 2048)
+    assert stream.muse.eeg_packets_received.tolist() == [5] * 5
+    assert not stream.muse.eeg_packets_lost.any()
+    assert stream.muse.eeg_gaps == 0 and stream.gaps == []
+    assert stream.data.shape == (5, 60)
+
+
+@pytest.mark.parametrize("tms", [(65534, 65535, 1, 2), (65535, 0, 2, 3),
+                                 (10, 11, 13, 14)])
+def test_loss_is_counted_across_wraparound(tms):
+    stream = Stream()
+    for tm in tms:
+        stream.frame(tm, 2048)
+    assert stream.muse.eeg_packets_lost.tolist() == [1] * 5
+    assert stream.muse.eeg_gaps == 1
+    assert [n for n, _ in stream.gaps] == [12]
+    # without filling, the outgoing timestamps jump over the lost packet
+    steps = np.diff(stream.timestamps)
+    assert (steps > 0).all() and steps.max() > 1.5 * np.median(steps)
+
+
+def test_gap_event_timestamp():
+    stream = Stream()
+    for tm in (1, 2, 4):
+        stream.frame(tm, 2048)
+    n_samples, timestamp = stream.gaps[0]
+    last, first = stream.chunks[1][1][-1], stream.chunks[2][1][0]
+    step = stream.chunks[2][1][1] - first
+    assert n_samples == 12
+    assert timestamp == pytest.approx(last + step, abs=1e-3)
+    assert first == pytest.approx(timestamp + 12 * step, abs=1e-3)
+
+
+@pytest.mark.parametrize("fill_gaps", ["nan", "interpolate"])
+def test_filled_gaps_keep_the_stream_even(fill_gaps):
+    stream = Stream(fill_gaps)
+    stream.frame(1, 1000)
+    stream.frame(2, 1000)
+    stream.frame(5, 2000)
+
+    data, timestamps = stream.data, stream.timestamps
+    assert data.shape == (5, 5 * 12)
+    steps = np.diff(timestamps)
+    assert np.allclose(steps, steps.mean(), rtol=1e-6)
+
+    filled = data[:, 24:48]
+    if fill_gaps == "nan":
+        assert np.isnan(filled).all()
+    else:
+        # a straight line from the last sample before the gap to the first
+        # one after it
+        before, after = data[:, 23], data[:, 48]
+        weights = np.arange(1, 25) / 25.
+        expected = before[:, None] + (after - before)[:, None] * weights
+        assert np.allclose(filled, expected)
+    assert not np.isnan(data[:, 48:]).any()
+
+
+def test_long_gaps_are_not_filled():
+    from muselsl.constants import MUSE_GAP_FILL_PACKETS
+
+    stream = Stream("nan")
+    stream.frame(1, 2048)
+    stream.frame(MUSE_GAP_FILL_PACKETS + 3, 2048)
+    assert stream.gaps == [(12 * (MUSE_GAP_FILL_PACKETS + 1),
+                            stream.gaps[0][1])]
+    assert stream.data.shape == (5, 24)
+
+
+@pytest.mark.parametrize("fill_gaps", [None, "nan", "interpolate"])
+def test_packet_lost_within_a_frame(fill_gaps):
+    stream = Stream(fill_gaps)
+    stream.frame(1, 1000)
+    stream.frame(2, 2000, skip=[2])
+    stream.frame(3, 3000)
+
+    assert stream.muse.eeg_packets_lost.tolist() == [0, 0, 1, 0, 0]
+    assert stream.muse.eeg_gaps == 0
+    lost = stream.data[2, 12:24]
+    if fill_gaps is None:
+        assert (lost == 0).all()
+    elif fill_gaps == "nan":
+        assert np.isnan(lost).all()
+    else:
+        assert (lost == microvolts(1000 + 32)).all()
+    assert (stream.data[[0, 1, 3, 4], 12:24] ==
+            microvolts(2000 + 16 * np.array([0, 1, 3, 4]))[:, None]).all()
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from muselsl.outlets import ChunkPusher
+
+
+class OldFakeOutlet():
+    """Keeps the chunks pushed to it, as an outlet of pylsl < 1.16"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def push_chunk(self, data, timestamp):
+        self.chunks.append((np.array(data), timestamp))
+
+
+class FakeOutlet(OldFakeOutlet):
+    """pylsl >= 1.16, which takes one timestamp per sample"""
+
+    do_push_chunk_n = None
+
+
+class Clock():
+
+    def __init__(self):
+        self.now = 100.
+
+    def __call__(self):
+        return self.now
+
+
+def block(i, size=12, n_channels=5):
+    """One decoded block, samples along the columns as the Muse hands them"""
+    data = np.full((n_channels, size), i, dtype=np.float64)
+    timestamps = 1000. + (i * size + np.arange(size)) / 256.
+    return data, timestamps
+
+
+def test_every_block_is_pushed_by_default():
+    outlet = FakeOutlet()
+    pusher = ChunkPusher(outlet, 5, 12, 256.)
+    for i in range(3):
+        pusher(*block(i))
+        assert len(outlet.chunks) == i + 1
+    data, timestamps = outlet.chunks[-1]
+    assert data.shape == (12, 5) and (data == 2).all()
+    assert np.array_equal(timestamps, block(2)[1])
+
+
+def test_flush_on_count():
+    outlet = FakeOutlet()
+    pusher = ChunkPusher(outlet, 5, 12, 256., chunk_packets=3)
+    for i in range(8):
+        pusher(*block(i))
+    assert len(outlet.chunks) == 2
+    for chunk, first in zip(outlet.chunks, (0, 3)):
+        data, timestamps = chunk
+        assert data.shape == (36, 5)
+        assert np.array_equal(data[::12, 0], [first, first + 1, first + 2])
+        assert np.array_equal(timestamps, np.concatenate(
+            [block(i)[1] for i in range(first, first + 3)]))
+    assert pusher.n_packets == 2 and pusher.total_packets == 8
+
+
+def test_flush_on_age():
+    outlet = FakeOutlet()
+    clock = Clock()
+    pusher = ChunkPusher(outlet, 5, 12, 256., chunk_ms=100, time_func=clock)
+    # blocks arriving in real time, one every 47 ms
+    for i in range(3):
+        pusher(*block(i))
+        clock.now += 12 / 256.
+    # the oldest block was 94 ms old when the third one came in
+    assert outlet.chunks == []
+    pusher(*block(3))
+    assert len(outlet.chunks) == 1 and len(outlet.chunks[0][0]) == 48
+
+    # the age counts from the first block after a push
+    clock.now += 1.
+    pusher(*block(4))
+    assert len(outlet.chunks) == 1
+    clock.now += .11
+    pusher(*block(5))
+    assert len(outlet.chunks) == 2 and len(outlet.chunks[1][0]) == 24
+
+
+def test_full_buffer_is_pushed_before_it_overflows():
+    outlet = FakeOutlet()
+    clock = Clock()
+    pusher = ChunkPusher(outlet, 5, 12, 256., chunk_ms=100, time_func=clock)
+    # the clock stands still, so the blocks only leave when the buffer is full
+    n_blocks = pusher.capacity // 12
+    for i in range(n_blocks + 1):
+        pusher(*block(i))
+    assert [len(data) for data, _ in outlet.chunks] == [pusher.capacity]
+    assert pusher.n_samples == 12
+
+
+def test_flush_pushes_a_partial_chunk():
+    outlet = FakeOutlet()
+    pusher = ChunkPusher(outlet, 5, 12, 256., chunk_packets=10)
+    pusher(*block(0))
+    pusher(*block(1))
+    pusher.flush()
+    assert len(outlet.chunks) == 1 and len(outlet.chunks[0][0]) == 24
+    # nothing left to push
+    pusher.flush()
+    assert len(outlet.chunks) == 1
+
+
+def test_older_pylsl_gets_the_last_timestamp():
+    outlet = OldFakeOutlet()
+    pusher = ChunkPusher(outlet, 5, 12, 256., chunk_packets=2)
+    pusher(*block(0))
+    pusher(*block(1))
+    assert outlet.chunks[0][1] == block(1)[1][-1]
+
+
+@pytest.mark.parametrize("kwargs", [{"chunk_packets": 0},
+                                    {"chunk_packets": -1},
+                                    {"chunk_ms": -1},
+                                    {"chunk_packets": 0, "chunk_ms": 10}])
+def test_invalid_chunking(kwargs):
+    with pytest.raises(ValueError):
+        ChunkPusher(FakeOutlet(), 5, 12, 256., **kwargs)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from muselsl.record import (BinaryRecordingWriter, CsvRecordingWriter,
+                            _nearest_indices, _save, read_binary_recording)
+
+
+def argmin_indices(timestamps, times):
+    """The per-marker loop _nearest_indices replaced, as a reference."""
+    return np.array([np.argmin(np.abs(timestamps - t)) for t in times])
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_matches_argmin(seed, shuffle):
+    rng = np.random.default_rng(seed)
+    n_samples = int(rng.integers(1, 300))
+    # coarse timestamps and marker times, so that repeated timestamps and
+    # markers halfway between two samples are common
+    timestamps = np.sort(rng.integers(0, 100, n_samples)) / 4.
+    if shuffle:
+        rng.shuffle(timestamps)
+    times = rng.integers(-20, 420, 500) / 8.
+
+    assert np.array_equal(_nearest_indices(timestamps, times),
+                          argmin_indices(timestamps, times))
+
+
+def test_epoch_timestamps():
+    rng = np.random.default_rng(0)
+    timestamps = 1.7e9 + np.arange(256 * 60) / 256.
+    timestamps += rng.normal(0, 1e-3, len(timestamps))
+    times = rng.uniform(timestamps.min() - 1, timestamps.max() + 1, 1000)
+
+    assert np.array_equal(_nearest_indices(timestamps, times),
+                          argmin_indices(timestamps, times))
+
+
+def flush_with_late_marker(writer):
+    """Flush two blocks with a marker more recent than both, then the final
+    flush with no samples left."""
+    data = np.arange(20, dtype=float).reshape(10, 2)
+    timestamps = list(100 + np.arange(10) / 256.)
+    markers = [[[1], 100 + 2 / 256.], [[2], 101.], [[3], 102.]]
+    markers = _save(writer, [data[:5]], timestamps[:5], 0., None, markers)
+    assert [m[0] for m in markers] == [[2], [3]]
+    markers = _save(writer, [data[5:]], timestamps[5:], 0., None, markers)
+    assert [m[0] for m in markers] == [[2], [3]]
+    _save(writer, [], [], 0., None, markers, final=True)
+    writer.close()
+    return timestamps
+
+
+def test_late_markers_go_on_the_last_sample_csv(tmp_path):
+    import pandas as pd
+
+    filename = str(tmp_path / "recording.csv")
+    timestamps = flush_with_late_marker(
+        CsvRecordingWriter(filename, ["TP9", "AF7"], 1))
+    recording = pd.read_csv(filename)
+    assert np.allclose(recording["timestamps"], timestamps, atol=1e-3)
+    assert recording["AF7"].tolist() == list(range(1, 20, 2))
+    # the most recent of the late markers wins
+    assert recording["Marker0"].tolist() == [0, 0, 1, 0, 0, 0, 0, 0, 0, 3]
+
+
+def test_late_markers_go_on_the_last_sample_binary(tmp_path):
+    import pandas as pd
+
+    filename = str(tmp_path / "recording.bin")
+    flush_with_late_marker(BinaryRecordingWriter(filename, ["TP9", "AF7"], 1))
+    data, metadata = read_binary_recording(filename)
+    assert len(data) == metadata["n_samples"] == 10
+    markers = pd.read_csv(filename + ".markers.csv")
+    assert markers["sample"].tolist() == [2, 9]
+    assert markers["Marker0"].tolist() == [1, 3]
+    assert np.allclose(markers["timestamps"], data["timestamps"][[2, 9]],
+                       atol=1e-3)
@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+import pytest
+
+from session_stats import FOCUS_BINS, SessionStats
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 100, 10000])
+def test_focus_aggregates_match_numpy(n):
+    rng = np.random.default_rng(n)
+    scores = np.round(rng.uniform(0, 10, n), 2)
+    stats = SessionStats()
+    for score in scores:
+        stats.add_focus(score)
+
+    assert stats.n_focus == n
+    assert stats.focus_mean == pytest.approx(scores.mean(), rel=1e-12)
+    if n > 1:
+        assert stats.focus_var == pytest.approx(scores.var(ddof=1), rel=1e-9)
+    else:
+        assert stats.focus_var is None
+    assert (stats.focus_min, stats.focus_max) == (scores.min(), scores.max())
+    assert np.array_equal(stats.histogram, np.histogram(scores, FOCUS_BINS)[0])
+
+
+def test_variance_of_a_large_offset():
+    # the naive sum of squares loses every digit here, Welford does not
+    scores = 1e8 + np.array([4., 7., 13., 16.])
+    stats = SessionStats()
+    for score in scores:
+        stats.add_focus(score)
+    assert stats.focus_mean == pytest.approx(1e8 + 10)
+    assert stats.focus_var == pytest.approx(30.)
+
+
+def test_histogram_edges():
+    stats = SessionStats()
+    for score in [0., 0.5, 4.99, 5., 10., -1., 12.]:
+        stats.add_focus(score)
+    expected = np.zeros(len(FOCUS_BINS) - 1, dtype=np.int64)
+    # bins are closed on the left, the last one on both sides, and out of
+    # range scores count in the first or last bin
+    expected[[0, 1, 9, 10, 19]] = [2, 1, 1, 1, 2]
+    assert np.array_equal(stats.histogram, expected)
+
+
+def test_putts():
+    stats = SessionStats()
+    for result, nudge in [("made", False), ("miss", True), ("made", np.bool_(True)),
+                          ("other", False)]:
+        stats.add_putt({"result": result, "nudge": nudge})
+    assert (stats.n_putts, stats.made, stats.missed, stats.nudges) == (4, 2, 1, 2)
+
+
+@pytest.mark.parametrize("n", [0, 1, 5])
+def test_dict_round_trip(n):
+    stats = SessionStats()
+    for score in np.linspace(1, 4, n):
+        stats.add_focus(score)
+    stats.add_putt({"result": "made", "nudge": True})
+    loaded = SessionStats.from_dict(stats.to_dict())
+    assert loaded.to_dict() == stats.to_dict()
+    assert loaded.focus_var == stats.focus_var
+    if not n:
+        assert (loaded.focus_min, loaded.focus_max) == (math.inf, -math.inf)
+    loaded.add_focus(2.)
+    stats.add_focus(2.)
+    assert loaded.to_dict() == stats.to_dict()
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from focus_log import FocusLog
+from session_stats import SessionStats
+from session_store import SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.db"))
+
+
+def session(start, n_focus=50, n_putts=4, seed=0):
+    """Logs and running stats of a session, as the app builds them"""
+    rng = np.random.default_rng(seed)
+    focus_log, stats = FocusLog(threshold=2.5), SessionStats()
+    for i in range(n_focus):
+        score = round(rng.uniform(1.5, 4.5), 2)
+        focus_log.append(start + 2 * i, score)
+        stats.add_focus(score)
+    putt_log = []
+    for i in range(n_putts):
+        putt = {"timestamp": datetime.fromtimestamp(start + 7 * i).isoformat(),
+                "focus": focus_log.scores[i] if n_focus else None,
+                "result": ["made", "miss"][i % 2],
+                "nudge": bool(i % 3 == 0),
+                "low_focus_last_10s": np.bool_(i % 2),
+                "low_focus_last": False}
+        putt_log.append(putt)
+        stats.add_putt(putt)
+    return focus_log, putt_log, stats
+
+
+def test_round_trip(store):
+    start = 1.7e9
+    focus_log, putt_log, stats = session(start)
+    summary = store.save("ana", start, start + 3725, focus_log, putt_log, stats)
+
+    assert summary["player"] == "ana"
+    assert summary["duration"] == "1:02:05"
+    assert summary["start"] == datetime.fromtimestamp(start).strftime("%Y-%m-%d %H:%M:%S")
+    assert (summary["n_focus"], summary["n_putts"]) == (50, 4)
+    assert (summary["made"], summary["missed"], summary["nudges"]) == (2, 2, 2)
+    assert summary["focus_mean"] == pytest.approx(stats.focus_mean)
+    assert summary["focus_var"] == pytest.approx(stats.focus_var)
+    assert summary["stats"].to_dict() == stats.to_dict()
+
+    loaded = store.focus_log(summary["id"])
+    assert loaded.threshold == 2.5
+    assert np.array_equal(loaded.times, focus_log.times)
+    assert np.array_equal(loaded.scores, focus_log.scores)
+    assert loaded.to_frame().equals(focus_log.to_frame())
+    assert loaded.any_below(2.5) == focus_log.any_below(2.5)
+
+    putts = store.putt_log(summary["id"])
+    assert [putt["focus"] for putt in putts] == pytest.approx(
+        [float(putt["focus"]) for putt in putt_log])
+    for putt, expected in zip(putts, putt_log):
+        for key in ("timestamp", "result", "nudge", "low_focus_last_10s", "low_focus_last"):
+            assert putt[key] == expected[key]
+        # flags come back as bool, even those logged as NumPy booleans
+        assert all(type(putt[key]) is bool for key in ("nudge", "low_focus_last_10s", "low_focus_last"))
+
+    assert store.get(summary["id"])["stats"].to_dict() == stats.to_dict()
+
+
+def test_empty_session(store):
+    start = 1.7e9
+    focus_log, putt_log, stats = session(start, n_focus=0, n_putts=0)
+    summary = store.save("ana", start, start + 1, focus_log, putt_log, stats)
+
+    assert (summary["n_focus"], summary["n_putts"]) == (0, 0)
+    assert summary["focus_mean"] is None and summary["focus_var"] is None
+    assert summary["stats"].to_dict() == stats.to_dict()
+    assert summary["stats"].focus_min == np.inf
+
+    loaded = store.focus_log(summary["id"])
+    assert len(loaded) == 0 and not loaded
+    assert loaded.to_frame().empty
+    assert store.putt_log(summary["id"]) == []
+
+
+def test_pages_and_players(store):
+    for i in range(5):
+        store.save("ana" if i % 2 else "bo", 1.7e9 + 100 * i, 1.7e9 + 100 * i + 50,
+                   *session(1.7e9 + 100 * i, n_focus=3, n_putts=1, seed=i))
+    assert store.count() == 5 and store.count("ana") == 2 and store.count("cy") == 0
+    starts = [s["start"] for s in store.sessions(limit=2, offset=1)]
+    assert starts == [s["start"] for s in store.sessions()[1:3]]
+    assert starts == sorted(starts, reverse=True)
+    assert [s["player"] for s in store.sessions("bo")] == ["bo"] * 3
+    assert store.get(12345) is None
+    assert len(store.focus_log(12345)) == 0 and store.putt_log(12345) == []
+
+
+def test_clear(store):
+    ids = [store.save(player, 1.7e9, 1.7e9 + 10, *session(1.7e9, n_focus=3, n_putts=2))["id"]
+           for player in ("ana", "bo")]
+    store.clear("ana")
+    assert store.count() == 1 and store.count("ana") == 0
+    # the logs go with the session
+    assert len(store.focus_log(ids[0])) == 0 and store.putt_log(ids[0]) == []
+    assert len(store.focus_log(ids[1])) == 3 and len(store.putt_log(ids[1])) == 2
+
+    store.clear()
+    assert store.count() == 0 and store.sessions() == []
+    assert store.putt_log(ids[1]) == []
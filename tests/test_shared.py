@@ -0,0 +1,147 @@
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from muselsl.shared import SharedRing
+
+RING = 10
+
+
+def samples(start, stop):
+    """Rows [i, -i] stamped 1000 + i, to tell every sample apart"""
+    i = np.arange(start, stop)
+    return np.c_[i, -i].astype(np.float32), 1000. + i
+
+
+@pytest.fixture
+def ring():
+    writer = SharedRing.create('muselsl-test-%s' % uuid.uuid4().hex[:8],
+                               RING, 2, 256.)
+    # attach() unregisters the block from this process's resource tracker,
+    # which would leave the owner's unlink unaccounted for
+    reader = SharedRing(shared_memory.SharedMemory(name=writer.shm.name))
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def assert_samples(result, start, stop):
+    data, timestamps = result[:2]
+    expected_data, expected_timestamps = samples(start, stop)
+    assert np.array_equal(data, expected_data)
+    assert np.array_equal(timestamps, expected_timestamps)
+
+
+def test_attach_reads_the_layout(ring):
+    writer, reader = ring
+    assert (reader.n_samples, reader.n_channels, reader.sfreq) == (RING, 2, 256.)
+    assert reader.count == 0
+    assert reader.latest(1) is None
+    data, timestamps, position = reader.read_since(0)
+    assert data.shape == (0, 2) and position == 0
+
+
+def test_wraparound(ring):
+    writer, reader = ring
+    position = 0
+    written = 0
+    # chunk sizes that end on and straddle the end of the ring
+    for size in [3, 4, 3, 7, 1, 9, 10, 2, 5]:
+        writer.write(*samples(written, written + size))
+        written += size
+        result = reader.read_since(position)
+        assert_samples(result, position, written)
+        position = result[2]
+        assert position == reader.count == written
+        for n in (1, min(written, RING)):
+            assert_samples(reader.latest(n), written - n, written)
+        assert reader.latest(RING + 1) is None
+
+
+def test_reader_falling_behind_skips_overwritten_samples(ring):
+    writer, reader = ring
+    writer.write(*samples(0, 4))
+    data, timestamps, position = reader.read_since(0)
+    for start in range(4, 28, 3):
+        writer.write(*samples(start, start + 3))
+    # 24 samples were written since, only the last ring length is left
+    result = reader.read_since(position)
+    assert result[2] == 28
+    assert_samples(result, 28 - RING, 28)
+    assert_samples(reader.read_since(26), 26, 28)
+
+
+def test_write_longer_than_the_ring(ring):
+    writer, reader = ring
+    writer.write(*samples(0, 3))
+    writer.write(*samples(3, 3 + 2 * RING + 4))
+    end = 3 + 2 * RING + 4
+    assert reader.count == end
+    assert_samples(reader.latest(RING), end - RING, end)
+    result = reader.read_since(3)
+    assert result[2] == end
+    assert_samples(result, end - RING, end)
+    # and the ring keeps going from there
+    writer.write(*samples(end, end + 4))
+    assert_samples(reader.read_since(end), end, end + 4)
+    assert_samples(reader.latest(RING), end + 4 - RING, end + 4)
+
+
+def overlapping_writes(monkeypatch, reader, *writes):
+    """Run each of writes right after the reader's next copies, as a
+    producer in another process could. Returns the number of copies."""
+    copy = reader._copy
+    copies = []
+
+    def copy_then_write(start, stop):
+        result = copy(start, stop)
+        if len(copies) < len(writes):
+            writes[len(copies)]()
+        copies.append((start, stop))
+        return result
+
+    monkeypatch.setattr(reader, "_copy", copy_then_write)
+    return copies
+
+
+@pytest.mark.parametrize("read", ["latest", "read_since"])
+def test_read_retries_after_an_overlapping_write(ring, monkeypatch, read):
+    writer, reader = ring
+    writer.write(*samples(0, 8))
+    copies = overlapping_writes(
+        monkeypatch, reader, lambda: writer.write(*samples(8, 14)))
+    if read == "latest":
+        assert_samples(reader.latest(8), 6, 14)
+    else:
+        result = reader.read_since(0)
+        assert result[2] == 14
+        assert_samples(result, 4, 14)
+    # the first copy raced the writer and was thrown away
+    assert len(copies) == 2
+
+
+@pytest.mark.parametrize("read", ["latest", "read_since"])
+def test_read_retries_during_an_unpublished_write(ring, monkeypatch, read):
+    writer, reader = ring
+    writer.write(*samples(0, 8))
+
+    def announce():
+        # rows 8, 9, 0, 1 and 2 are being written but not published yet
+        writer._header[1] = 13
+        writer.data[[8, 9, 0, 1, 2]] = np.nan
+
+    def publish():
+        writer._header[1] = 8
+        writer.write(*samples(8, 13))
+
+    copies = overlapping_writes(monkeypatch, reader, announce, publish)
+    if read == "latest":
+        assert_samples(reader.latest(8), 5, 13)
+    else:
+        result = reader.read_since(0)
+        assert result[2] == 13
+        assert_samples(result, 3, 13)
+    # both copies made while the write was going on were thrown away
+    assert len(copies) == 3